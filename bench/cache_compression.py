@@ -0,0 +1,149 @@
+"""Benchmark compressed cache storage (``main.py --compress-cache``).
+
+Fills a temporary cache with ``--rows`` synthetic rows (or copies the
+cache given with ``--db``) and makes one copy per storage format: plain
+TEXT, zlib and, when the ``zstandard`` package is installed, zstd. Each
+copy is migrated in place with ``cache_codec.migrate``. For each format
+it reports:
+
+- database size and the stored bytes of the translations;
+- migration time;
+- cold start: a fresh interpreter that opens the cache and looks up
+  ``--cold`` keys (as a first run after start-up would);
+- warm lookup latency (median and p95 of ``--lookups`` lookups, decoding
+  included, hit counts untouched).
+
+The synthetic corpus has a small vocabulary, so its ratios are better
+than a real cache will get; run with ``--db`` on a copy of a real
+``translation_cache.db`` for representative numbers.
+
+``--check`` verifies that every copy returns exactly the plain
+translations, and that ``off`` turns a compressed copy back into plain
+text.
+
+Example:
+    python bench/cache_compression.py --rows 300000 --check
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import random_line  # noqa: E402
+from mock_server import fake_translation  # noqa: E402
+
+# run in a fresh interpreter: open the cache and look up the keys given on stdin
+_COLD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[2])
+from ds_translator import db
+db.CACHE_DB = sys.argv[1]
+keys = json.load(sys.stdin)
+conn = db._get_conn()
+for key in keys:
+    row = conn.execute('SELECT translation FROM translation_cache WHERE original = ?', (key,)).fetchone()
+    db._decode(conn, row[0])
+print(time.perf_counter() - start)
+"""
+
+
+def fill(rows: int, seed: int) -> None:
+    from ds_translator import db
+
+    rng = random.Random(seed)
+    pairs = {}
+    for n in range(rows):
+        text = f"{random_line(rng)} #{n}"
+        pairs[text] = fake_translation(text)
+    db.insert_missing(pairs.items())
+
+
+def _use(path: Path) -> None:
+    from ds_translator import db
+
+    db.close_connection()
+    db.CACHE_DB = str(path)
+    db.init_db()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark compressed cache storage")
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--db", help="benchmark a copy of this cache instead of synthetic rows")
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--cold", type=int, default=1000)
+    parser.add_argument("--check", action="store_true", help="also verify every copy's translations")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ds-compress-") as tmp:
+        root = Path(tmp)
+        os.chdir(root)
+        from ds_translator import cache_codec, db
+
+        source = root / "plain.db"
+        start = time.perf_counter()
+        if args.db:
+            shutil.copy(args.db, source)
+            _use(source)
+            cache_codec.migrate("off")
+        else:
+            _use(source)
+            fill(args.rows, args.seed)
+            db.vacuum(full=True)
+        expected = dict(row for rows in db.iter_translations() for row in rows)
+        keys = db.sample_keys(max(args.lookups, args.cold), seed=args.seed)
+        print(f"[bench] {len(expected)} rows (setup {time.perf_counter() - start:.1f} s)")
+
+        kinds = ["off", "zlib"] + (["zstd"] if cache_codec.zstd_available() else [])
+        failures = 0
+        for kind in kinds:
+            path = root / f"{kind}.db"
+            shutil.copy(source, path)
+            _use(path)
+            migrated = cache_codec.migrate(kind)
+            size = os.path.getsize(path)
+            timings = sorted(db.time_lookups(keys[:args.lookups]))
+            cold = []
+            for _ in range(3):
+                db.close_connection()
+                proc = subprocess.run([sys.executable, "-c", _COLD, str(path), str(REPO_ROOT)],
+                                      input=json.dumps(keys[:args.cold]), capture_output=True, text=True, check=True)
+                cold.append(float(proc.stdout))
+            label = "plain" if kind == "off" else kind
+            print(f"  {label:5s} db {size / 1024 / 1024:7.1f} MB  translations {migrated['text_after'] / 1024 / 1024:6.1f} MB"
+                  f"  migrate {migrated['seconds']:6.2f} s  cold start {min(cold) * 1000:6.1f} ms"
+                  f"  lookup p50 {statistics.median(timings) * 1e6:5.1f} µs  p95 {timings[int(len(timings) * 0.95)] * 1e6:5.1f} µs")
+            if args.check:
+                got = dict(row for rows in db.iter_translations() for row in rows)
+                if got != expected:
+                    failures += 1
+                    print(f"[check] {label}: {sum(got.get(k) != v for k, v in expected.items())} translations differ")
+                if kind != "off":
+                    cache_codec.migrate("off")
+                    plain = db._get_conn().execute(
+                        "SELECT COUNT(*) FROM translation_cache WHERE typeof(translation) != 'text'").fetchone()[0]
+                    if plain or dict(row for rows in db.iter_translations() for row in rows) != expected:
+                        failures += 1
+                        print(f"[check] {label}: off left {plain} compressed rows or changed translations")
+        if args.check:
+            print(f"[check] {failures} failure(s)")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Benchmark and check for cache maintenance (``main.py --maintain-cache``).
+
+Builds a temporary cache the way older versions left it: no incremental
+auto-vacuum, the redundant ``idx_original`` index, ``--rows`` rows with
+random hit counts and ages, ``--fail-rate`` of them ``[翻译失败]``
+markers (about half of them expired) and ``--verified-rate`` of them
+human-verified. It then runs:
+
+- the first maintenance pass (``compact=True``, as the command does) with
+  ``DS_CACHE_MAX_ROWS`` at ``--keep`` of the rows;
+- a scheduled pass (``compact=False``) after a quarter of the remaining
+  rows were deleted, which only frees pages incrementally.
+
+Both print the size and lookup latency before and after.
+
+``--check`` verifies that exactly the expired markers are gone,
+that no verified row was evicted, that the evicted rows are the least
+used ones, that the index is gone and incremental vacuum is on, that the
+first pass shrank the file and that the scheduled pass returned every
+free page.
+
+Example:
+    python bench/cache_maintenance.py --rows 500000 --check
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import random_line  # noqa: E402
+from mock_server import fake_translation  # noqa: E402
+
+FAILED = "[翻译失败]"
+
+
+def build(path: Path, rows: int, fail_rate: float, verified_rate: float, seed: int) -> dict:
+    """Write an old-style cache; returns original -> (translation, hits, days since used, verified)."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    table = {}
+    for n in range(rows):
+        text = f"{random_line(rng)} #{n}"
+        days = rng.random() * 365
+        if rng.random() < fail_rate:
+            table[text] = (FAILED, 1, days, 0)
+        else:
+            table[text] = (fake_translation(text), int(rng.paretovariate(1.2)), days,
+                           int(rng.random() < verified_rate))
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE translation_cache (
+            original TEXT PRIMARY KEY ON CONFLICT REPLACE,
+            translation TEXT NOT NULL,
+            hit_count INTEGER DEFAULT 1,
+            created_at TEXT,
+            updated_at TEXT,
+            verified INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_original ON translation_cache(original)')
+    with conn:
+        conn.executemany(
+            "INSERT INTO translation_cache VALUES (?, ?, ?, ?, ?, ?)",
+            ((k, t, hits, (now - timedelta(days=365)).isoformat(), (now - timedelta(days=days)).isoformat(), v)
+             for k, (t, hits, days, v) in table.items()),
+        )
+    conn.close()
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cache maintenance")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--keep", type=float, default=0.5, help="DS_CACHE_MAX_ROWS as a share of --rows")
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="share of rows stored as [翻译失败]")
+    parser.add_argument("--verified-rate", type=float, default=0.02, help="share of rows marked human-verified")
+    parser.add_argument("--check", action="store_true", help="also verify what was kept")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ds-maint-") as tmp:
+        root = Path(tmp)
+        # relative data paths (lexicon store) resolve inside the temporary tree
+        os.chdir(root)
+        from ds_translator import db, maintenance
+
+        path = root / "cache.db"
+        table = build(path, args.rows, args.fail_rate, args.verified_rate, args.seed)
+        db.CACHE_DB = str(path)
+        db.init_db()
+        max_rows = int(args.rows * args.keep)
+        os.environ["DS_CACHE_MAX_ROWS"] = str(max_rows)
+        os.environ["DS_CACHE_FAILED_TTL"] = str(24 * 182)
+        print(f"[bench] {args.rows} rows, cap {max_rows}, {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        first = maintenance.run(compact=True)
+        after_first = os.path.getsize(path)
+        for line in maintenance.format_result(first):
+            print(f"  first pass: {line}")
+        kept = {row[0] for rows in db.iter_translations() for row in rows}
+
+        # a contiguous key range, so whole pages become free
+        conn = db._get_conn()
+        with conn:
+            conn.execute("DELETE FROM translation_cache WHERE original IN (SELECT original FROM translation_cache "
+                         "WHERE verified = 0 ORDER BY original LIMIT ?)", (len(kept) // 4,))
+        second = maintenance.run()
+        for line in maintenance.format_result(second):
+            print(f"  scheduled:  {line}")
+
+        if not args.check:
+            return 0
+        failures = 0
+        if after_first >= first["before"]["bytes"] or second["after"]["free_bytes"] or second["before"]["free_bytes"] == 0:
+            failures += 1
+            print("[check] the database file did not shrink")
+        expired = [k for k, (t, _h, days, _v) in table.items() if t == FAILED and days > 182]
+        if any(k in kept for k in expired) or first["expired"] != len(expired):
+            failures += 1
+            print(f"[check] {first['expired']} markers expired, expected {len(expired)}")
+        lost = [k for k, (_t, _h, _d, v) in table.items() if v and k not in kept]
+        if lost:
+            failures += 1
+            print(f"[check] {len(lost)} verified rows were evicted")
+
+        def worth(k):
+            _t, hits, days, _v = table[k]
+            return hits / (1 + days / 30)
+
+        expired_set = set(expired)
+        candidates = [k for k, (_t, _h, _d, v) in table.items() if not v and k not in expired_set]
+        threshold = min(worth(k) for k in candidates if k in kept)
+        # ages were taken at build time; allow for the seconds since
+        wrong = sum(1 for k in candidates if k not in kept and worth(k) > threshold * 1.001)
+        if wrong:
+            failures += 1
+            print(f"[check] {wrong} evicted rows were worth more than the least worth kept row")
+        indexes = [row[1] for row in conn.execute("PRAGMA index_list(translation_cache)")]
+        if "idx_original" in indexes or conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            failures += 1
+            print(f"[check] indexes {indexes}, auto_vacuum not incremental")
+        if first["evicted"] + first["expired"] + first["after"]["rows"] != args.rows:
+            failures += 1
+            print(f"[check] row counts do not add up: {first['expired']} + {first['evicted']} + {first['after']['rows']}")
+        print(f"[check] {failures} failure(s)")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
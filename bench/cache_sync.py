@@ -0,0 +1,163 @@
+"""Benchmark and check for cache export/import (``main.py --export-cache/--import-cache``).
+
+Fills a temporary cache with ``--rows`` synthetic rows (fake translations,
+a few ``[翻译失败]`` markers) and times:
+
+- the first export into an empty directory;
+- a re-export after ``--change-rate`` of the rows were updated (only the
+  shards holding them are rewritten);
+- the first import into an empty second cache;
+- the import of the re-export (only the changed shards are read);
+- a re-import of the same export (every shard skipped).
+
+``--check`` verifies that the imported cache matches the source apart
+from failure markers, that a verified local translation survives the
+import, and that a corrupted shard is rolled back and retried.
+
+Example:
+    python bench/cache_sync.py --rows 1000000 --check
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import random_line  # noqa: E402
+from mock_server import fake_translation  # noqa: E402
+
+FAILED = "[翻译失败]"
+
+
+def _use_cache(path: Path) -> None:
+    from ds_translator import db
+
+    db.close_connection()
+    db.CACHE_DB = str(path)
+    db.init_db()
+
+
+def fill(rows: int, fail_rate: float, seed: int) -> dict:
+    """Insert synthetic rows into the current cache; returns line -> translation."""
+    from ds_translator import db
+
+    rng = random.Random(seed)
+    table: dict[str, str] = {}
+    for n in range(rows):
+        text = f"{random_line(rng)} #{n}"
+        table[text] = FAILED if rng.random() < fail_rate else fake_translation(text)
+    conn = db._get_conn()
+    with conn:
+        conn.executemany(
+            "INSERT INTO translation_cache (original, translation, hit_count, updated_at) "
+            "VALUES (?, ?, ?, '2026-01-01T00:00:00')",
+            ((k, v, rng.randint(0, 9)) for k, v in table.items()),
+        )
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cache export and import")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--shards", type=int, default=64)
+    parser.add_argument("--change-rate", type=float, default=0.0001, help="share of rows updated before the re-export")
+    parser.add_argument("--fail-rate", type=float, default=0.01, help="share of rows stored as [翻译失败]")
+    parser.add_argument("--check", action="store_true", help="also verify the imported cache")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ds-sync-") as tmp:
+        root = Path(tmp)
+        os.chdir(root)
+        from ds_translator import cache_sync, db
+
+        export = root / "export"
+        _use_cache(root / "source.db")
+        start = time.perf_counter()
+        table = fill(args.rows, args.fail_rate, args.seed)
+        print(f"[bench] {args.rows} rows, {args.shards} shards "
+              f"(setup {time.perf_counter() - start:.1f} s, {os.path.getsize(db.CACHE_DB) / 1e6:.1f} MB db)")
+
+        first = cache_sync.export_cache(str(export), args.shards)
+        rng = random.Random(args.seed + 1)
+        changed = rng.sample(sorted(k for k, v in table.items() if v != FAILED),
+                             max(1, int(args.rows * args.change_rate)))
+        conn = db._get_conn()
+        with conn:
+            conn.executemany(
+                "UPDATE translation_cache SET translation = ?, updated_at = '2026-06-01T00:00:00' WHERE original = ?",
+                (("【新】" + table[k], k) for k in changed),
+            )
+        for k in changed:
+            table[k] = "【新】" + table[k]
+        print(f"  first export   {first['seconds']:7.2f} s  ({first['rows'] / first['seconds']:8.0f} rows/s, "
+              f"{first['bytes'] / 1e6:.1f} MB)")
+
+        _use_cache(root / "target.db")
+        imported = cache_sync.import_cache(str(export))
+        _use_cache(root / "source.db")
+        second = cache_sync.export_cache(str(export))
+        print(f"  re-export      {second['seconds']:7.2f} s  ({len(changed)} rows changed, "
+              f"{second['written']}/{second['shards']} shards rewritten)")
+        print(f"  first import   {imported['seconds']:7.2f} s  ({imported['rows'] / imported['seconds']:8.0f} rows/s)")
+
+        _use_cache(root / "target.db")
+        delta = cache_sync.import_cache(str(export))
+        again = cache_sync.import_cache(str(export))
+        print(f"  delta import   {delta['seconds']:7.2f} s  ({delta['read']} shards read, {delta['replaced']} replaced)")
+        print(f"  re-import      {again['seconds']:7.2f} s  ({again['skipped']} shards skipped)")
+
+        if not args.check:
+            return 0
+        failures = 0
+        cached = dict(row for rows in db.iter_translations() for row in rows)
+        expected = {k: v for k, v in table.items() if v != FAILED}
+        if cached != expected:
+            failures += 1
+            wrong = [k for k, v in expected.items() if cached.get(k) != v]
+            print(f"[check] {len(wrong)} lines missing or wrong, {len(cached)} rows for {len(expected)} lines")
+
+        key = changed[0]
+        with db._get_conn() as c:
+            c.execute("UPDATE translation_cache SET translation = 'kept', verified = 1, updated_at = '2000' "
+                      "WHERE original = ?", (key,))
+            c.execute("DELETE FROM sync_state")
+        cache_sync.import_cache(str(export))
+        if db.get_translation_from_db(key) != "kept":
+            failures += 1
+            print("[check] the import replaced a verified translation")
+
+        manifest = cache_sync.load_manifest(str(export))
+        name = sorted(manifest["files"])[0]
+        path = export / name
+        intact = path.read_bytes()
+        lines = gzip.decompress(intact).splitlines(True)
+        victim = lines[-1].split(b'"')[1].decode("utf-8")
+        lines[-1] = lines[-1].replace(b'",', b'X",', 1)
+        path.write_bytes(gzip.compress(b"".join(lines)))
+        with db._get_conn() as c:
+            c.execute("DELETE FROM sync_state")
+        broken = cache_sync.import_cache(str(export))
+        if broken["errors"] != 1 or db.get_translation_from_db(victim + "X") is not None:
+            failures += 1
+            print(f"[check] a corrupted shard was not rolled back ({broken['errors']} errors)")
+        path.write_bytes(intact)
+        retried = cache_sync.import_cache(str(export))
+        if retried["read"] != 1:
+            failures += 1
+            print(f"[check] the corrupted shard was not retried ({retried['read']} read)")
+        print(f"[check] {failures} failure(s)")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Benchmark and check for cache warm-up (``main.py --warm-cache``).
+
+Writes ``--files`` synthetic bilingual outputs (fake translations, a few
+``[翻译失败]`` markers and replies that fail ``validate.check``) into a temporary directory and rebuilds an empty
+temporary cache from them with ``warmup.warm``. It times the rebuild
+with the configured number of workers and with one, and compares it to
+``save_translation_to_db`` per line on a sample of the same rows.
+
+``--check`` verifies that every translated line is in the rebuilt cache
+with its translation, that failure markers and suspect replies were
+skipped, and that a
+second warm-up does not replace existing rows.
+
+Example:
+    python bench/cache_warmup.py --files 4000 --cues 250 --check
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import random_line  # noqa: E402
+from mock_server import fake_translation  # noqa: E402
+
+FAILED = "[翻译失败]"
+
+
+def build(directory: Path, files: int, cues: int, fail_rate: float, suspect_rate: float, seed: int) -> tuple[dict, set, set]:
+    """Write bilingual outputs; returns (line -> translation, lines only ever seen as failures, suspect lines)."""
+    from ds_translator.srt import rebuild_srt
+
+    directory.mkdir()
+    rng = random.Random(seed)
+    translations: dict[str, str] = {}
+    failed: set[str] = set()
+    suspects: set[str] = set()
+    for n in range(files):
+        rows = []
+        for i in range(1, cues + 1):
+            # a serial per file keeps most lines unique, like a real backlog
+            text = random_line(rng) + (f" #{n}" if rng.random() < 0.7 else "")
+            if rng.random() < suspect_rate:
+                # a note instead of a subtitle, on a line of its own
+                text = f"{random_line(rng)} #s{n}-{i}"
+                translation = "译文：" + fake_translation(text)
+                suspects.add(text)
+            elif rng.random() < fail_rate:
+                translation = FAILED
+                if text not in translations:
+                    failed.add(text)
+            else:
+                translation = fake_translation(text)
+                translations[text] = translation
+                failed.discard(text)
+            rows.append((str(i), "00:00:01,000 --> 00:00:02,000", text, translation))
+        (directory / f"bench_{n:05d}-roasted.srt").write_text(rebuild_srt(rows), encoding="utf-8")
+    return translations, failed, suspects
+
+
+def _fresh_cache(path: Path) -> None:
+    from ds_translator import db
+
+    db.close_connection()
+    if path.exists():
+        path.unlink()
+    db.CACHE_DB = str(path)
+    db.init_db()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cache warm-up from bilingual outputs")
+    parser.add_argument("--files", type=int, default=4000)
+    parser.add_argument("--cues", type=int, default=250)
+    parser.add_argument("--fail-rate", type=float, default=0.01, help="share of cues written as [翻译失败]")
+    parser.add_argument("--suspect-rate", type=float, default=0.005, help="share of cues whose reply fails validate.check")
+    parser.add_argument("--sample", type=int, default=20_000, help="rows for the per-line comparison")
+    parser.add_argument("--check", action="store_true", help="also verify the rebuilt cache")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ds-warmup-") as tmp:
+        root = Path(tmp)
+        # relative data paths (lexicon store, fast-path table) resolve inside the temporary tree
+        os.chdir(root)
+        from ds_translator import db, warmup
+
+        start = time.perf_counter()
+        translations, failed, suspects = build(root / "roast", args.files, args.cues, args.fail_rate, args.suspect_rate, args.seed)
+        print(f"[bench] {args.files} files x {args.cues} cues, {len(translations)} distinct translated lines "
+              f"(setup {time.perf_counter() - start:.1f} s)")
+
+        for k, (label, workers) in enumerate((("parallel", os.getenv("DS_WARMUP_WORKERS", "0")), ("1 worker", "1"))):
+            os.environ["DS_WARMUP_WORKERS"] = workers
+            _fresh_cache(root / f"cache-{k}.db")
+            r = warmup.warm(str(root / "roast"))
+            print(f"  warm-up, {label:8s} {r['seconds']:7.2f} s  ({r['inserted'] / r['seconds']:8.0f} rows/s, "
+                  f"{r['inserted']} rows, {r['chunks']} chunks)")
+
+        _fresh_cache(root / "per-row.db")
+        sample = list(translations.items())[:args.sample]
+        start = time.perf_counter()
+        for original, translation in sample:
+            db.save_translation_to_db(original, translation)
+        per_row = time.perf_counter() - start
+        print(f"  one commit per line       {len(sample) / per_row:8.0f} rows/s "
+              f"(~{len(translations) / len(sample) * per_row:.0f} s for all rows)")
+
+        if not args.check:
+            return 0
+        failures = 0
+        db.close_connection()
+        db.CACHE_DB = str(root / "cache-0.db")
+        cached = dict(row for rows in db.iter_translations() for row in rows)
+        from ds_translator import fastpath
+
+        expected = {k: v for k, v in translations.items() if fastpath.lookup(k) is None}
+        wrong = [k for k, v in expected.items() if cached.get(k) != v]
+        if wrong or len(cached) != len(expected):
+            failures += 1
+            print(f"[check] {len(wrong)} lines missing or wrong, {len(cached)} rows for {len(expected)} lines")
+        if any(v == FAILED for v in cached.values()) or failed & set(cached):
+            failures += 1
+            print("[check] failure markers were loaded into the cache")
+        if suspects & set(cached) or r["suspect"] != len(suspects):
+            failures += 1
+            print(f"[check] suspect replies: {len(suspects & set(cached))} cached, {r['suspect']} of {len(suspects)} skipped")
+        key = next(iter(expected))
+        db.save_translation_to_db(key, "kept")
+        again = warmup.warm(str(root / "roast"))
+        if again["inserted"] or db.get_translation_from_db(key) != "kept":
+            failures += 1
+            print(f"[check] second warm-up replaced existing rows ({again['inserted']} inserted)")
+        print(f"[check] {failures} failure(s)")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Synthetic Japanese SRT corpus generator for benchmarks.
+
+Lines are assembled from a small vocabulary of variety-show phrases so the
+corpus looks like real input (kana/kanji mix, interjections, punctuation).
+``repeat_rate`` controls the share of cues that reuse an earlier line,
+which is what the translation cache feeds on.
+"""
+from __future__ import annotations
+
+import os
+import random
+from typing import Optional
+
+_SUBJECTS = ["私", "みんな", "今日のゲスト", "この番組", "先輩", "あの子", "スタッフさん", "リスナーさん"]
+_TOPICS = ["ケーキ", "ライブ", "収録", "新曲", "ゲーム", "お弁当", "罰ゲーム", "衣装", "台本", "旅行"]
+_PREDICATES = [
+    "が本当に好きなんです",
+    "はちょっと難しいかも",
+    "を楽しみにしてました",
+    "って聞いてないよ",
+    "がすごかったですね",
+    "はどうでしたか",
+    "を食べちゃった",
+    "で優勝しました",
+]
+_ENDINGS = ["！", "？", "。", "ね。", "よ！", "わ。", "…", "！？"]
+_INTERJECTIONS = ["えー！", "(笑)", "うん", "はい", "あはは", "すごーい！", "ほんとに？", "やばい"]
+
+
+def random_line(rng: random.Random) -> str:
+    """Return one synthetic Japanese subtitle line."""
+    if rng.random() < 0.15:
+        return rng.choice(_INTERJECTIONS)
+    line = f"{rng.choice(_SUBJECTS)}は{rng.choice(_TOPICS)}{rng.choice(_PREDICATES)}{rng.choice(_ENDINGS)}"
+    # Append a serial-ish suffix so unique lines really are unique.
+    return line + rng.choice(["", "", f"{rng.randint(1, 999)}回目"])
+
+
+def _timecode(ms: int) -> str:
+    h, rem = divmod(ms, 3_600_000)
+    m, rem = divmod(rem, 60_000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def generate_srt(n_cues: int, repeat_rate: float = 0.3, seed: Optional[int] = None) -> str:
+    """Generate SRT content with ``n_cues`` cues.
+
+    Roughly ``repeat_rate`` of the cues repeat an earlier line verbatim.
+    """
+    rng = random.Random(seed)
+    seen: list[str] = []
+    out = []
+    t = 1000
+    for i in range(1, n_cues + 1):
+        if seen and rng.random() < repeat_rate:
+            text = rng.choice(seen)
+        else:
+            text = random_line(rng)
+            seen.append(text)
+        dur = rng.randint(800, 3500)
+        out.append(f"{i}\n{_timecode(t)} --> {_timecode(t + dur)}\n{text}\n")
+        t += dur + rng.randint(50, 600)
+    return "\n".join(out)
+
+
+def write_corpus(directory: str, files: int, cues_per_file: int, repeat_rate: float = 0.3, seed: int = 0) -> list[str]:
+    """Write ``files`` synthetic SRT files into ``directory`` and return their names."""
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for n in range(files):
+        name = f"bench_{cues_per_file}_{n:03d}.srt"
+        content = generate_srt(cues_per_file, repeat_rate=repeat_rate, seed=seed * 1000 + n)
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(content)
+        names.append(name)
+    return names
+
+
+def count_cues(content: str) -> tuple[int, int]:
+    """Return ``(cues, non_empty_cues)`` for SRT content.
+
+    A lightweight count for reports; it does not need to be as forgiving
+    as ``ds_translator.srt.parse_srt`` because it only reads our own corpus.
+    """
+    total = nonempty = 0
+    for block in content.strip().split("\n\n"):
+        lines = block.strip().split("\n")
+        if len(lines) >= 2 and "-->" in lines[1]:
+            total += 1
+            if any(ln.strip() for ln in lines[2:]):
+                nonempty += 1
+    return total, nonempty
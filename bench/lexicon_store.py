@@ -0,0 +1,180 @@
+"""Equivalence check and benchmark for the compiled lexicon store.
+
+Builds a synthetic glossary (``--entries`` spread over ``lexicon.csv``
+and ``--shows`` show files) in a temporary directory and times:
+
+- the first compile of the CSVs into the SQLite store;
+- a start-up load from an up-to-date store (fresh instance, no CSV parse);
+- the no-change reload check, a ``touch`` without content change and an
+  edit of one show file;
+- term matching per cue against the regex alternation it replaces.
+
+``--check`` additionally verifies that ``TermMatcher`` finds exactly
+what the old ``re`` alternation (longest term first) found, and that the
+per-show views overlay the global entries.
+
+Example:
+    python bench/lexicon_store.py --entries 50000 --shows 8
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import random_line  # noqa: E402
+from ds_translator import lexicon as lex  # noqa: E402
+
+_KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+_KATAKANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン"
+_KANJI = "私今日番組先輩収録新曲衣装台本旅行罰優勝楽難好食聞"
+
+
+def _term(rng: random.Random) -> str:
+    alphabet = rng.choice([_KANA, _KATAKANA, _KANJI, _KATAKANA + _KANJI])
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(2, 8)))
+
+
+def _write_csv(path: Path, rows) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["original", "translation"])
+        writer.writerows(rows)
+
+
+def build(root: Path, entries: int, shows: int, seed: int) -> tuple[lex.LexiconStore, list[str]]:
+    rng = random.Random(seed)
+    terms = list(dict.fromkeys(_term(rng) for _ in range(entries)))
+    shows_dir = root / "shows"
+    shows_dir.mkdir()
+    per_file = len(terms) // (shows + 1)
+    _write_csv(root / "lexicon.csv", [(t, f"译{k}") for k, t in enumerate(terms[:per_file])])
+    for s in range(shows):
+        chunk = terms[per_file * (s + 1):per_file * (s + 2)]
+        # every show also overrides a few global entries
+        overrides = terms[s * 3:s * 3 + 3]
+        _write_csv(shows_dir / f"show{s}.csv", [(t, f"节目{s}译") for t in chunk + overrides])
+    store = lex.LexiconStore(str(root / "lexicon.csv"), str(shows_dir), str(root / "lexicon.db"))
+    return store, terms
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def _regex_findall(terms):
+    ordered = sorted((t for t in terms if t), key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, ordered))).findall
+
+
+def _lines(rng: random.Random, terms: list[str], n: int) -> list[str]:
+    out = []
+    for _ in range(n):
+        parts = [random_line(rng)]
+        for _ in range(rng.randint(0, 3)):
+            parts.insert(rng.randint(0, len(parts)), rng.choice(terms))
+        out.append("".join(parts))
+    return out
+
+
+def check(store: lex.LexiconStore, terms: list[str], seed: int) -> int:
+    failures = 0
+    rng = random.Random(seed)
+    view = store.get()
+    findall = _regex_findall(view)
+    for line in _lines(rng, list(view), 2000):
+        if view.terms_in(line) != findall(line):
+            failures += 1
+            print(f"[check] matcher mismatch: {line!r}")
+    # nested terms: the longest one must win, as with the regex
+    nested = {"アイ": "1", "アイウ": "2", "イウエ": "3", "ウエオ": "4", "エ": "5"}
+    findall = _regex_findall(nested)
+    for line in ["アイウエオ", "アイアイウエ", "xイウエオエ", "エエ"]:
+        if lex.terms_in(nested, line) != findall(line):
+            failures += 1
+            print(f"[check] nested matcher mismatch: {line!r}")
+    for s in range(3):
+        show = store.for_file(f"SHOW{s}_ep01.srt")
+        if show.namespace != f"show{s}" or show.get(terms[s * 3]) != f"节目{s}译":
+            failures += 1
+            print(f"[check] show{s}: namespace or override wrong ({show.namespace!r})")
+        if len(show) <= len(view):
+            failures += 1
+            print(f"[check] show{s}: view does not include its own entries")
+    return failures
+
+
+def benchmark(root: Path, store: lex.LexiconStore, terms: list[str], seed: int) -> None:
+    compile_s, _ = _timed(lambda: store.refresh(force=True))
+    counts = store.namespaces()
+    print(f"[bench] {sum(counts.values())} entries in {len(counts)} namespaces")
+    print(f"  compile CSVs -> SQLite       {compile_s * 1000:8.1f} ms")
+
+    # before the store, the whole glossary was one CSV parsed on every load
+    files = [root / "lexicon.csv", *sorted((root / "shows").glob("*.csv"))]
+    parse_s, _ = _timed(lambda: [lex.parse_csv(p.read_text(encoding="utf-8")) for p in files])
+    fresh = lex.LexiconStore(store.source, store.shows_dir, store.compiled)
+    load_s, _ = _timed(lambda: fresh.get("show0"))
+    print(f"  parse all CSVs (old path)    {parse_s * 1000:8.1f} ms")
+    print(f"  load show view from store    {load_s * 1000:8.1f} ms")
+
+    check_s, _ = _timed(store.refresh)
+    store._last_check = 0.0
+    stat_s, _ = _timed(lambda: store.refresh())
+    print(f"  reload check (throttled)     {check_s * 1e6:8.1f} us")
+    print(f"  reload check (stat only)     {stat_s * 1000:8.2f} ms")
+
+    os.utime(root / "shows" / "show1.csv")
+    store._last_check = 0.0
+    touch_s, changed = _timed(lambda: store.refresh())
+    print(f"  touch, same content          {touch_s * 1000:8.1f} ms (recompiled: {changed})")
+
+    with open(root / "shows" / "show1.csv", "a", encoding="utf-8", newline="") as f:
+        f.write("新しい用語,新词\n")
+    store._last_check = 0.0
+    edit_s, changed = _timed(lambda: store.refresh())
+    print(f"  edit one show file           {edit_s * 1000:8.1f} ms (recompiled: {changed})")
+
+    view = store.get()
+    lines = _lines(random.Random(seed), terms, 5000)
+    build_s, findall = _timed(lambda: _regex_findall(view))
+    regex_s, _ = _timed(lambda: [findall(line) for line in lines])
+    matcher_build_s, _ = _timed(lambda: view.terms_in(""))
+    matcher_s, _ = _timed(lambda: [view.terms_in(line) for line in lines])
+    print(f"  regex alternation: build {build_s * 1000:8.1f} ms, {regex_s / len(lines) * 1e6:7.1f} us/cue")
+    print(f"  TermMatcher:       build {matcher_build_s * 1000:8.1f} ms, {matcher_s / len(lines) * 1e6:7.1f} us/cue")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and benchmark the compiled lexicon store")
+    parser.add_argument("--entries", type=int, default=50_000, help="glossary entries in total")
+    parser.add_argument("--shows", type=int, default=8, help="per-show namespace files")
+    parser.add_argument("--check", action="store_true", help="also run the equivalence checks")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ds-lexicon-") as tmp:
+        root = Path(tmp)
+        store, terms = build(root, args.entries, args.shows, args.seed)
+        benchmark(root, store, terms, args.seed)
+        if args.check:
+            failures = check(store, terms, args.seed)
+            print(f"[check] {failures} mismatch(es)")
+            return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Offline stand-in for the DeepSeek ``/chat/completions`` endpoint.
+
+The server answers the same request shape that ``ds_translator.api``
+sends and returns deterministic fake translations, so performance
+experiments never touch the real API. Latency, 429 and 5xx injection are
+configurable; every reply carries a ``usage`` block similar to DeepSeek's
+(including prefix-cache hit/miss token counts). JSON-mode requests in the
+glossary correction format (``{"items": [{"id", "zh", "terms"}]}``) are
+answered with each term replaced by its required translation; items
+without ``zh`` (re-translation requests) get a fresh fake translation.
+``--rate-bad`` makes a fraction of plain replies fail the sanity checks
+in ``ds_translator.validate`` (untranslated, echoed context, explanation).
+
+Run standalone:
+    python bench/mock_server.py --port 8765 --latency lognormal:-2.5,0.6 --rate-429 0.02
+
+Then point the pipeline at it:
+    deepseek_api_url=http://127.0.0.1:8765 uv run python main.py
+
+Endpoints:
+    POST /chat/completions   fake completion
+    GET  /stats              JSON counters
+    POST /reset              reset counters
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a zero-argument sampler returning seconds.
+
+    Supported specs:
+        fixed:S            always S seconds
+        uniform:A,B        uniform between A and B
+        exp:MEAN           exponential with the given mean
+        lognormal:MU,SIGMA lognormal (parameters of the underlying normal)
+        none               no delay
+    """
+    kind, _, args = (spec or "none").partition(":")
+    kind = kind.strip().lower()
+    params = [float(a) for a in args.split(",") if a.strip()]
+    rng = random.Random()
+
+    if kind in ("", "none", "0"):
+        return lambda: 0.0
+    if kind == "fixed":
+        return lambda: params[0]
+    if kind == "uniform":
+        lo, hi = params[0], params[1]
+        return lambda: rng.uniform(lo, hi)
+    if kind == "exp":
+        mean = params[0]
+        return lambda: rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+    if kind == "lognormal":
+        mu, sigma = params[0], params[1]
+        return lambda: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"unknown latency spec: {spec!r}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate: CJK chars ~1 token, other text ~4 chars per token."""
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E7F)
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+# kana -> CJK ideographs, so fake translations contain no Japanese kana
+_KANA_TO_HAN = {cp: 0x4E00 + cp - 0x3041 for cp in range(0x3041, 0x30FB)}
+
+
+def fake_translation(text: str) -> str:
+    """Deterministic fake translation for ``text`` (same input -> same output)."""
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:6]
+    return f"译[{digest}]{text.translate(_KANA_TO_HAN)}"
+
+
+def bad_translation(text: str, kind: int) -> str:
+    """A reply that a sanity check should reject."""
+    if kind == 0:
+        return text
+    if kind == 1:
+        return f"[NOW] {text}\n{fake_translation(text)}"
+    return f"译文：{fake_translation(text)}\n（注：这是一句口语化的表达，语气比较随意。）"
+
+
+def fake_corrections(text: str) -> str:
+    """Answer a glossary correction request: use every required term translation."""
+    items = []
+    for item in json.loads(text)["items"]:
+        zh = item.get("zh") or fake_translation(item["ja"])
+        for term, target in item.get("terms", {}).items():
+            zh = zh.replace(term, target) if term in zh else zh + target
+        items.append({"id": item["id"], "zh": zh})
+    return json.dumps({"items": items}, ensure_ascii=False)
+
+
+class MockState:
+    """Configuration and counters shared by all request handler threads."""
+
+    def __init__(self, latency: str = "none", rate_429: float = 0.0, rate_5xx: float = 0.0, rate_bad: float = 0.0,
+                 seed: Optional[int] = None) -> None:
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_bad = rate_bad
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.requests = 0
+            self.ok = 0
+            self.status_429 = 0
+            self.status_5xx = 0
+            self.bad_requests = 0
+            self.bad_replies = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.cache_hit_tokens = 0
+            self.latency_total = 0.0
+            self.texts = set()
+            self._seen_prefixes = set()
+
+    def roll(self) -> int:
+        """Decide the status code for the next request."""
+        with self.lock:
+            r = self.rng.random()
+        if r < self.rate_429:
+            return 429
+        if r < self.rate_429 + self.rate_5xx:
+            return 503
+        return 200
+
+    def roll_bad(self) -> Optional[int]:
+        """Kind of bad reply for the next plain translation, or None."""
+        with self.lock:
+            if self.rng.random() >= self.rate_bad:
+                return None
+            self.bad_replies += 1
+            return self.rng.randrange(3)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "ok": self.ok,
+                "status_429": self.status_429,
+                "status_5xx": self.status_5xx,
+                "bad_requests": self.bad_requests,
+                "bad_replies": self.bad_replies,
+                "distinct_texts": len(self.texts),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "prompt_cache_hit_tokens": self.cache_hit_tokens,
+                "latency_total": round(self.latency_total, 6),
+                "config": {
+                    "latency": self.latency_spec,
+                    "rate_429": self.rate_429,
+                    "rate_5xx": self.rate_5xx,
+                    "rate_bad": self.rate_bad,
+                },
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ds-mock/0.1"
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without TCP_NODELAY a
+        # keep-alive client hits the Nagle/delayed-ACK stall (~40ms/request).
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    @property
+    def state(self) -> MockState:
+        return self.server.state  # type: ignore[attr-defined]
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from base class
+        # Keep benchmark output clean; counters are available via /stats.
+        pass
+
+    def _route(self) -> str:
+        # ds_translator joins API_BASE and "/chat/completions" without
+        # normalising slashes, so accept "//chat/completions" as well.
+        return "/" + self.path.split("?", 1)[0].strip("/")
+
+    def _send_json(self, status: int, body: dict[str, Any], headers: Optional[dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self._route() == "/stats":
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        route = self._route()
+        if route == "/reset":
+            self.state.reset()
+            self._send_json(200, {"ok": True})
+            return
+        if route != "/chat/completions":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        state = self.state
+        try:
+            payload = json.loads(raw.decode("utf-8"))
+            messages = payload["messages"]
+            text = messages[-1]["content"]
+        except Exception:
+            with state.lock:
+                state.requests += 1
+                state.bad_requests += 1
+            self._send_json(400, {"error": {"message": "invalid request body"}})
+            return
+
+        delay = max(0.0, state.sample_latency())
+        if delay:
+            time.sleep(delay)
+
+        status = state.roll()
+        with state.lock:
+            state.requests += 1
+            state.latency_total += delay
+            if status == 429:
+                state.status_429 += 1
+            elif status != 200:
+                state.status_5xx += 1
+
+        if status == 429:
+            self._send_json(429, {"error": {"message": "Rate limit reached"}}, headers={"Retry-After": "1"})
+            return
+        if status != 200:
+            self._send_json(status, {"error": {"message": "Service temporarily unavailable"}})
+            return
+
+        if (payload.get("response_format") or {}).get("type") == "json_object":
+            try:
+                translated = fake_corrections(text)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                translated = "{}"
+        else:
+            bad = state.roll_bad() if state.rate_bad else None
+            translated = fake_translation(text) if bad is None else bad_translation(text, bad)
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = estimate_tokens(translated)
+        # Simulate DeepSeek's prefix cache: a system prompt seen before is a hit.
+        prefix = str(messages[0].get("content", "")) if messages else ""
+        prefix_key = hashlib.sha1(prefix.encode("utf-8")).digest()
+        with state.lock:
+            hit = prefix_key in state._seen_prefixes
+            state._seen_prefixes.add(prefix_key)
+            hit_tokens = estimate_tokens(prefix) if hit else 0
+            state.ok += 1
+            state.texts.add(text)
+            state.prompt_tokens += prompt_tokens
+            state.completion_tokens += completion_tokens
+            state.cache_hit_tokens += hit_tokens
+
+        self._send_json(200, {
+            "id": f"mock-{hashlib.sha1(raw).hexdigest()[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": translated},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_cache_hit_tokens": hit_tokens,
+                "prompt_cache_miss_tokens": prompt_tokens - hit_tokens,
+            },
+        })
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **config: Any):
+    """Start the mock server on a daemon thread.
+
+    Returns ``(server, base_url)``. ``port=0`` picks a free port. Call
+    ``server.shutdown()`` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.state = MockState(**config)  # type: ignore[attr-defined]
+    t = threading.Thread(target=server.serve_forever, daemon=True, name="ds_mock_server")
+    t.start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, base_url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline mock of the DeepSeek chat-completions API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="none", help="none | fixed:S | uniform:A,B | exp:MEAN | lognormal:MU,SIGMA")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--rate-bad", type=float, default=0.0, help="fraction of translations answered with a bad reply")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    server.daemon_threads = True
+    server.state = MockState(  # type: ignore[attr-defined]
+        latency=args.latency, rate_429=args.rate_429, rate_5xx=args.rate_5xx, rate_bad=args.rate_bad, seed=args.seed,
+    )
+    print(f"mock chat-completions listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Benchmark and check for proofread ingestion (``main.py --ingest-proofread``).
+
+Writes ``--files`` synthetic source subtitles and their bilingual outputs
+(fake translations) into a temporary directory. It seeds a temporary
+cache with the machine translations and then "proofreads" the outputs:
+every copy of ``--edit-rate`` of the distinct lines gets a new
+translation. It then times:
+
+- the first ingestion (all lines confirmed, edited ones corrected);
+- a second ingestion of the same files (nothing to write);
+- the same writes as one ``save_translation_to_db`` commit per line, for
+  comparison.
+
+``--check`` verifies that exactly the edited lines were corrected and are
+now verified, and that an API result no longer overwrites them.
+
+Example:
+    python bench/proofread_ingest.py --files 2000 --cues 300 --check
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import write_corpus  # noqa: E402
+from mock_server import fake_translation  # noqa: E402
+
+
+def build(root: Path, files: int, cues: int, edit_rate: float, seed: int) -> tuple[dict, set]:
+    """Write sources and proofread files; returns (machine translations, edited lines)."""
+    from ds_translator import fastpath
+    from ds_translator.srt import parse_srt, rebuild_srt
+
+    source_dir = root / "subtitle"
+    proof_dir = root / "proofread"
+    proof_dir.mkdir()
+    names = write_corpus(str(source_dir), files, cues, seed=seed)
+    rng = random.Random(seed)
+    machine: dict[str, str] = {}
+    edited: set[str] = set()
+    for name in names:
+        subs = parse_srt((source_dir / name).read_text(encoding="utf-8"))
+        rows = []
+        for idx, tc, text in subs:
+            if text not in machine:
+                machine[text] = fake_translation(text)
+                if fastpath.lookup(text) is None and rng.random() < edit_rate:
+                    edited.add(text)
+            translation = "【校对】" + machine[text] if text in edited else machine[text]
+            rows.append((idx, tc, text, translation))
+        stem, ext = os.path.splitext(name)
+        (proof_dir / f"{stem}-roasted{ext}").write_text(rebuild_srt(rows), encoding="utf-8")
+    return machine, edited
+
+
+def seed_cache(machine: dict) -> None:
+    from ds_translator import db
+
+    db.init_db()
+    conn = db._get_conn()
+    with conn:
+        conn.executemany("INSERT INTO translation_cache (original, translation) VALUES (?, ?)", machine.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark proofread ingestion")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--cues", type=int, default=300)
+    parser.add_argument("--edit-rate", type=float, default=0.05, help="share of distinct lines that get corrected")
+    parser.add_argument("--check", action="store_true", help="also verify the ingested rows")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="ds-proofread-") as tmp:
+        root = Path(tmp)
+        # relative data paths (lexicon store) resolve inside the temporary tree
+        os.chdir(root)
+        from ds_translator import db, proofread
+
+        db.CACHE_DB = str(root / "cache.db")
+        start = time.perf_counter()
+        machine, edited = build(root, args.files, args.cues, args.edit_rate, args.seed)
+        seed_cache(machine)
+        print(f"[bench] {args.files} files x {args.cues} cues, {len(machine)} distinct lines, "
+              f"{len(edited)} edited (setup {time.perf_counter() - start:.1f} s)")
+
+        shutil.copy(db.CACHE_DB, root / "baseline.db")
+        first = proofread.ingest(str(root / "proofread"), str(root / "subtitle"))
+        second = proofread.ingest(str(root / "proofread"), str(root / "subtitle"))
+        for label, r in (("first ingest ", first), ("second ingest", second)):
+            written = r["added"] + r["corrected"] + r["confirmed"]
+            print(f"  {label} {r['seconds']:7.2f} s  ({r['files'] / r['seconds']:7.0f} files/s, "
+                  f"{written} rows written, {r['corrected']} corrected)")
+
+        db.CACHE_DB = str(root / "baseline.db")
+        pairs = [(text, "【校对】" + t if text in edited else t) for text, t in machine.items()]
+        start = time.perf_counter()
+        for original, translation in pairs:
+            db.save_translation_to_db(original, translation)
+        per_row = time.perf_counter() - start
+        print(f"  one commit per line ({len(pairs)} rows, writes only) {per_row:7.2f} s")
+        db.CACHE_DB = str(root / "cache.db")
+
+        if not args.check:
+            return 0
+        failures = 0
+        if first["corrected"] != len(edited) or second["corrected"] + second["added"] + second["confirmed"]:
+            failures += 1
+            print(f"[check] expected {len(edited)} corrections then none, got {first['corrected']} / {second}")
+        verified = db.get_translations_bulk(edited, verified_only=True)
+        wrong = [text for text in edited if verified.get(text) != "【校对】" + machine[text]]
+        if wrong:
+            failures += 1
+            print(f"[check] {len(wrong)} edited lines not stored as verified, e.g. {wrong[0]!r}")
+        if edited:
+            text = next(iter(edited))
+            db.save_translation_to_db(text, "API")
+            if db.get_translation_from_db(text) == "API":
+                failures += 1
+                print("[check] an API result overwrote a verified translation")
+        print(f"[check] {failures} failure(s)")
+        return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""End-to-end benchmark runner for the translation pipeline.
+
+Generates synthetic Japanese SRT corpora, starts the offline mock API
+(``bench/mock_server.py``) and runs the pipeline against it, either
+in-process through ``translate_srt_file`` or through ``main.py``. Every
+scenario runs in a fresh subprocess with its own working directory (and
+therefore its own ``data/cache_db``), so peak RSS and cache numbers are
+not polluted by earlier runs.
+
+Examples:
+    python bench/run_bench.py --sizes 200,2000 --files 2 --repeat 0.3 --passes 2
+    python bench/run_bench.py --mode main --latency lognormal:-3,0.5 --rate-429 0.01
+    python bench/run_bench.py --compare data/logs/bench-old.json data/logs/bench-new.json
+
+The report is JSON (default ``data/logs/bench-<timestamp>.json``); compare
+two reports to see the change between versions.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RESULT_MARKER = "BENCH_RESULT "
+
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+
+def peak_rss_kb():
+    """Peak resident set size of the current process in KiB (None if unknown)."""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS reports bytes, Linux reports KiB
+        return peak // 1024 if sys.platform == "darwin" else peak
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.PeakWorkingSetSize // 1024
+        except Exception:
+            pass
+    return None
+
+
+# ----------------------
+# Worker (runs inside the scenario subprocess)
+# ----------------------
+def _run_worker(mode: str, input_dir: str, output_dir: str) -> dict:
+    from ds_translator import db
+
+    lookups = 0
+    hits = 0
+    _orig_get = db.get_translation_from_db
+
+    def _counting_get(text):
+        nonlocal lookups, hits
+        lookups += 1
+        result = _orig_get(text)
+        if result is not None:
+            hits += 1
+        return result
+
+    db.get_translation_from_db = _counting_get
+
+    start = time.perf_counter()
+    if mode == "main":
+        import runpy
+
+        sys.argv = [str(REPO_ROOT / "main.py")]
+        try:
+            runpy.run_path(str(REPO_ROOT / "main.py"), run_name="__main__")
+        except SystemExit:
+            pass
+    else:
+        from ds_translator.lexicon import ensure_lexicon_exists, load_lexicon
+        from ds_translator.logging_config import init_logging
+        from ds_translator.srt import translate_srt_file
+
+        init_logging()
+        db.init_db()
+        ensure_lexicon_exists()
+        lexicon = load_lexicon()
+        for name in sorted(os.listdir(input_dir)):
+            if not name.lower().endswith(".srt"):
+                continue
+            stem, ext = os.path.splitext(name)
+            translate_srt_file(
+                os.path.join(input_dir, name),
+                os.path.join(output_dir, f"{stem}-roasted{ext}"),
+                lexicon=lexicon,
+                progress_callback=lambda *a, **k: None,
+            )
+    elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed": elapsed,
+        "cache_lookups": lookups,
+        "cache_hits": hits,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+# ----------------------
+# Orchestrator
+# ----------------------
+def _count_cues(input_dir: str) -> tuple[int, int]:
+    from corpus import count_cues
+
+    total = nonempty = 0
+    for name in os.listdir(input_dir):
+        if name.lower().endswith(".srt"):
+            with open(os.path.join(input_dir, name), encoding="utf-8") as f:
+                t, n = count_cues(f.read())
+            total += t
+            nonempty += n
+    return total, nonempty
+
+
+def _http_json(url: str, method: str = "GET") -> dict:
+    req = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def _run_scenario(args, base_url: str, workdir: Path, input_dir: Path, output_dir: Path) -> dict:
+    env = os.environ.copy()
+    env.update({
+        "DEEPSEEK_API_KEY": "sk-bench",
+        "deepseek_api_key": "sk-bench",
+        "deepseek_api_url": base_url,
+        "INPUT_DIR": str(input_dir),
+        "OUTPUT_DIR": str(output_dir),
+        "DS_CONSOLE_LOG": "0",
+        # a service left running elsewhere must not take over the measured run
+        "DS_NO_SERVICE": "1",
+        "PYTHONIOENCODING": "utf-8",
+    })
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()),
+        "--worker", args.mode,
+        "--input", str(input_dir),
+        "--output", str(output_dir),
+    ]
+    proc = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise RuntimeError(f"benchmark worker failed (exit {proc.returncode}):\n{proc.stderr[-4000:]}")
+
+
+def run_benchmarks(args) -> dict:
+    from corpus import write_corpus
+    from mock_server import start_mock_server
+
+    server, base_url = start_mock_server(latency=args.latency, rate_429=args.rate_429, rate_5xx=args.rate_5xx,
+                                         rate_bad=args.rate_bad, seed=args.seed)
+    runs = []
+    try:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory(prefix="ds_bench_") as tmp:
+                workdir = Path(tmp)
+                (workdir / "data" / "cache_db").mkdir(parents=True)
+                (workdir / "data" / "lexicon").mkdir(parents=True)
+                input_dir = workdir / "data" / "subtitle"
+                write_corpus(str(input_dir), args.files, size, repeat_rate=args.repeat, seed=args.seed or 0)
+                total_cues, nonempty = _count_cues(str(input_dir))
+
+                for n in range(1, args.passes + 1):
+                    # each pass writes to a fresh output dir so the "roasted"
+                    # plugin in main mode still sees every file as pending
+                    output_dir = workdir / "data" / f"roast_pass{n}"
+                    output_dir.mkdir()
+                    _http_json(f"{base_url}/reset", method="POST")
+                    result = _run_scenario(args, base_url, workdir, input_dir, output_dir)
+                    mock = _http_json(f"{base_url}/stats")
+
+                    elapsed = result["elapsed"]
+                    lookups = result["cache_lookups"]
+                    run = {
+                        "mode": args.mode,
+                        "cues_per_file": size,
+                        "files": args.files,
+                        "repeat_rate": args.repeat,
+                        "pass": n,
+                        "cues": total_cues,
+                        "nonempty_cues": nonempty,
+                        "elapsed": round(elapsed, 4),
+                        "lines_per_sec": round(total_cues / elapsed, 2) if elapsed > 0 else None,
+                        "api_calls": mock["requests"],
+                        "api_calls_per_line": round(mock["requests"] / total_cues, 4) if total_cues else None,
+                        "cache_lookups": lookups,
+                        "cache_hits": result["cache_hits"],
+                        "cache_hit_rate": round(result["cache_hits"] / lookups, 4) if lookups else 0.0,
+                        "peak_rss_kb": result["peak_rss_kb"],
+                        "mock": mock,
+                    }
+                    runs.append(run)
+                    print(
+                        f"[bench] {args.mode} size={size} pass={n}: {run['lines_per_sec']} lines/s, "
+                        f"{run['api_calls_per_line']} calls/line, hit={run['cache_hit_rate']:.1%}, "
+                        f"rss={run['peak_rss_kb']} KiB"
+                    )
+    finally:
+        server.shutdown()
+
+    return {
+        "version": _git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "mode": args.mode,
+            "sizes": args.sizes,
+            "files": args.files,
+            "repeat_rate": args.repeat,
+            "passes": args.passes,
+            "latency": args.latency,
+            "rate_429": args.rate_429,
+            "rate_5xx": args.rate_5xx,
+            "rate_bad": args.rate_bad,
+            "seed": args.seed,
+        },
+        "runs": runs,
+    }
+
+
+_COMPARE_FIELDS = ("lines_per_sec", "api_calls_per_line", "cache_hit_rate", "peak_rss_kb")
+
+
+def compare_reports(old_path: str, new_path: str) -> None:
+    """Print a per-scenario comparison of two benchmark reports."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def _key(run):
+        return (run["mode"], run["cues_per_file"], run["files"], run["repeat_rate"], run["pass"])
+
+    old_runs = {_key(r): r for r in old.get("runs", [])}
+    print(f"{old.get('version')} -> {new.get('version')}")
+    for run in new.get("runs", []):
+        base = old_runs.get(_key(run))
+        label = "{} size={} files={} repeat={} pass={}".format(*_key(run))
+        if base is None:
+            print(f"  {label}: (no baseline)")
+            continue
+        parts = []
+        for field in _COMPARE_FIELDS:
+            a, b = base.get(field), run.get(field)
+            if a in (None, 0) or b is None:
+                parts.append(f"{field}={b}")
+            else:
+                parts.append(f"{field}={b} ({(b - a) / a:+.1%})")
+        print(f"  {label}: " + ", ".join(parts))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the translation pipeline against the offline mock API")
+    parser.add_argument("--mode", choices=("inprocess", "main"), default="inprocess", help="drive translate_srt_file directly or run main.py")
+    parser.add_argument("--sizes", default="200,1000", help="comma-separated cue counts per file")
+    parser.add_argument("--files", type=int, default=2, help="files per corpus")
+    parser.add_argument("--repeat", type=float, default=0.3, help="share of cues repeating an earlier line")
+    parser.add_argument("--passes", type=int, default=2, help="passes per corpus (pass 2+ runs on a warm cache)")
+    parser.add_argument("--latency", default="fixed:0.005", help="mock latency spec (see bench/mock_server.py)")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-5xx", type=float, default=0.0)
+    parser.add_argument("--rate-bad", type=float, default=0.0, help="fraction of replies that fail the sanity checks")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="report path (default data/logs/bench-<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two reports and exit")
+    parser.add_argument("--worker", choices=("inprocess", "main"), help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        result = _run_worker(args.worker, args.input, args.output)
+        print(RESULT_MARKER + json.dumps(result))
+        return
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    args.sizes = [int(s) for s in str(args.sizes).split(",") if s.strip()]
+    report = run_benchmarks(args)
+
+    out = args.out
+    if not out:
+        logs_dir = REPO_ROOT / "data" / "logs"
+        logs_dir.mkdir(parents=True, exist_ok=True)
+        out = str(logs_dir / f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[bench] report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Equivalence check and benchmark for the compiled SRT helpers.
+
+``ds_translator/_srt_speedups.pyx`` must return exactly what the
+pure-Python ``parse_srt`` / ``rebuild_srt`` / ``_build_context`` in
+``ds_translator/srt.py`` return. ``--check`` compares both on a fuzzed
+corpus of malformed SRT (stray lines, CRLF, full-width spaces, Unicode
+digits, missing timecodes, multi-line cues); the default mode times both
+on large synthetic files.
+
+Examples:
+    python ds_translator/setup.py build_ext --inplace
+    python bench/srt_speedups.py --check --cases 2000
+    python bench/srt_speedups.py --cues 100000 --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import generate_srt, random_line  # noqa: E402
+from ds_translator import srt  # noqa: E402
+
+_BLANKS = ["", " ", "\t", "　", "\r", "  \r"]
+_INDEXES = ["1", "12", " 7 ", "０", "²", "3a", "-1", "", "٣"]
+_TIMECODES = [
+    "00:00:01,000 --> 00:00:02,000",
+    " 00:00:01,000-->00:00:02,000 \r",
+    "00:00:01,000 -> 00:00:02,000",
+    "-->",
+    "",
+]
+
+
+def _fuzz_srt(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(0, 30)):
+        roll = rng.random()
+        if roll < 0.6:
+            parts.append(rng.choice(_INDEXES))
+            parts.append(rng.choice(_TIMECODES))
+            for _ in range(rng.choice([0, 1, 1, 1, 2, 3])):
+                parts.append(rng.choice(["", " "]) + random_line(rng) + rng.choice(["", " ", "\r", "　"]))
+            parts.extend(rng.choice(_BLANKS) for _ in range(rng.choice([0, 1, 1, 2])))
+        elif roll < 0.8:
+            parts.append(rng.choice(_BLANKS))
+        else:
+            parts.append(random_line(rng))
+    sep = rng.choice(["\n", "\n", "\r\n"])
+    return rng.choice(["", " \n", "﻿"]) + sep.join(parts) + rng.choice(["", "\n", "\n\n  "])
+
+
+def _fuzz_subs(rng: random.Random) -> list:
+    return [
+        (str(k), rng.choice(_TIMECODES), rng.choice(["", random_line(rng)]), rng.choice(["", "译文", "多行\n译文"]))
+        for k in range(rng.randint(0, 12))
+    ]
+
+
+def check(cases: int, seed: int) -> int:
+    """Compare compiled and pure-Python results; returns the number of mismatches."""
+    rng = random.Random(seed)
+    failures = 0
+    for case in range(cases):
+        content = _fuzz_srt(rng)
+        expected = srt.py_parse_srt(content)
+        got = srt.parse_srt(content)
+        if got != expected:
+            failures += 1
+            print(f"[check] parse_srt mismatch in case {case}: {content!r}")
+        subs = _fuzz_subs(rng)
+        if srt.rebuild_srt(subs) != srt.py_rebuild_srt(subs):
+            failures += 1
+            print(f"[check] rebuild_srt mismatch in case {case}: {subs!r}")
+        if expected:
+            for i in range(-len(expected), len(expected)):
+                for window in (-1, 0, 1, 2, 5):
+                    if srt._build_context(expected, i, window) != srt.py_build_context(expected, i, window):
+                        failures += 1
+                        print(f"[check] _build_context mismatch in case {case} (i={i}, window={window})")
+    return failures
+
+
+def _best_of(repeat: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _contexts(build, subtitles) -> None:
+    for i in range(len(subtitles)):
+        build(subtitles, i, 1)
+
+
+def benchmark(cues: int, repeat: int, seed: int) -> None:
+    content = generate_srt(cues, seed=seed)
+    subtitles = srt.py_parse_srt(content)
+    translated = [(idx, tc, text, text) for idx, tc, text in subtitles]
+    rows = [
+        ("parse_srt", srt.py_parse_srt, srt.parse_srt, (content,)),
+        ("rebuild_srt", srt.py_rebuild_srt, srt.rebuild_srt, (translated,)),
+        ("_build_context (all cues)", lambda s: _contexts(srt.py_build_context, s), lambda s: _contexts(srt._build_context, s), (subtitles,)),
+    ]
+    print(f"[bench] {len(subtitles)} cues, best of {repeat}")
+    for name, pure, fast, args in rows:
+        t_pure = _best_of(repeat, pure, *args)
+        t_fast = _best_of(repeat, fast, *args)
+        print(f"  {name:<26} python {t_pure * 1000:8.1f} ms   compiled {t_fast * 1000:8.1f} ms   x{t_pure / t_fast:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and benchmark the compiled SRT helpers")
+    parser.add_argument("--check", action="store_true", help="run the fuzzed equivalence check instead of the benchmark")
+    parser.add_argument("--cases", type=int, default=1000, help="fuzzed documents for --check")
+    parser.add_argument("--cues", type=int, default=100_000, help="cues in the benchmark file")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions (best is reported)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not srt.SPEEDUPS:
+        print("[bench] compiled helpers not available; build them with: python ds_translator/setup.py build_ext --inplace")
+        return 1
+    if args.check:
+        failures = check(args.cases, args.seed)
+        print(f"[check] {args.cases} fuzzed cases, {failures} mismatch(es)")
+        return 1 if failures else 0
+    benchmark(args.cues, args.repeat, args.seed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
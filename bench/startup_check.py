@@ -0,0 +1,137 @@
+"""``-X importtime`` regression check for CLI startup.
+
+Runs ``main.py`` in runs that should exit almost immediately and fails
+when one of them imports a module it has no use for (the API client and
+``requests``, the service, Rich progress, the profilers, ...). It also
+reports the total import time and the best wall time of each scenario,
+and fails when a wall time exceeds ``--budget-ms``.
+
+Scenarios (each in a fresh temporary working directory):
+    no-key    no API key configured
+    nothing   the only input file is already translated
+    plan      ``--plan`` over one small pending file
+    plan-no-key  the same without an API key (must still print the plan)
+
+Example:
+    python bench/startup_check.py --runs 10 --budget-ms 150
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+MAIN = REPO_ROOT / "main.py"
+
+# never needed before the first cue is translated
+_ALWAYS_FORBIDDEN = {
+    "requests", "urllib3", "http.server", "rich.progress", "cProfile", "tracemalloc", "ctypes",
+    "ds_translator.service", "ds_translator.watch", "ds_translator.rich_progress",
+}
+# additionally forbidden when nothing is parsed or planned
+_TRIVIAL_FORBIDDEN = {"sqlite3", "ds_translator.api", "ds_translator.db", "ds_translator.srt", "ds_translator.planner"}
+
+SCENARIOS = ("no-key", "nothing", "plan", "plan-no-key")
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+_SRT = "1\n00:00:01,000 --> 00:00:02,000\nこんにちは\n\n2\n00:00:03,000 --> 00:00:04,000\n今日はよろしくお願いします！\n"
+
+
+def _prepare(workdir: Path, scenario: str) -> tuple[dict, list[str]]:
+    input_dir = workdir / "data" / "subtitle"
+    output_dir = workdir / "data" / "roast"
+    for d in (input_dir, output_dir, workdir / "data" / "lexicon", workdir / "data" / "cache_db"):
+        d.mkdir(parents=True, exist_ok=True)
+    (input_dir / "a.srt").write_text(_SRT, encoding="utf-8")
+    env = dict(os.environ)
+    env.update({
+        "INPUT_DIR": str(input_dir),
+        "OUTPUT_DIR": str(output_dir),
+        "DS_NO_SERVICE": "1",
+        "DS_MANIFEST": str(workdir / "data" / "manifest.json"),
+        "DS_RETRY_LOG": str(workdir / "retry.log"),
+        "DEEPSEEK_API_KEY": "sk-startup-check",
+        "deepseek_api_key": "sk-startup-check",
+    })
+    args: list[str] = []
+    if scenario == "no-key":
+        # an empty value also keeps the repository .env from filling it in
+        env["DEEPSEEK_API_KEY"] = env["deepseek_api_key"] = ""
+    elif scenario == "nothing":
+        (output_dir / "a-roasted.srt").write_text("done\n", encoding="utf-8")
+    elif scenario in ("plan", "plan-no-key"):
+        args = ["--plan"]
+        if scenario == "plan-no-key":
+            env["DEEPSEEK_API_KEY"] = env["deepseek_api_key"] = ""
+    return env, args
+
+
+def _imported(stderr: str) -> tuple[set, int]:
+    """Module names from ``-X importtime`` output and the summed top-level cumulative time (us)."""
+    names = set()
+    total = 0
+    for line in stderr.splitlines():
+        m = _IMPORT_LINE.match(line)
+        if not m:
+            continue
+        names.add(m.group(4))
+        if len(m.group(3)) == 1:
+            total += int(m.group(2))
+    return names, total
+
+
+def check(scenario: str, runs: int, budget_ms: float) -> list[str]:
+    problems = []
+    with tempfile.TemporaryDirectory(prefix=f"ds-startup-{scenario}-") as tmp:
+        workdir = Path(tmp)
+        env, args = _prepare(workdir, scenario)
+        cmd = [sys.executable, str(MAIN), *args]
+        # warm-up run: byte-compiles sources and lets the manifest adopt outputs
+        subprocess.run(cmd, cwd=workdir, env=env, capture_output=True)
+        result = subprocess.run([sys.executable, "-X", "importtime", *cmd[1:]], cwd=workdir, env=env, capture_output=True, text=True)
+        names, total_us = _imported(result.stderr)
+        forbidden = set(_ALWAYS_FORBIDDEN)
+        if not scenario.startswith("plan"):
+            forbidden |= _TRIVIAL_FORBIDDEN
+        for name in sorted(names & forbidden):
+            problems.append(f"{scenario}: imports {name}")
+        if scenario.startswith("plan") and "[PLAN]" not in result.stdout:
+            problems.append(f"{scenario}: no plan printed (exit {result.returncode})")
+
+        best = float("inf")
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(cmd, cwd=workdir, env=env, capture_output=True)
+            best = min(best, time.perf_counter() - start)
+        print(f"[startup] {scenario:<11} wall {best * 1000:6.1f} ms (best of {runs}), imports {total_us / 1000:6.1f} ms, {len(names)} modules")
+        if budget_ms and best * 1000 > budget_ms:
+            problems.append(f"{scenario}: {best * 1000:.1f} ms exceeds the {budget_ms:g} ms budget")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that trivial main.py runs import only what they need")
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per scenario (best is reported)")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail when a scenario's best wall time exceeds this (0 = report only)")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="run only these scenarios")
+    args = parser.parse_args(argv)
+
+    problems = []
+    for scenario in args.scenario or SCENARIOS:
+        problems.extend(check(scenario, args.runs, args.budget_ms))
+    for problem in problems:
+        print(f"[startup] FAIL {problem}")
+    if not problems:
+        print("[startup] OK")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# cython: language_level=3
+"""Compiled versions of the SRT hot loops in ``ds_translator.srt``.
+
+Same API and results as ``srt.py_parse_srt``, ``srt.py_rebuild_srt`` and
+``srt.py_build_context`` (checked by ``bench/srt_speedups.py --check``).
+``srt.py`` imports this module when it has been built and falls back to
+the pure-Python code otherwise. Build it in place with
+
+    python ds_translator/setup.py build_ext --inplace
+"""
+
+
+def parse_srt(content):
+    """更鲁棒地解析 SRT 字幕内容"""
+    cdef list lines = content.strip().split('\n')
+    cdef Py_ssize_t n = len(lines)
+    cdef Py_ssize_t i = 0
+    cdef Py_ssize_t start
+    cdef list stripped = [None] * n
+    cdef list subtitles = []
+    cdef str line, index, timecode
+    # every line is compared in its stripped form; strip each one once
+    for i in range(n):
+        stripped[i] = (<str>lines[i]).strip()
+    i = 0
+    while i < n:
+        line = <str>stripped[i]
+        if not line or not line.isdigit():
+            i += 1
+            continue
+        index = line
+        i += 1
+        # '-->' has no whitespace, so testing the stripped line is equivalent
+        if i >= n or '-->' not in <str>stripped[i]:
+            i += 1
+            continue
+        timecode = <str>stripped[i]
+        i += 1
+        start = i
+        while i < n and (<str>stripped[i]):
+            i += 1
+        if i - start == 1:
+            text = stripped[start]
+        else:
+            text = ' '.join(stripped[start:i]).strip()
+        subtitles.append((index, timecode, text))
+        while i < n and not (<str>stripped[i]):
+            i += 1
+    return subtitles
+
+
+def rebuild_srt(translated_subs):
+    """重组双语字幕"""
+    cdef list subs = translated_subs if type(translated_subs) is list else list(translated_subs)
+    cdef Py_ssize_t n = len(subs)
+    cdef Py_ssize_t k
+    cdef list lines = [""] * (5 * n)
+    for k in range(n):
+        idx, timecode, original, trans = subs[k]
+        lines[5 * k] = idx
+        lines[5 * k + 1] = timecode
+        lines[5 * k + 2] = original
+        lines[5 * k + 3] = trans
+    return "\n".join(lines)
+
+
+def _build_context(subtitles, Py_ssize_t i, Py_ssize_t window_size=1):
+    """Build the prompt context for cue ``i``: previous line(s), [NOW], next line(s)."""
+    cdef Py_ssize_t n = len(subtitles)
+    cdef Py_ssize_t lo, hi, k
+    cdef list parts
+    text = subtitles[i][2]
+    if i < 0 or window_size < 0:
+        # keep the exact slicing semantics of the pure-Python version
+        before = "\n".join([s[2] for s in subtitles[max(0, i - window_size):i]])
+        after = "\n".join([s[2] for s in subtitles[i + 1:i + 1 + window_size]])
+        parts = ["[BEFORE] " + before] if before else []
+        parts.append("[NOW] " + text)
+        if after:
+            parts.append("[AFTER] " + after)
+        return "\n".join(parts)
+    lo = i - window_size
+    if lo < 0:
+        lo = 0
+    hi = i + 1 + window_size
+    if hi > n:
+        hi = n
+    parts = []
+    if lo < i:
+        joined = "\n".join([subtitles[k][2] for k in range(lo, i)])
+        if joined:
+            parts.append("[BEFORE] " + joined)
+    parts.append("[NOW] " + text)
+    if i + 1 < hi:
+        joined = "\n".join([subtitles[k][2] for k in range(i + 1, hi)])
+        if joined:
+            parts.append("[AFTER] " + joined)
+    return "\n".join(parts)
@@ -2,37 +2,31 @@ import os
 import time
 import threading
 import concurrent.futures
-import requests
 import logging
+from collections import Counter
 from ds_translator import db as db
+from ds_translator import fastpath
 from ds_translator import lexicon as lex
-from ds_translator.logging_config import init_logging
-
-# initialize package logger
-logger = init_logging()
+from ds_translator import events
+from ds_translator import metrics
+from ds_translator import routing
+from ds_translator import settings
+from ds_translator import validate
+
+# package logger (configured by init_logging in main / the service)
+logger = logging.getLogger("ds_translator")
 # dedicated retry logger (writes to file via logging_config)
 retry_logger = logging.getLogger("ds_translator.retry")
 
-# Load configuration from env (expect load_dotenv to be called by caller/main)
-API_KEY = os.getenv("deepseek_api_key")
-API_BASE = os.getenv("deepseek_api_url", "https://api.deepseek.com/")
-MODEL = os.getenv("deepseek_model", "deepseek-chat")
-
-HEADERS = {
-    "Authorization": f"Bearer {API_KEY}" if API_KEY else "",
-    "Content-Type": "application/json"
-}
-
-# Retry worker configuration (env-driven)
-# seconds to wait between worker requests (throttle)
-RETRY_REQUEST_INTERVAL_SECONDS = float(os.getenv("RETRY_REQUEST_INTERVAL_SECONDS", "1.0"))
-# maximum concurrent worker threads (reserved for future/concurrency expansion)
-RETRY_MAX_CONCURRENCY = int(os.getenv("RETRY_MAX_CONCURRENCY", "1"))
-# if RETRY_MAX_ATTEMPTS > 0, items will be dropped after that many attempts; 0 means infinite attempts
-try:
-    RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "0"))
-except Exception:
-    RETRY_MAX_ATTEMPTS = 0
+# Shared HTTP session: keeps TCP/TLS connections to the API alive between
+# requests (and across jobs in long-running modes) instead of reconnecting
+# for every cue.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+# Where translations came from during this run (lexicon / fastpath / cache / api / failed)
+_source_counts = Counter()
+_source_lock = threading.Lock()
 
 # internal worker handle
 _retry_worker_thread = None
@@ -58,51 +52,81 @@ def _mask_auth_header(headers: dict) -> dict:
     return h
 
 
-def translate_text(text, retry=40, lexicon=None, max_chars=None, context=None):
-    """Translate text using lexicon -> DB cache -> external API.
+def _headers():
+    """Request headers built from the current settings (API key, JSON body)."""
+    api_key = settings.get().api_key
+    return {
+        "Authorization": f"Bearer {api_key}" if api_key else "",
+        "Content-Type": "application/json"
+    }
 
-    Returns the translated string. On failure returns "[翻译失败]" and caches it.
+
+def _get_http_session():
+    """Return the process-wide requests.Session, creating it on first use.
+
+    ``requests`` is imported here rather than at module import so that
+    runs which never reach the API do not pay for loading it.
     """
-    text = text.strip()
-    if not text:
-        return ""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests
+
+                session = requests.Session()
+                session.headers.update(_headers())
+                _http_session = session
+    return _http_session
+
+
+def _post_chat_completion(payload, route="foreground"):
+    """POST to the chat-completions endpoint and record HTTP wait / in-flight metrics."""
+    metrics.gauge_add("api.in_flight", 1)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = _get_http_session().post(f"{settings.get().api_base}/chat/completions", json=payload, timeout=30)
+        status = response.status_code
+        return response
+    finally:
+        metrics.gauge_add("api.in_flight", -1)
+        metrics.observe("api.http", time.perf_counter() - start, route=route)
+        metrics.inc("api.http_status", route=route, status=status)
 
-    # 0. Lexicon (user editable) exact match
-    if lexicon is None:
-        lexicon = lex.load_lexicon()
-    lex_trans = lex.get_lexicon_translation(text, lexicon)
-    if lex_trans is not None:
-        return lex_trans
 
-    # 1. DB cache
-    cached = db.get_translation_from_db(text)
-    if cached is not None:
-        return cached
+def _record_usage(result, route="foreground"):
+    """Add the token counts of a completion response to the metrics counters."""
+    if not metrics.enabled():
+        return
+    usage = result.get("usage") or {}
+    for field in ("prompt_tokens", "completion_tokens", "prompt_cache_hit_tokens"):
+        if usage.get(field):
+            metrics.inc("api.tokens", usage[field], route=route, kind=field)
 
-    # 2. External API
+
+def _note_source(source):
+    """Record where a translation came from (lexicon / fastpath / cache / api / failed)."""
+    with _source_lock:
+        _source_counts[source] += 1
+    metrics.inc("api.source", source=source)
+    events.publish("lookup", source=source)
+
+
+def source_counts():
+    """Return a copy of the per-source translation counts since the last reset."""
+    with _source_lock:
+        return dict(_source_counts)
+
+
+def reset_source_counts():
+    with _source_lock:
+        _source_counts.clear()
+
+
+def _build_full_messages(text, lexicon, max_chars=None, context=None):
+    """Full prompt: style guide, lexicon mapping and neighbouring lines as context."""
     # If a lexicon dict is provided, include a truncated formatted mapping in the system prompt so the model
     # preferentially uses those translations. Keep the lexicon chunk size limited to avoid overly long prompts.
-    def _format_lexicon_for_prompt(lexicon_dict, max_chars=1500):
-        if not lexicon_dict:
-            return ""
-        # create lines like: original -> translation
-        lines = []
-        for k, v in lexicon_dict.items():
-            lines.append(f"{k} -> {v}")
-        s = "\n".join(lines)
-        if len(s) <= max_chars:
-            return s
-        # otherwise truncate by entries until under limit
-        out = []
-        total = 0
-        for k, v in lexicon_dict.items():
-            line = f"{k} -> {v}\n"
-            if total + len(line) > max_chars:
-                break
-            out.append(line.strip())
-            total += len(line)
-        return "\n".join(out)
-
     # Determine the maximum chars to send from env or passed-in parameter
     try:
         env_max = int(os.getenv("LEXICON_MAX_CHARS", "1500"))
@@ -118,7 +142,7 @@ def translate_text(text, retry=40, lexicon=None, max_chars=None, context=None):
             - 使用中文全角标点，感叹号/问号可重复（！！？？）表达情绪
             - 不要解释，只输出译文
             - 不要添加额外说明"""  
-    lex_prompt = _format_lexicon_for_prompt(lexicon, max_chars=max_chars)
+    lex_prompt = lex.format_for_prompt(lexicon, max_chars, text)
     if lex_prompt:
         system_content = base_system + "\n\n优先使用下列词典映射（若存在完全匹配，请直接使用对应翻译）：\n" + lex_prompt
     else:
@@ -141,27 +165,88 @@ def translate_text(text, retry=40, lexicon=None, max_chars=None, context=None):
         messages.append({"role": "user", "content": "上下文（仅供参考）：\n" + ctx + "\n\n请只翻译标记为 [NOW] 的那一行，且仅输出译文。"})
 
     messages.append({"role": "user", "content": text})
+    return messages
+
+
+def translate_text(text, retry=40, lexicon=None, max_chars=None, context=None, suspects=None):
+    """Translate text using lexicon -> local fast path -> DB cache -> external API.
+
+    Returns the translated string. On failure returns "[翻译失败]" and caches it.
+    API replies that fail ``validate.check`` are not cached: with a
+    ``suspects`` list they are appended to it (and returned) for a batched
+    re-translation by the caller, otherwise they go to the retry queue.
+    """
+    text = text.strip()
+    if not text:
+        return ""
+
+    # 0. Lexicon (user editable) exact match
+    with metrics.timer("api.lexicon_lookup"):
+        if lexicon is None:
+            lexicon = lex.shared_store().get()
+        lex_trans = lex.get_lexicon_translation(text, lexicon)
+    if lex_trans is not None:
+        _note_source("lexicon")
+        return lex_trans
+
+    # 0.5 Rule-based fast path for interjections / laughter / sound effects
+    if fastpath.enabled():
+        with metrics.timer("api.fastpath_lookup"):
+            fast = fastpath.lookup(text)
+        if fast is not None:
+            metrics.inc("api.fastpath", kind=fast[1])
+            _note_source("fastpath")
+            return fast[0]
+
+    # 1. DB cache
+    cached = db.get_translation_from_db(text)
+    if cached is not None:
+        _note_source("cache")
+        return cached
+
+    # 2. External API
+    route = routing.choose(text, lexicon)
+    if route.compact:
+        messages = routing.compact_messages(text, lexicon)
+    else:
+        messages = _build_full_messages(text, lexicon, max_chars=max_chars, context=context)
 
     payload = {
-        "model": MODEL,
+        "model": route.model,
         "messages": messages,
         "temperature": 0.1,
-        "max_tokens": 200
+        "max_tokens": route.max_tokens
     }
+    metrics.inc("api.route", route=route.name)
     last_error = None
     for attempt in range(retry):
         try:
             # log the outgoing request headers (mask token for safety)
-            logger.debug("API request headers: %s", _mask_auth_header(HEADERS))
-            response = requests.post(f"{API_BASE}/chat/completions", headers=HEADERS, json=payload, timeout=30)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("API request headers: %s", _mask_auth_header(_get_http_session().headers))
+            start = time.perf_counter()
+            response = _post_chat_completion(payload)
             if response.status_code == 200:
                 result = response.json()
+                _record_usage(result)
+                routing.record(route.name, time.perf_counter() - start, result.get("usage"))
                 translated = result["choices"][0]["message"]["content"].strip()
-                db.save_translation_to_db(text, translated)
-                return translated
+                reasons = validate.check(text, translated, context) if validate.enabled() else []
+                validate.note(reasons)
+                if not reasons:
+                    db.save_translation_to_db(text, translated)
+                    _note_source("api")
+                    return translated
+                if suspects is not None:
+                    suspects.append(validate.Suspect(text, translated, reasons))
+                    _note_source("api")
+                    return translated
+                last_error = f"可疑译文（{validate.describe(reasons)}）: {translated[:80]}"
+                break
             elif response.status_code == 429:
                 wait = min(2 ** attempt, 3600)
                 last_error = f"429 Too Many Requests"
+                metrics.inc("api.retries", reason="429")
                 logger.warning("请求过于频繁，等待 %s 秒后重试...", wait)
                 time.sleep(wait)
             else:
@@ -177,7 +262,10 @@ def translate_text(text, retry=40, lexicon=None, max_chars=None, context=None):
                 break
         except Exception as e:
             last_error = str(e)
-            logger.exception("连接异常: %s", e)
+            metrics.inc("api.retries", reason="connection")
+            # Keep the console to one line per failure (repeats are collapsed
+            # by the logging listener); the full traceback goes to retry.log.
+            logger.warning("连接异常: %s", e)
             # also persist connection exceptions to retry log
             try:
                 retry_logger.exception("连接异常: %s", e)
@@ -190,11 +278,13 @@ def translate_text(text, retry=40, lexicon=None, max_chars=None, context=None):
     # "[翻译失败]" marker into the cache, enqueue for persistent background retries.
     try:
         db.enqueue_retry(text, error_text=last_error)
+        events.publish("retry_enqueued", text=text)
         retry_logger.info("已将文本加入重试队列（持久化）：%s", text)
     except Exception as e:
         # write enqueue failures to retry log file as well
         retry_logger.exception("加入重试队列失败: %s", e)
 
+    _note_source("failed")
     return "[翻译失败]"
 
 
@@ -213,10 +303,7 @@ def _attempt_translate_once(text, lexicon=None, max_chars=None, context=None):
         except Exception:
             env_max = 1500
         max_chars = max_chars or env_max
-        # build small mapping
-        lines = [f"{k} -> {v}" for k, v in lexicon.items()]
-        s = "\n".join(lines)
-        lex_prompt = s[:max_chars]
+        lex_prompt = lex.format_for_prompt(lexicon, max_chars, text)
     if lex_prompt:
         system_content = base_system + "\n\n优先使用下列词典映射（若存在完全匹配，请直接使用对应翻译）：\n" + lex_prompt
     else:
@@ -236,17 +323,19 @@ def _attempt_translate_once(text, lexicon=None, max_chars=None, context=None):
     messages.append({"role": "user", "content": text})
 
     payload = {
-        "model": MODEL,
+        "model": settings.get().model,
         "messages": messages,
         "temperature": 0.1,
-        "max_tokens": 200
+        "max_tokens": routing.max_tokens_for(text)
     }
 
     try:
-        logger.debug("Retry worker calling API headers: %s", _mask_auth_header(HEADERS))
-        response = requests.post(f"{API_BASE}/chat/completions", headers=HEADERS, json=payload, timeout=30)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Retry worker calling API headers: %s", _mask_auth_header(_get_http_session().headers))
+        response = _post_chat_completion(payload, route="retry")
         if response.status_code == 200:
             result = response.json()
+            _record_usage(result, route="retry")
             translated = result["choices"][0]["message"]["content"].strip()
             return True, translated
         else:
@@ -261,25 +350,37 @@ def _retry_worker_loop():
     It respects RETRY_REQUEST_INTERVAL_SECONDS between attempts and uses exponential
     backoff by updating the retry row via db.increment_retry().
     """
-    retry_logger.info("重试工作线程已启动 (间隔 %.2fs, max_attempts=%s, concurrency=%s)", RETRY_REQUEST_INTERVAL_SECONDS, RETRY_MAX_ATTEMPTS or "∞", RETRY_MAX_CONCURRENCY)
+    cfg = settings.get()
+    interval = cfg.retry_request_interval
+    max_attempts = cfg.retry_max_attempts
+    concurrency = max(1, cfg.retry_max_concurrency)
+    retry_logger.info("重试工作线程已启动 (间隔 %.2fs, max_attempts=%s, concurrency=%s)", interval, max_attempts or "∞", concurrency)
 
     def _process_item(item):
         try:
             original = item["original"] if isinstance(item, dict) else item[0]
             attempts = item.get("attempts", 0) if isinstance(item, dict) else 0
 
-            if RETRY_MAX_ATTEMPTS > 0 and attempts >= RETRY_MAX_ATTEMPTS:
+            if max_attempts > 0 and attempts >= max_attempts:
+                metrics.inc("retry.outcome", result="dropped")
                 retry_logger.warning("重试次数已达上限，放弃: %s", original)
                 db.save_translation_to_db(original, "[翻译失败]")
                 db.remove_retry(original)
                 return
 
-            success, result = _attempt_translate_once(original, lexicon=None)
+            # the retry queue does not record the show, so use the global lexicon
+            success, result = _attempt_translate_once(original, lexicon=lex.shared_store().get())
+            if success and validate.enabled():
+                reasons = validate.check(original, result)
+                if reasons:
+                    success, result = False, f"可疑译文（{validate.describe(reasons)}）: {result[:80]}"
             if success:
+                metrics.inc("retry.outcome", result="success")
                 retry_logger.info("重试成功，保存翻译：%s", original)
                 db.save_translation_to_db(original, result)
                 db.remove_retry(original)
             else:
+                metrics.inc("retry.outcome", result="failed")
                 retry_logger.info("重试失败（将安排下一次尝试）：%s -> %s", original, result)
                 db.increment_retry(original, error_text=result)
 
@@ -290,14 +391,14 @@ def _retry_worker_loop():
     # Create executor if not present
     if _retry_executor is None:
         # ThreadPoolExecutor threads are non-daemon by default; that's acceptable for long-running apps.
-        _retry_executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, RETRY_MAX_CONCURRENCY), thread_name_prefix="ds_retry")
+        _retry_executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ds_retry")
         _retry_futures = set()
 
     while True:
         try:
             items = db.get_due_retries(limit=50)
             if not items:
-                time.sleep(RETRY_REQUEST_INTERVAL_SECONDS)
+                time.sleep(interval)
                 continue
 
             # prune completed futures
@@ -305,20 +406,20 @@ def _retry_worker_loop():
 
             for it in items:
                 # if we've saturated concurrency, wait a bit and re-check
-                if len([f for f in _retry_futures if not f.done()]) >= max(1, RETRY_MAX_CONCURRENCY):
+                if len([f for f in _retry_futures if not f.done()]) >= concurrency:
                     break
 
                 fut = _retry_executor.submit(_process_item, it)
                 _retry_futures.add(fut)
                 # throttle submission rate to avoid bursts
-                time.sleep(RETRY_REQUEST_INTERVAL_SECONDS)
+                time.sleep(interval)
 
             # small sleep before next fetch cycle
-            time.sleep(RETRY_REQUEST_INTERVAL_SECONDS)
+            time.sleep(interval)
 
         except Exception as e:
             logger.exception("重试工作线程异常: %s", e)
-            time.sleep(RETRY_REQUEST_INTERVAL_SECONDS)
+            time.sleep(interval)
 
 
 def start_retry_worker():
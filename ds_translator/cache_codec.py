@@ -0,0 +1,292 @@
+"""Compressed storage of cached translations.
+
+Cached translations are short CJK strings, a few dozen bytes of UTF-8
+each. On their own they barely compress, but against a dictionary
+trained on the cache's own translations they do. A compressed value is
+stored as a BLOB: one byte naming the dictionary (``codec_dict.id``)
+followed by the compressed UTF-8 text. Plain TEXT values stay readable,
+so a cache can hold both kinds and be migrated in place. ``[翻译失败]``
+markers, and values that would not get smaller, are always stored as
+plain text, so SQL that looks for markers keeps working.
+
+Codecs:
+    zstd  zstd with a trained dictionary (needs the optional ``zstandard``
+          package, imported only when a zstd dictionary is in use)
+    zlib  raw deflate with a preset dictionary of the most frequent
+          substrings; standard library only
+    auto  trains both (zlib only without ``zstandard``) on most of the
+          sample and keeps the one that stores the rest smaller. On
+          subtitle-length strings zstd's frame header often costs more
+          than its better matching gains, so zlib regularly wins
+
+``db`` encodes and decodes behind ``get_translation_from_db`` /
+``save_translation_to_db`` and the bulk helpers, so callers only ever see
+``str``. ``migrate(kind)`` (``main.py --compress-cache [auto|zstd|zlib|off]``)
+trains a dictionary from a sample of the cache, re-encodes every row in
+chunks (one transaction each, so an interrupted run leaves a readable
+mix) and runs a full ``VACUUM`` so the file actually shrinks. ``off``
+turns every value back into plain text. Dictionaries are kept (they are
+small), so a long-running process that loaded them before a migration
+keeps writing values everyone can read; it picks up the new dictionary
+when restarted. The tag byte allows ids 1-255; once they are used up, a
+migration replaces the oldest dictionary that no stored value refers to.
+
+Environment:
+    DS_CACHE_DICT_KB       dictionary size in KiB (default 32; zlib uses at most 32)
+    DS_CACHE_DICT_SAMPLES  translations sampled for training (default 20000)
+"""
+from __future__ import annotations
+
+import collections
+import importlib.util
+import logging
+import os
+import time
+import zlib
+from typing import Optional, Union
+
+logger = logging.getLogger("ds_translator.cache_codec")
+
+KINDS = ("zstd", "zlib")
+# values never compressed (db and maintenance match them in SQL)
+PLAIN = frozenset(["[翻译失败]"])
+ZSTD_LEVEL = 19
+# dictionary ids must fit the one-byte tag
+MAX_DICT_ID = 255
+_ZLIB_WINDOW = 32 * 1024
+# stripped from stored zstd frames and put back before decompressing; the
+# library's magicless frame format is not read back consistently by every
+# zstandard release
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class UnknownCodec(KeyError):
+    """A BLOB names a dictionary this connection has not loaded."""
+
+
+def zstd_available() -> bool:
+    return importlib.util.find_spec("zstandard") is not None
+
+
+class Codec:
+    """Compressor/decompressor pair for one dictionary (not thread-safe; db keeps one per thread)."""
+
+    def __init__(self, kind: str, data: bytes):
+        self.kind = kind
+        if kind == "zstd":
+            import zstandard
+
+            params = zstandard.ZstdCompressionParameters.from_level(
+                ZSTD_LEVEL, write_checksum=False, write_dict_id=False, write_content_size=True,
+            )
+            zdict = zstandard.ZstdCompressionDict(data)
+            self._zstd_c = zstandard.ZstdCompressor(dict_data=zdict, compression_params=params)
+            self._zstd_d = zstandard.ZstdDecompressor(dict_data=zdict)
+        elif kind == "zlib":
+            # primed once; copy() reuses the dictionary without hashing it again
+            self._zlib_c = zlib.compressobj(9, zlib.DEFLATED, -15, 8, zlib.Z_DEFAULT_STRATEGY, data)
+            self._zlib_d = zlib.decompressobj(-15, data)
+        else:
+            raise ValueError(f"未知的压缩方式: {kind}")
+
+    def compress(self, raw: bytes) -> bytes:
+        if self.kind == "zstd":
+            frame = self._zstd_c.compress(raw)
+            return frame[len(_ZSTD_MAGIC):] if frame.startswith(_ZSTD_MAGIC) else frame
+        c = self._zlib_c.copy()
+        return c.compress(raw) + c.flush()
+
+    def decompress(self, payload: bytes) -> bytes:
+        if self.kind == "zstd":
+            return self._zstd_d.decompress(_ZSTD_MAGIC + payload)
+        d = self._zlib_d.copy()
+        return d.decompress(payload) + d.flush()
+
+
+class CodecSet:
+    """The dictionaries of one database, built from its ``codec_dict`` rows (id, kind, data, active)."""
+
+    def __init__(self, rows=()):
+        self._codecs: dict[int, Codec] = {}
+        self._unavailable: set[int] = set()
+        self.active: Optional[int] = None
+        for ident, kind, data, active in rows:
+            try:
+                self._codecs[ident] = Codec(kind, data)
+            except (ImportError, ValueError) as e:
+                self._unavailable.add(ident)
+                logger.warning(f"无法加载缓存压缩字典 {ident} ({kind}): {e}；用它压缩的条目视为未缓存")
+                continue
+            if active:
+                self.active = ident
+
+    @property
+    def unavailable(self) -> list[int]:
+        """Ids of dictionaries that could not be loaded (e.g. zstd without ``zstandard``)."""
+        return sorted(self._unavailable)
+
+    def encode(self, text: str) -> Union[str, bytes]:
+        """What to store for ``text``: a tagged BLOB if that is smaller, else ``text`` itself."""
+        if self.active is None or text in PLAIN:
+            return text
+        raw = text.encode("utf-8")
+        blob = bytes((self.active,)) + self._codecs[self.active].compress(raw)
+        return blob if len(blob) < len(raw) else text
+
+    def decode(self, value: Union[str, bytes]) -> Optional[str]:
+        """The text of a stored value; None if its dictionary cannot be used or it is corrupt."""
+        if not isinstance(value, bytes):
+            return value
+        codec = self._codecs.get(value[0]) if value else None
+        if codec is None:
+            if value and value[0] in self._unavailable:
+                return None
+            raise UnknownCodec(value[0] if value else None)
+        try:
+            return codec.decompress(value[1:]).decode("utf-8", "replace")
+        except Exception as e:
+            logger.warning(f"缓存条目解压失败，视为未缓存: {e}")
+            return None
+
+
+def round_trip_failures(codec: Codec, samples: list[str]) -> int:
+    """How many ``samples`` do not decompress back to themselves with ``codec``."""
+    failures = 0
+    for text in samples:
+        raw = text.encode("utf-8")
+        try:
+            if codec.decompress(codec.compress(raw)) != raw:
+                failures += 1
+        except Exception:
+            failures += 1
+    return failures
+
+
+def _train_zlib(samples: list[str], size: int) -> bytes:
+    """A deflate preset dictionary: the most valuable substrings, the best last (closest)."""
+    size = min(size, _ZLIB_WINDOW)
+    counts: collections.Counter = collections.Counter()
+    for text in samples:
+        counts[text] += 1
+        for n in (2, 3, 4, 6, 8):
+            for i in range(len(text) - n + 1):
+                counts[text[i:i + n]] += 1
+    scored = sorted(
+        ((count * len(gram.encode("utf-8")), gram) for gram, count in counts.items() if count > 1),
+        reverse=True,
+    )
+    chosen: list[str] = []
+    joined = ""
+    total = 0
+    for _score, gram in scored[:20_000]:
+        if gram in joined:
+            continue
+        encoded = len(gram.encode("utf-8"))
+        if total + encoded > size:
+            break
+        chosen.append(gram)
+        total += encoded
+        joined += "\x00" + gram
+    return "".join(reversed(chosen)).encode("utf-8")
+
+
+def train(kind: str, samples: list[str], size: int) -> bytes:
+    """Build a dictionary of about ``size`` bytes for ``kind`` from sample translations."""
+    if kind == "zlib":
+        return _train_zlib(samples, size)
+    import zstandard
+
+    data = [s.encode("utf-8") for s in samples]
+    # the trainer wants far more sample bytes than dictionary bytes
+    size = max(1024, min(size, sum(map(len, data)) // 20))
+    try:
+        return zstandard.train_dictionary(size, data, level=ZSTD_LEVEL).as_bytes()
+    except zstandard.ZstdError as e:
+        raise ValueError(f"无法训练 zstd 字典（样本 {len(data)} 条，可能太少）: {e}") from e
+
+
+def choose(kind: str, samples: list[str], size: int) -> tuple[str, bytes]:
+    """(kind, dictionary) to use; ``auto`` compares the candidates on held-out samples."""
+    if kind != "auto":
+        if kind not in KINDS:
+            raise ValueError(f"未知的压缩方式: {kind}")
+        return kind, train(kind, samples, size)
+    candidates = ["zstd", "zlib"] if zstd_available() else ["zlib"]
+    if len(candidates) == 1:
+        return "zlib", train("zlib", samples, size)
+    split = len(samples) * 4 // 5
+    held_out = [s.encode("utf-8") for s in samples[split:]]
+    best = None
+    for candidate in candidates:
+        try:
+            codec = Codec(candidate, train(candidate, samples[:split], size))
+        except ValueError as e:
+            logger.info(f"跳过 {candidate}: {e}")
+            continue
+        if round_trip_failures(codec, samples[split:]):
+            logger.warning(f"跳过 {candidate}: 压缩后无法还原")
+            continue
+        stored = sum(min(len(raw), len(codec.compress(raw)) + 1) for raw in held_out)
+        if best is None or stored < best[0]:
+            best = (stored, candidate)
+    if best is None:
+        # no candidate could be trained on the held-out split; zlib always can
+        return "zlib", train("zlib", samples, size)
+    # retrain the winner on every sample
+    return best[1], train(best[1], samples, size)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def migrate(kind: str, chunk_size: int = 5000) -> dict:
+    """Re-encode the whole cache with a new ``kind`` dictionary (or as plain text for ``off``)."""
+    from ds_translator import db
+
+    start = time.perf_counter()
+    result = {"kind": kind, "dict_bytes": 0, "samples": 0}
+    size_before = db.get_size()["bytes"]
+    unavailable = db.unusable_codecs()
+    if unavailable:
+        raise ValueError(
+            f"缓存中有条目使用无法加载的压缩字典 {unavailable}（zstd 字典需要安装 zstandard），"
+            "请先安装后再转换，否则这些条目无法还原"
+        )
+    if kind == "off":
+        ident = None
+    else:
+        samples = db.sample_translations(_env_int("DS_CACHE_DICT_SAMPLES", 20_000), skip=PLAIN)
+        if not samples:
+            raise ValueError("缓存中没有可用于训练压缩字典的译文")
+        kind, data = choose(kind, samples, _env_int("DS_CACHE_DICT_KB", 32) * 1024)
+        failures = round_trip_failures(Codec(kind, data), samples)
+        if failures:
+            raise ValueError(f"{kind} 字典自检失败：{failures}/{len(samples)} 条译文压缩后无法还原，未做任何修改")
+        result["kind"] = kind
+        ident = db.add_codec(kind, data)
+        result["dict_bytes"] = len(data)
+        result["samples"] = len(samples)
+    result.update(db.reencode_translations(ident, chunk_size=chunk_size))
+    db.vacuum(full=True)
+    result["bytes_before"] = size_before
+    result["bytes_after"] = db.get_size()["bytes"]
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def format_result(result: dict) -> list[str]:
+    """Summary lines of one ``migrate`` run."""
+    mb = 1024 * 1024
+    head = ("已将缓存译文转换为纯文本" if result["kind"] == "off" else
+            f"用 {result['samples']} 条译文训练 {result['kind']} 字典（{result['dict_bytes'] / 1024:.1f} KiB），"
+            f"压缩存储 {result['compressed']}/{result['rows']} 条（其余压缩后不更小，保持纯文本）")
+    return [
+        head + f"，改写 {result['rewritten']} 条"
+        + (f"，{result['undecodable']} 条无法解压，保持原样" if result["undecodable"] else ""),
+        f"译文 {result['text_before'] / mb:.1f} MB -> {result['text_after'] / mb:.1f} MB，"
+        f"数据库 {result['bytes_before'] / mb:.1f} MB -> {result['bytes_after'] / mb:.1f} MB，用时 {result['seconds']:.2f} s",
+    ]
@@ -0,0 +1,233 @@
+"""Export and import ``translation_cache`` for sharing between machines.
+
+``export_cache(directory)`` writes the cache as ``shards`` gzip files
+(``shard-000.jsonl.gz`` ...) plus ``manifest.json``. Each row lands in
+shard ``crc32(original) % shards`` as one compact JSON array::
+
+    ["original", "translation", hit_count, "created_at", "updated_at", verified]
+
+Rows are read in key order (``db.iter_rows``) and streamed into all
+shard files at once, so every shard is sorted by key and memory does not
+grow with the cache. Failure markers are not exported. The gzip output
+is deterministic and the manifest records each shard's row count and
+the SHA-256 of its uncompressed lines. A re-export into the same
+directory keeps the shard count and the export's ``origin`` id and
+leaves unchanged shards untouched, so file sync tools only move the
+shards that changed.
+
+``import_cache(directory)`` reads the manifest and skips every shard
+whose hash matches the one recorded in the local ``sync_state`` table
+for that origin at the last import. The other shards are streamed
+through ``db.merge_rows``, one transaction per shard, so an interrupted
+import resumes cleanly. Conflicts are resolved there: verified beats
+unverified, then newer ``updated_at``, then higher ``hit_count``.
+
+Run with ``main.py --export-cache DIR`` / ``--import-cache DIR``.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+import zlib
+from datetime import datetime
+from typing import Iterator, Optional
+
+from ds_translator import db
+from ds_translator import metrics
+
+logger = logging.getLogger("ds_translator.cache_sync")
+
+FORMAT = 1
+MANIFEST = "manifest.json"
+FAILED = "[翻译失败]"
+DEFAULT_SHARDS = 64
+# lines are buffered per shard and compressed in blocks of about this size
+_BLOCK = 1 << 16
+
+
+class ShardError(Exception):
+    """A missing manifest, or a shard whose content does not match it."""
+
+
+def shard_of(original: str, shards: int) -> int:
+    return zlib.crc32(original.encode("utf-8")) % shards
+
+
+def shard_name(k: int) -> str:
+    return f"shard-{k:03d}.jsonl.gz"
+
+
+def load_manifest(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == FORMAT else None
+
+
+class _ShardWriter:
+    """One shard being written to a temporary file, hashed as it goes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp = path + ".part"
+        self._file = open(self.tmp, "wb")
+        # mtime=0 and no file name: the same rows give the same bytes
+        self._gzip = gzip.GzipFile(filename="", mode="wb", fileobj=self._file, compresslevel=6, mtime=0)
+        self.sha = hashlib.sha256()
+        self.rows = 0
+        self._buffer: list[bytes] = []
+        self._buffered = 0
+
+    def write(self, line: bytes) -> None:
+        self._buffer.append(line)
+        self._buffered += len(line)
+        self.rows += 1
+        if self._buffered >= _BLOCK:
+            self._flush()
+
+    def _flush(self) -> None:
+        block = b"".join(self._buffer)
+        self._gzip.write(block)
+        self.sha.update(block)
+        self._buffer.clear()
+        self._buffered = 0
+
+    def abort(self) -> None:
+        self._gzip.close()
+        self._file.close()
+        os.remove(self.tmp)
+
+    def finish(self, previous: Optional[dict]) -> bool:
+        """Close the shard; returns True if it replaced the file, False if it was unchanged."""
+        self._flush()
+        self._gzip.close()
+        self._file.close()
+        if previous and previous.get("sha256") == self.sha.hexdigest() and os.path.exists(self.path):
+            os.remove(self.tmp)
+            return False
+        os.replace(self.tmp, self.path)
+        return True
+
+
+def export_cache(directory: str, shards: int = 0) -> dict:
+    """Write the cache as sorted, compressed shards plus a manifest into ``directory``."""
+    start = time.perf_counter()
+    os.makedirs(directory, exist_ok=True)
+    previous = load_manifest(directory) or {}
+    if not shards:
+        try:
+            shards = previous.get("shards") or int(os.getenv("DS_CACHE_SHARDS", DEFAULT_SHARDS))
+        except ValueError:
+            shards = DEFAULT_SHARDS
+    old_files = previous.get("files", {}) if previous.get("shards") == shards else {}
+    writers = [_ShardWriter(os.path.join(directory, shard_name(k))) for k in range(shards)]
+    rows = 0
+    try:
+        with metrics.timer("cache_sync.export"):
+            for chunk in db.iter_rows(skip_translation=FAILED):
+                for row in chunk:
+                    line = json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                    writers[shard_of(row[0], shards)].write(line)
+                rows += len(chunk)
+    except BaseException:
+        for w in writers:
+            w.abort()
+        raise
+    files = {}
+    written = 0
+    for k, w in enumerate(writers):
+        name = shard_name(k)
+        written += w.finish(old_files.get(name))
+        files[name] = {"rows": w.rows, "sha256": w.sha.hexdigest()}
+    # shard files of an earlier export with a different shard count
+    for name in previous.get("files", {}):
+        if name not in files:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    manifest = {
+        "format": FORMAT,
+        "origin": previous.get("origin") or uuid.uuid4().hex,
+        "exported_at": datetime.now().isoformat(),
+        "shards": shards,
+        "rows": rows,
+        "files": files,
+    }
+    tmp = os.path.join(directory, MANIFEST + ".part")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return {"rows": rows, "shards": shards, "written": written, "bytes": size,
+            "seconds": time.perf_counter() - start}
+
+
+def _read_shard(path: str, expected: str) -> Iterator[tuple]:
+    """Stream the rows of one shard; raises ShardError at the end if its hash is wrong."""
+    sha = hashlib.sha256()
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            sha.update(line)
+            original, translation, hits, created, updated, verified = json.loads(line)
+            yield original, translation, hits, created, updated, verified
+    if sha.hexdigest() != expected:
+        raise ShardError(f"{os.path.basename(path)} 的内容与清单不符")
+
+
+def import_cache(directory: str) -> dict:
+    """Merge the shards of an export that changed since the last import from it."""
+    start = time.perf_counter()
+    manifest = load_manifest(directory)
+    if manifest is None:
+        raise ShardError(f"{directory} 中没有可用的 {MANIFEST}")
+    origin = manifest["origin"]
+    done = db.get_sync_state(origin)
+    result = {"shards": len(manifest["files"]), "read": 0, "skipped": 0, "errors": 0, "rows": 0,
+              "added": 0, "replaced": 0, "kept": 0, "unchanged": 0}
+    for name, info in sorted(manifest["files"].items()):
+        if done.get(name) == info["sha256"]:
+            result["skipped"] += 1
+            continue
+        try:
+            with metrics.timer("cache_sync.import_shard"):
+                counts = db.merge_rows(_read_shard(os.path.join(directory, name), info["sha256"]),
+                                       failed=FAILED, sync=(origin, name, info["sha256"]))
+        except (OSError, ValueError, EOFError, ShardError) as e:
+            # the shard's transaction was rolled back; the next import retries it
+            logger.warning(f"跳过分片 {name}: {e}")
+            result["errors"] += 1
+            continue
+        result["read"] += 1
+        result["rows"] += info["rows"]
+        for key, n in counts.items():
+            result[key] += n
+    result["origin"] = origin
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def format_export(result: dict) -> list[str]:
+    """Summary line of one export."""
+    return [
+        f"导出 {result['rows']} 条到 {result['shards']} 个分片（{result['written']} 个有变化并已写入），"
+        f"共 {result['bytes'] / 1024 / 1024:.1f} MB，用时 {result['seconds']:.2f} s"
+    ]
+
+
+def format_import(result: dict) -> list[str]:
+    """Summary lines of one import."""
+    return [
+        f"读取 {result['read']}/{result['shards']} 个分片（{result['skipped']} 个自上次导入后未变，跳过"
+        + (f"；{result['errors']} 个损坏或无法读取" if result["errors"] else "")
+        + f"），共 {result['rows']} 条，用时 {result['seconds']:.2f} s",
+        f"新增 {result['added']} 条，以导入为准 {result['replaced']} 条，保留本地 {result['kept']} 条，"
+        f"相同 {result['unchanged']} 条",
+    ]
@@ -1,7 +1,15 @@
 from __future__ import annotations
 
 from typing import Any
-from ds_translator.rich_progress import shared_console
+
+from rich.console import Console
+
+# Shared Console instance for subtle/info printing across the package. Use
+# this instead of creating independent Console() instances so output from
+# different modules uses the same rendering context and won't disturb live
+# Progress rendering. It lives here rather than in rich_progress so that
+# printing a message does not import the progress machinery.
+shared_console = Console()
 
 
 def subtle(message: Any, **print_kwargs) -> None:
@@ -1,6 +1,13 @@
+import itertools
+import json
+import random
 import sqlite3
 import os
+import threading
+import time
 from datetime import datetime
+from ds_translator import cache_codec
+from ds_translator import metrics
 
 # Use a stable absolute path for the cache DB
 CACHE_DB = os.path.abspath(os.path.join(os.getcwd(), "data", "cache_db", "translation_cache.db"))
@@ -19,10 +26,79 @@ def _connect_db():
     return conn
 
 
+# One long-lived connection per thread (sqlite3 connections must not be
+# shared across threads). Reusing it avoids an open/close per lookup and
+# keeps SQLite's page cache warm in long-running modes.
+_local = threading.local()
+
+
+def _get_conn():
+    """Return this thread's cached connection to CACHE_DB, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "path", None) != CACHE_DB:
+        if conn is not None:
+            conn.close()
+        conn = _connect_db()
+        _local.conn = conn
+        _local.path = CACHE_DB
+        _local.codecs = None
+    return conn
+
+
+def close_connection():
+    """Close the calling thread's cached connection (if any)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.codecs = None
+
+
+def _codec_state(conn):
+    """This thread's dictionaries of the current cache (see cache_codec), loaded on first use."""
+    state = getattr(_local, "codecs", None)
+    if state is None:
+        try:
+            rows = conn.execute('SELECT id, kind, data, active FROM codec_dict').fetchall()
+        except sqlite3.OperationalError:
+            # no compressed storage in this cache
+            rows = []
+        state = _local.codecs = cache_codec.CodecSet(rows)
+    return state
+
+
+def unusable_codecs():
+    """Ids of this cache's compression dictionaries that cannot be loaded here."""
+    return _codec_state(_get_conn()).unavailable
+
+
+def _encode(conn, translation):
+    """The value to store for ``translation`` (plain text or a compressed BLOB)."""
+    return _codec_state(conn).encode(translation)
+
+
+def _decode(conn, value):
+    """The text of a stored translation; None if it cannot be decoded."""
+    if not isinstance(value, bytes):
+        return value
+    try:
+        return _codec_state(conn).decode(value)
+    except cache_codec.UnknownCodec:
+        # a dictionary added by another connection since ours were loaded
+        _local.codecs = None
+        try:
+            return _codec_state(conn).decode(value)
+        except cache_codec.UnknownCodec:
+            return None
+
+
 def init_db():
     """初始化 SQLite 数据库"""
-    conn = _connect_db()
+    conn = _get_conn()
     cursor = conn.cursor()
+    # only takes effect while the file is still empty; older caches are
+    # converted by the maintenance command (see maintenance.py)
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS translation_cache (
             original TEXT PRIMARY KEY ON CONFLICT REPLACE,
@@ -32,60 +108,316 @@ def init_db():
             updated_at TEXT
         )
     ''')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_original ON translation_cache(original)')
+    # human-verified rows (proofread ingestion) are never overwritten by API results
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(translation_cache)')}
+    if 'verified' not in columns:
+        cursor.execute('ALTER TABLE translation_cache ADD COLUMN verified INTEGER NOT NULL DEFAULT 0')
     conn.commit()
-    conn.close()
 
 
 def get_translation_from_db(text):
-    conn = _connect_db()
-    cursor = conn.cursor()
-    cursor.execute(
-        'SELECT translation, hit_count FROM translation_cache WHERE original = ?',
-        (text,)
-    )
-    row = cursor.fetchone()
-    conn.close()
-    if row:
+    with metrics.timer("db.read"):
+        conn = _get_conn()
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT translation, hit_count FROM translation_cache WHERE original = ?',
+            (text,)
+        )
+        row = cursor.fetchone()
+        translation = _decode(conn, row[0]) if row else None
+    if translation is not None:
         update_hit_count(text)
-        return row[0]
-    return None
+    return translation
 
 
-def update_hit_count(text):
-    conn = _connect_db()
+def get_translations_bulk(texts, chunk_size=500, verified_only=False):
+    """Return {original: translation} for the cached ``texts`` without touching hit counts."""
+    texts = list(dict.fromkeys(texts))
+    found = {}
+    conn = _get_conn()
     cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE translation_cache 
-        SET hit_count = hit_count + 1, updated_at = ?
-        WHERE original = ?
-    ''', (datetime.now().isoformat(), text))
-    conn.commit()
-    conn.close()
+    with metrics.timer("db.read_bulk"):
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            cursor.execute(
+                f'SELECT original, translation FROM translation_cache WHERE original IN ({",".join("?" * len(chunk))})'
+                + (' AND verified = 1' if verified_only else ''),
+                chunk,
+            )
+            for original, value in cursor.fetchall():
+                translation = _decode(conn, value)
+                if translation is not None:
+                    found[original] = translation
+    return found
+
+
+def update_hit_count(text):
+    with metrics.timer("db.hit_update"):
+        conn = _get_conn()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE translation_cache 
+            SET hit_count = hit_count + 1, updated_at = ?
+            WHERE original = ?
+        ''', (datetime.now().isoformat(), text))
+        conn.commit()
 
 
 def save_translation_to_db(original, translation):
+    """Cache ``translation`` unless a human-verified translation of ``original`` exists."""
     now = datetime.now().isoformat()
-    conn = _connect_db()
+    with metrics.timer("db.write"):
+        conn = _get_conn()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO translation_cache 
+            (original, translation, hit_count, created_at, updated_at)
+            SELECT ?, ?, COALESCE((SELECT hit_count FROM translation_cache WHERE original = ?), 1), ?, ?
+            WHERE NOT EXISTS (SELECT 1 FROM translation_cache WHERE original = ? AND verified = 1)
+        ''', (original, _encode(conn, translation), original, now, now, original))
+        conn.commit()
+
+
+def insert_missing(pairs):
+    """Insert (original, translation) pairs in one transaction, keeping rows that already exist.
+
+    Returns the number of rows inserted.
+    """
+    now = datetime.now().isoformat()
+    conn = _get_conn()
+    with metrics.timer("db.insert_missing"):
+        with conn:
+            cursor = conn.executemany(
+                'INSERT OR IGNORE INTO translation_cache (original, translation, hit_count, created_at, updated_at) '
+                'VALUES (?, ?, 1, ?, ?)',
+                ((original, _encode(conn, translation), now, now) for original, translation in pairs),
+            )
+    return cursor.rowcount
+
+
+def upsert_verified(pairs, chunk_size=1000):
+    """Store human-verified translations in one transaction.
+
+    ``pairs`` are (original, translation) with unique originals. Each chunk
+    is diffed against the cache: rows that already hold the same verified
+    translation are left alone, the rest are written with ``verified = 1``
+    (keeping hit count and created_at) and dropped from the retry queue.
+    Returns counts of added, corrected, confirmed (same text, now
+    verified) and unchanged rows.
+    """
+    pairs = list(pairs)
+    now = datetime.now().isoformat()
+    counts = {"added": 0, "corrected": 0, "confirmed": 0, "unchanged": 0}
+    conn = _get_conn()
+    cursor = conn.cursor()
+    _ensure_retry_table(cursor)
+    with metrics.timer("db.upsert_verified"):
+        with conn:
+            for start in range(0, len(pairs), chunk_size):
+                chunk = pairs[start:start + chunk_size]
+                cursor.execute(
+                    f'SELECT original, translation, verified FROM translation_cache '
+                    f'WHERE original IN ({",".join("?" * len(chunk))})',
+                    [original for original, _ in chunk],
+                )
+                current = {original: (_decode(conn, value), verified) for original, value, verified in cursor.fetchall()}
+                rows = []
+                for original, translation in chunk:
+                    old = current.get(original)
+                    if old is None:
+                        counts["added"] += 1
+                    elif old[0] != translation:
+                        counts["corrected"] += 1
+                    elif not old[1]:
+                        counts["confirmed"] += 1
+                    else:
+                        counts["unchanged"] += 1
+                        continue
+                    rows.append((original, _encode(conn, translation), original, original, now, now))
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO translation_cache
+                    (original, translation, hit_count, created_at, updated_at, verified)
+                    VALUES (?, ?, COALESCE((SELECT hit_count FROM translation_cache WHERE original = ?), 1),
+                            COALESCE((SELECT created_at FROM translation_cache WHERE original = ?), ?), ?, 1)
+                ''', rows)
+                cursor.executemany('DELETE FROM retry_queue WHERE original = ?', [(row[0],) for row in rows])
+    _record_retry_depth(cursor)
+    return counts
+
+
+def iter_translations(chunk_size=5000, include_verified=True):
+    """Yield the cache as lists of (original, translation) rows, ``chunk_size`` at a time."""
+    conn = _get_conn()
+    cursor = conn.cursor()
+    cursor.execute('SELECT original, translation FROM translation_cache'
+                   + ('' if include_verified else ' WHERE verified = 0'))
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield [(original, _decode(conn, value)) for original, value in rows]
+
+
+def requeue_translations(items):
+    """Move cached translations to the retry queue in one transaction.
+
+    ``items`` are (original, error_text) pairs; their cache rows are deleted
+    and they are queued for an immediate retry. Returns the number queued.
+    """
+    now_ts = int(datetime.now().timestamp())
+    now_iso = datetime.now().isoformat()
+    conn = _get_conn()
+    cursor = conn.cursor()
+    _ensure_retry_table(cursor)
+    count = 0
+    with metrics.timer("db.requeue"):
+        with conn:
+            for original, error_text in items:
+                cursor.execute('DELETE FROM translation_cache WHERE original = ?', (original,))
+                cursor.execute('''
+                    INSERT OR REPLACE INTO retry_queue (original, attempts, next_try_at, last_error, added_at)
+                    VALUES (?, COALESCE((SELECT attempts FROM retry_queue WHERE original = ?), 0), ?, ?, COALESCE((SELECT added_at FROM retry_queue WHERE original = ?), ?))
+                ''', (original, original, now_ts, error_text or '', original, now_iso))
+                count += 1
+    metrics.inc("retry.enqueued", count)
+    _record_retry_depth(cursor)
+    return count
+
+
+def iter_rows(chunk_size=5000, skip_translation=None):
+    """Yield full cache rows in key order, ``chunk_size`` at a time.
+
+    Rows are (original, translation, hit_count, created_at, updated_at,
+    verified); the primary key index gives the order without a sort.
+    Rows whose translation equals ``skip_translation`` (a plain-text
+    value, see cache_codec.PLAIN) are left out; translations are decoded.
+    """
+    conn = _get_conn()
     cursor = conn.cursor()
+    cursor.execute(
+        'SELECT original, translation, hit_count, created_at, updated_at, verified FROM translation_cache '
+        'WHERE translation IS NOT ? ORDER BY original',
+        (skip_translation,),
+    )
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield [(row[0], _decode(conn, row[1])) + row[2:] for row in rows]
+
+
+def _ensure_sync_table(cursor):
     cursor.execute('''
-        INSERT OR REPLACE INTO translation_cache 
-        (original, translation, hit_count, created_at, updated_at)
-        VALUES (?, ?, COALESCE((SELECT hit_count FROM translation_cache WHERE original = ?), 1), ?, ?)
-    ''', (original, translation, original, now, now))
-    conn.commit()
-    conn.close()
+        CREATE TABLE IF NOT EXISTS sync_state (
+            origin TEXT,
+            shard TEXT,
+            sha256 TEXT,
+            synced_at TEXT,
+            PRIMARY KEY (origin, shard)
+        )
+    ''')
+
+
+def get_sync_state(origin):
+    """Return {shard file: sha256} of the shards of export ``origin`` merged so far."""
+    cursor = _get_conn().cursor()
+    _ensure_sync_table(cursor)
+    cursor.execute('SELECT shard, sha256 FROM sync_state WHERE origin = ?', (origin,))
+    return dict(cursor.fetchall())
+
+
+def _merge_row(local, incoming, failed):
+    """The row to store for one key present on both sides, or None to keep ``local`` as is."""
+    original, translation, hits, created, updated, verified = incoming
+    _, l_translation, l_hits, l_created, l_updated, l_verified = local
+    hits, l_hits = hits or 0, l_hits or 0
+    if translation == l_translation:
+        if hits <= l_hits and verified <= l_verified:
+            return None
+        return (original, translation, max(hits, l_hits), min(created or "", l_created or "") or None,
+                max(updated or "", l_updated or "") or None, max(verified, l_verified))
+    if l_translation == failed:
+        wins = True
+    elif verified != l_verified:
+        wins = verified > l_verified
+    else:
+        wins = (updated or "", hits) > (l_updated or "", l_hits)
+    if not wins:
+        return None
+    return (original, translation, max(hits, l_hits), min(created or "", l_created or "") or None, updated, verified)
+
+
+def merge_rows(rows, chunk_size=1000, failed=None, sync=None):
+    """Merge full cache rows from another machine in one transaction.
+
+    Keys missing here are inserted. Where both sides have a key, a
+    human-verified translation beats an unverified one, then the newer
+    ``updated_at`` wins, then the higher ``hit_count``; a local
+    ``failed`` marker always loses. Equal translations keep the larger
+    hit count. ``sync`` = (origin, shard, sha256) is recorded in
+    ``sync_state`` in the same transaction. ``rows`` is consumed lazily;
+    if iterating it raises, nothing is written. Returns counts of added,
+    replaced, kept (local won) and unchanged keys.
+    """
+    counts = {"added": 0, "replaced": 0, "kept": 0, "unchanged": 0}
+    conn = _get_conn()
+    cursor = conn.cursor()
+    _ensure_sync_table(cursor)
+    rows = iter(rows)
+    with metrics.timer("db.merge"):
+        with conn:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                cursor.execute(
+                    f'SELECT original, translation, hit_count, created_at, updated_at, verified FROM translation_cache '
+                    f'WHERE original IN ({",".join("?" * len(chunk))})',
+                    [row[0] for row in chunk],
+                )
+                current = {row[0]: (row[0], _decode(conn, row[1])) + row[2:] for row in cursor.fetchall()}
+                writes = []
+                for row in chunk:
+                    local = current.get(row[0])
+                    if local is None:
+                        counts["added"] += 1
+                        writes.append(row)
+                        continue
+                    merged = _merge_row(local, row, failed)
+                    if merged is None:
+                        counts["kept" if local[1] != row[1] else "unchanged"] += 1
+                    else:
+                        counts["replaced" if local[1] != row[1] else "unchanged"] += 1
+                        writes.append(merged)
+                cursor.executemany(
+                    'INSERT OR REPLACE INTO translation_cache '
+                    '(original, translation, hit_count, created_at, updated_at, verified) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(row[0], _encode(conn, row[1])) + tuple(row[2:]) for row in writes],
+                )
+            if sync is not None:
+                origin, shard, sha256 = sync
+                cursor.execute(
+                    'INSERT OR REPLACE INTO sync_state (origin, shard, sha256, synced_at) VALUES (?, ?, ?, ?)',
+                    (origin, shard, sha256, datetime.now().isoformat()),
+                )
+    return counts
 
 
-def show_stats():
-    conn = _connect_db()
+def get_stats():
+    """Return (entry_count, total_hits) of the translation cache."""
+    conn = _get_conn()
     cursor = conn.cursor()
     cursor.execute('SELECT COUNT(*), SUM(hit_count) FROM translation_cache')
     total, hits = cursor.fetchone()
-    conn.close()
+    return total, hits or 0
+
+
+def show_stats(stats=None):
+    """Print cache statistics; ``stats`` may be a (total, hits) pair computed elsewhere."""
+    total, hits = stats if stats is not None else get_stats()
     try:
         # Use the shared console for subtle informational output
-        from ds_translator.rich_progress import shared_console as console
+        from ds_translator.console import shared_console as console
         console.print(f"[DB] 翻译缓存统计：共 {total} 条翻译，总命中 {hits or 0} 次", style="italic dim")
     except Exception:
         # Fallback to plain print if shared console not available
@@ -107,6 +439,14 @@ def _ensure_retry_table(cursor):
     ''')
 
 
+def _record_retry_depth(cursor):
+    """Update the retry queue depth gauge (only queries when metrics are on)."""
+    if not metrics.enabled():
+        return
+    cursor.execute('SELECT COUNT(*) FROM retry_queue')
+    metrics.gauge_set("retry.queue_depth", cursor.fetchone()[0])
+
+
 def enqueue_retry(original, error_text=None):
     """Add text to the persistent retry queue (or update existing entry).
 
@@ -115,7 +455,7 @@ def enqueue_retry(original, error_text=None):
     """
     now_ts = int(datetime.now().timestamp())
     now_iso = datetime.now().isoformat()
-    conn = _connect_db()
+    conn = _get_conn()
     cursor = conn.cursor()
     _ensure_retry_table(cursor)
     # insert or ignore; if exists, update last_error
@@ -124,7 +464,8 @@ def enqueue_retry(original, error_text=None):
         VALUES (?, COALESCE((SELECT attempts FROM retry_queue WHERE original = ?), 0), ?, ?, COALESCE((SELECT added_at FROM retry_queue WHERE original = ?), ?))
     ''', (original, original, now_ts, error_text or '', original, now_iso))
     conn.commit()
-    conn.close()
+    metrics.inc("retry.enqueued")
+    _record_retry_depth(cursor)
 
 
 def get_due_retries(limit=10):
@@ -133,7 +474,7 @@ def get_due_retries(limit=10):
     Each dict contains: original, attempts, next_try_at, last_error, added_at
     """
     now_ts = int(datetime.now().timestamp())
-    conn = _connect_db()
+    conn = _get_conn()
     cursor = conn.cursor()
     _ensure_retry_table(cursor)
     cursor.execute('''
@@ -144,7 +485,7 @@ def get_due_retries(limit=10):
         LIMIT ?
     ''', (now_ts, limit))
     rows = cursor.fetchall()
-    conn.close()
+    _record_retry_depth(cursor)
     out = []
     for r in rows:
         out.append({
@@ -162,7 +503,7 @@ def increment_retry(original, error_text=None, backoff_seconds=None):
 
     If backoff_seconds is provided, use it; otherwise compute 2 ** attempts (capped).
     """
-    conn = _connect_db()
+    conn = _get_conn()
     cursor = conn.cursor()
     _ensure_retry_table(cursor)
     cursor.execute('SELECT attempts FROM retry_queue WHERE original = ?', (original,))
@@ -179,13 +520,310 @@ def increment_retry(original, error_text=None, backoff_seconds=None):
         VALUES (?, ?, ?, ?, COALESCE((SELECT added_at FROM retry_queue WHERE original = ?), ?))
     ''', (original, attempts, next_try, error_text or '', original, datetime.now().isoformat()))
     conn.commit()
-    conn.close()
 
 
 def remove_retry(original):
-    conn = _connect_db()
+    conn = _get_conn()
     cursor = conn.cursor()
     _ensure_retry_table(cursor)
     cursor.execute('DELETE FROM retry_queue WHERE original = ?', (original,))
     conn.commit()
-    conn.close()
+    _record_retry_depth(cursor)
+
+
+# ----------------------
+# Maintenance support
+# ----------------------
+def get_size():
+    """Return {"bytes", "free_bytes", "rows"} of the cache database."""
+    conn = _get_conn()
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    rows = conn.execute('SELECT COUNT(*) FROM translation_cache').fetchone()[0]
+    return {"bytes": pages * page_size, "free_bytes": free * page_size, "rows": rows}
+
+
+def _sample_rows(n, seed):
+    """Up to ``n`` distinct (original, stored translation) rows spread over the table."""
+    conn = _get_conn()
+    top = conn.execute('SELECT MAX(rowid) FROM translation_cache').fetchone()[0]
+    if not top:
+        return {}
+    rng = random.Random(seed)
+    rows = {}
+    for _ in range(n):
+        row = conn.execute('SELECT original, translation FROM translation_cache WHERE rowid >= ? LIMIT 1',
+                           (rng.randint(1, top),)).fetchone()
+        if row:
+            rows[row[0]] = row[1]
+    return rows
+
+
+def sample_keys(n, seed=0):
+    """Up to ``n`` distinct cache keys spread over the table, for latency probes."""
+    return list(_sample_rows(n, seed))
+
+
+def sample_translations(n, seed=0, skip=()):
+    """Up to ``n`` decoded translations of distinct rows spread over the table."""
+    conn = _get_conn()
+    values = (_decode(conn, value) for value in _sample_rows(n, seed).values())
+    return [v for v in values if v is not None and v not in skip]
+
+
+def time_lookups(keys):
+    """Seconds taken by the cache lookup of each key (hit counts are not touched)."""
+    conn = _get_conn()
+    cursor = conn.cursor()
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        cursor.execute('SELECT translation, hit_count FROM translation_cache WHERE original = ?', (key,))
+        row = cursor.fetchone()
+        if row:
+            _decode(conn, row[0])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def expire_translation(translation, before):
+    """Delete rows holding ``translation`` last written before ``before`` (ISO time); returns the count.
+
+    ``translation`` must be one of the values stored as plain text (cache_codec.PLAIN).
+    """
+    conn = _get_conn()
+    with conn:
+        cursor = conn.execute(
+            "DELETE FROM translation_cache WHERE translation = ? AND COALESCE(updated_at, created_at, '') < ?",
+            (translation, before),
+        )
+    return cursor.rowcount
+
+
+def delete_unverified(keys, chunk_size=500):
+    """Delete the unverified cache rows of ``keys`` in one transaction; returns the count."""
+    keys = list(keys)
+    conn = _get_conn()
+    deleted = 0
+    with conn:
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            cursor = conn.execute(
+                f'DELETE FROM translation_cache WHERE verified = 0 AND original IN ({",".join("?" * len(chunk))})',
+                chunk,
+            )
+            deleted += cursor.rowcount
+    return deleted
+
+
+def evict(count, recency_days):
+    """Delete the ``count`` unverified rows least worth keeping; returns the number deleted.
+
+    A row's worth is its hit count divided by (1 + days since it was last
+    hit or written / ``recency_days``): a row unused for ``recency_days``
+    counts half its hits. Human-verified rows are never evicted.
+    """
+    if count <= 0:
+        return 0
+    conn = _get_conn()
+    with metrics.timer("db.evict"):
+        with conn:
+            cursor = conn.execute('''
+                DELETE FROM translation_cache WHERE rowid IN (
+                    SELECT rowid FROM translation_cache WHERE verified = 0
+                    ORDER BY COALESCE(hit_count, 0) / (1.0 + MAX(0.0, julianday('now', 'localtime')
+                             - COALESCE(julianday(COALESCE(updated_at, created_at)), 0)) / ?), rowid
+                    LIMIT ?
+                )
+            ''', (max(recency_days, 1e-6), count))
+    return cursor.rowcount
+
+
+def forget_sync_origins(before):
+    """Forget the import state of cache exports last imported before ``before``; returns the number of exports."""
+    conn = _get_conn()
+    cursor = conn.cursor()
+    _ensure_sync_table(cursor)
+    with conn:
+        cursor.execute('SELECT origin FROM sync_state GROUP BY origin HAVING MAX(synced_at) < ?', (before,))
+        origins = [row[0] for row in cursor.fetchall()]
+        cursor.executemany('DELETE FROM sync_state WHERE origin = ?', [(origin,) for origin in origins])
+    return len(origins)
+
+
+def drop_redundant_indexes():
+    """Drop indexes on exactly the primary key column; returns their names."""
+    conn = _get_conn()
+    dropped = []
+    for _seq, name, _unique, origin, *_ in conn.execute('PRAGMA index_list(translation_cache)').fetchall():
+        columns = [row[2] for row in conn.execute(f'PRAGMA index_info("{name}")')]
+        if origin == 'c' and columns == ['original']:
+            conn.execute(f'DROP INDEX "{name}"')
+            dropped.append(name)
+    conn.commit()
+    return dropped
+
+
+def vacuum(pages=0, convert=False, full=False):
+    """Return free pages to the file system.
+
+    With incremental auto-vacuum on, frees up to ``pages`` pages (0 = all)
+    and returns "incremental". Otherwise, with ``convert``, switches the
+    file to incremental auto-vacuum with one full VACUUM and returns
+    "converted"; without it nothing is done and "off" is returned.
+    ``full`` always rebuilds the file, which also repacks half-empty pages.
+    """
+    conn = _get_conn()
+    conn.commit()
+    if full or conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        if not (convert or full):
+            return "off"
+        with metrics.timer("db.vacuum"):
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        return "converted"
+    with metrics.timer("db.vacuum"):
+        # execute() steps the pragma once, which frees a single page; a script runs it to the end
+        conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});' if pages else 'PRAGMA incremental_vacuum;')
+    return "incremental"
+
+
+def analyze():
+    """Refresh the query planner statistics (sampled, so it stays fast on large caches)."""
+    conn = _get_conn()
+    conn.execute('PRAGMA analysis_limit = 1000')
+    conn.execute('ANALYZE')
+    conn.commit()
+
+
+def _ensure_maintenance_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            ran_at TEXT,
+            report TEXT
+        )
+    ''')
+
+
+def get_last_maintenance():
+    """ISO time of the last recorded maintenance pass, or None."""
+    cursor = _get_conn().cursor()
+    _ensure_maintenance_table(cursor)
+    cursor.execute('SELECT MAX(ran_at) FROM maintenance_log')
+    return cursor.fetchone()[0]
+
+
+def record_maintenance(report):
+    """Append a maintenance pass (``report`` is JSON-serialisable) to the log."""
+    conn = _get_conn()
+    cursor = conn.cursor()
+    _ensure_maintenance_table(cursor)
+    cursor.execute('INSERT INTO maintenance_log (ran_at, report) VALUES (?, ?)',
+                   (datetime.now().isoformat(), json.dumps(report, ensure_ascii=False)))
+    conn.commit()
+
+
+# ----------------------
+# Compressed storage support (see cache_codec.py)
+# ----------------------
+def _ensure_codec_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS codec_dict (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            data BLOB NOT NULL,
+            active INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT
+        )
+    ''')
+
+
+def add_codec(kind, data):
+    """Store a new compression dictionary and make it the one new writes use; returns its id."""
+    conn = _get_conn()
+    cursor = conn.cursor()
+    _ensure_codec_table(cursor)
+    with conn:
+        # the id is the first byte of every compressed value. Dictionaries
+        # are kept while ids last (a process that loaded them earlier may
+        # still write with an older one); after that the oldest one no
+        # stored value refers to is replaced
+        ident = cursor.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM codec_dict').fetchone()[0]
+        if ident > cache_codec.MAX_DICT_ID:
+            ident = _unused_codec_id(cursor)
+            cursor.execute('DELETE FROM codec_dict WHERE id = ?', (ident,))
+        cursor.execute('UPDATE codec_dict SET active = 0')
+        cursor.execute('INSERT INTO codec_dict (id, kind, data, active, created_at) VALUES (?, ?, ?, 1, ?)',
+                       (ident, kind, data, datetime.now().isoformat()))
+    _local.codecs = None
+    return ident
+
+
+def _unused_codec_id(cursor):
+    """The oldest inactive dictionary id that no stored translation is tagged with."""
+    cursor.execute("SELECT DISTINCT hex(substr(translation, 1, 1)) FROM translation_cache WHERE typeof(translation) = 'blob'")
+    used = {int(tag, 16) for (tag,) in cursor.fetchall() if tag}
+    cursor.execute('SELECT id FROM codec_dict WHERE active = 0 ORDER BY created_at, id')
+    for (ident,) in cursor.fetchall():
+        if ident not in used:
+            return ident
+    raise ValueError(
+        f"压缩字典编号已用尽（{cache_codec.MAX_DICT_ID} 个）且都仍被缓存条目使用；"
+        "请先运行 python main.py --compress-cache off，再重新压缩"
+    )
+
+
+def reencode_translations(ident, chunk_size=5000):
+    """Rewrite every cached translation with dictionary ``ident`` (None: plain text).
+
+    Works through the table by rowid, one transaction per chunk, so other
+    connections keep reading (both forms decode) and an interrupted run
+    can simply be repeated. Values that cannot be decoded are left as
+    they are and counted. Refuses to run (ValueError) while a dictionary
+    of this cache cannot be loaded. Returns counts and the stored bytes
+    of all translations before and after.
+    """
+    conn = _get_conn()
+    cursor = conn.cursor()
+    _ensure_codec_table(cursor)
+    unavailable = _codec_state(conn).unavailable
+    if unavailable:
+        raise ValueError(f"压缩字典 {unavailable} 无法加载，拒绝改写缓存")
+    with conn:
+        cursor.execute('UPDATE codec_dict SET active = (id IS ?)', (ident,))
+    _local.codecs = None
+    state = _codec_state(conn)
+    result = {"rows": 0, "rewritten": 0, "compressed": 0, "undecodable": 0, "text_before": 0, "text_after": 0}
+    last = 0
+    with metrics.timer("db.reencode"):
+        while True:
+            cursor.execute('SELECT rowid, translation FROM translation_cache WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                           (last, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            last = rows[-1][0]
+            updates = []
+            for rowid, value in rows:
+                stored = len(value) if isinstance(value, bytes) else len(value.encode('utf-8'))
+                result["rows"] += 1
+                result["text_before"] += stored
+                translation = _decode(conn, value)
+                if translation is None:
+                    # corrupt, not lost: keep it for whoever can still read it
+                    result["undecodable"] += 1
+                    result["text_after"] += stored
+                    continue
+                new = state.encode(translation)
+                if isinstance(new, bytes):
+                    result["compressed"] += 1
+                    result["text_after"] += len(new)
+                else:
+                    result["text_after"] += len(new.encode('utf-8'))
+                if new != value:
+                    updates.append((new, rowid))
+            with conn:
+                cursor.executemany('UPDATE translation_cache SET translation = ? WHERE rowid = ?', updates)
+            result["rewritten"] += len(updates)
+    return result
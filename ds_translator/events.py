@@ -0,0 +1,211 @@
+"""In-process event bus for pipeline progress.
+
+Translation code publishes small dict events; renderers (Rich progress,
+plain text, machine-readable streams) subscribe to them. Publishing with
+no subscribers is a cheap no-op, and publishers never wait on rendering:
+renderers are expected to record state in their handler and draw on
+their own schedule.
+
+Event types (``file_*`` and ``cue_done`` carry ``file``):
+    run_started    files
+    run_finished   files, elapsed
+    file_started   path
+    file_total     total
+    file_info      message
+    cue_done       done, total
+    file_final     message          (kept visible after the file finishes)
+    file_finished  cues, new_translations, elapsed, output
+    file_failed    error, elapsed
+    lookup         source           (lexicon / cache / api / failed)
+    retry_enqueued text
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Callable, Optional, TextIO
+
+Subscriber = Callable[[dict], None]
+
+
+class EventBus:
+    """Synchronous publish/subscribe dispatcher.
+
+    Subscribers run in the publishing thread and must be quick; an
+    exception in one subscriber never reaches the publisher.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # replaced wholesale on (un)subscribe so publish() can iterate without locking
+        self._subscribers: tuple[Subscriber, ...] = ()
+
+    def subscribe(self, fn: Subscriber) -> Subscriber:
+        with self._lock:
+            self._subscribers = self._subscribers + (fn,)
+        return fn
+
+    def unsubscribe(self, fn: Subscriber) -> None:
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not fn)
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, type: str, **fields: Any) -> None:  # noqa: A002 - event field name
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        fields["type"] = type
+        for fn in subscribers:
+            try:
+                fn(fields)
+            except Exception:
+                pass
+
+
+# Process-wide default bus used by main.py and translate_srt_file
+bus = EventBus()
+_DEFAULT_BUS = bus
+
+
+def publish(type: str, **fields: Any) -> None:  # noqa: A002 - event field name
+    """Publish on the default bus."""
+    bus.publish(type, **fields)
+
+
+def callback_adapter(progress_callback: Callable[..., Any]) -> Subscriber:
+    """Translate events into the legacy ``progress_callback(op, value)`` calls."""
+
+    def _handle(event: dict) -> None:
+        kind = event["type"]
+        if kind == "cue_done":
+            progress_callback('advance', 1)
+            progress_callback('info', f"{event['done']}/{event['total']}")
+        elif kind == "file_total":
+            progress_callback('info', f"0/{event['total']}")
+            progress_callback('set_total', event['total'])
+        elif kind == "file_info":
+            progress_callback('info', event['message'])
+        elif kind == "file_final":
+            progress_callback('final', event['message'])
+
+    return _handle
+
+
+class JsonlSink:
+    """Write events as compact JSON lines for machine consumers (e.g. the GUI).
+
+    Per-cue events are never written one by one: ``cue_done`` and
+    ``lookup`` are folded into a ``progress`` line emitted at most every
+    ``interval`` seconds per file (and once more when the file ends), and
+    ``retry_enqueued`` is folded into a counted line on the same schedule.
+    ``progress.sources`` counts cache/lexicon/api/failed lookups since the
+    previous ``progress`` line.
+    Every line has ``v`` (schema version), ``ts`` (unix time) and ``type``.
+
+    Lines written:
+        run_started, file_started, file_total, progress, retry_enqueued,
+        file_finished, file_failed, run_finished
+    """
+
+    VERSION = 1
+
+    def __init__(self, stream: TextIO, interval: float = 0.25, bus: Optional[EventBus] = None, close: bool = False) -> None:
+        self.stream = stream
+        self.interval = interval
+        self.bus = bus or _DEFAULT_BUS
+        self._close = close
+        self._lock = threading.Lock()
+        self._file: Optional[str] = None
+        self._done = 0
+        self._total = 0
+        self._sources: dict[str, int] = {}
+        self._retries = 0
+        self._dirty = False
+        self._last_emit = 0.0
+
+    def __enter__(self) -> "JsonlSink":
+        self.bus.subscribe(self.handle)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.bus.unsubscribe(self.handle)
+        with self._lock:
+            self._flush_progress()
+        try:
+            self.stream.flush()
+            if self._close:
+                self.stream.close()
+        except Exception:
+            pass
+
+    def _write(self, obj: dict) -> None:
+        obj["v"] = self.VERSION
+        obj["ts"] = round(time.time(), 3)
+        try:
+            self.stream.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self.stream.flush()
+        except Exception:
+            # a closed pipe must never break the translation run
+            pass
+
+    def _flush_progress(self) -> None:
+        if self._dirty and self._file is not None:
+            self._write({
+                "type": "progress",
+                "file": self._file,
+                "done": self._done,
+                "total": self._total,
+                "sources": dict(self._sources),
+            })
+            self._sources.clear()
+        if self._retries:
+            self._write({"type": "retry_enqueued", "count": self._retries})
+            self._retries = 0
+        self._dirty = False
+        self._last_emit = time.monotonic()
+
+    def handle(self, event: dict) -> None:
+        kind = event["type"]
+        with self._lock:
+            if kind == "cue_done":
+                self._done = event["done"]
+                self._total = event["total"]
+                self._dirty = True
+                if time.monotonic() - self._last_emit >= self.interval:
+                    self._flush_progress()
+            elif kind == "lookup":
+                src = event["source"]
+                self._sources[src] = self._sources.get(src, 0) + 1
+            elif kind == "retry_enqueued":
+                self._retries += 1
+            elif kind == "file_started":
+                self._flush_progress()
+                self._file, self._done, self._total = event["file"], 0, 0
+                self._write({"type": "file_started", "file": event["file"], "path": event.get("path")})
+            elif kind == "file_total":
+                self._total = event["total"]
+                self._write({"type": "file_total", "file": event["file"], "total": event["total"]})
+            elif kind in ("file_finished", "file_failed"):
+                self._dirty = True
+                self._flush_progress()
+                out = {k: v for k, v in event.items() if k != "type"}
+                if "elapsed" in out:
+                    out["elapsed"] = round(out["elapsed"], 4)
+                self._write({"type": kind, **out})
+                self._file = None
+            elif kind in ("run_started", "run_finished"):
+                self._flush_progress()
+                self._write({"type": kind, **{k: v for k, v in event.items() if k != "type"}})
+
+
+def open_jsonl_sink(target: str, interval: float = 0.25, bus: Optional[EventBus] = None) -> JsonlSink:
+    """Create a JsonlSink for ``target``: ``-`` for stdout, otherwise a file or named pipe path."""
+    import sys
+
+    if target in ("", "-"):
+        return JsonlSink(sys.stdout, interval=interval, bus=bus)
+    stream = open(target, "w", encoding="utf-8", buffering=1)
+    return JsonlSink(stream, interval=interval, bus=bus, close=True)
@@ -0,0 +1,153 @@
+"""Rule-based local translation of trivial cues (interjections, laughter, sound effects).
+
+``api.translate_text`` consults this stage after the lexicon and before
+the DB cache / API. The rules live in ``data/lexicon/fastpath.csv``
+(columns ``pattern,translation,kind``; ``DS_FASTPATH_TABLE`` to
+override) and are compiled into a single regex, so a lookup is one
+``fullmatch`` no matter how many rules there are.
+
+A cue is only handled when the whole cue matches a rule after
+normalisation:
+
+- surrounding whitespace and 「」/『』 are removed;
+- trailing punctuation is split off and re-attached to the translation
+  in full-width form (``えー！？`` -> ``诶——！？``);
+- katakana is folded to hiragana and runs of ``ー``/``～`` collapse to one
+  ``ー``, so ``エーーー`` matches the rule written as ``えー``.
+
+Anything else (even one extra word) goes on to the cache and the API.
+The table is re-read when the file changes. ``DS_FASTPATH=0`` disables
+the stage.
+"""
+from __future__ import annotations
+
+import csv
+import functools
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger("ds_translator.fastpath")
+
+TABLE_PATH = "./data/lexicon/fastpath.csv"
+# the copy shipped with the repository, used when the data dir has none
+_BUNDLED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "lexicon", "fastpath.csv")
+# how often (seconds) to check the table file for changes
+_RELOAD_CHECK_INTERVAL = 5.0
+
+_TRAILING = re.compile(r"[！!？?…。．.、,～〜♪\s]+$")
+_ELONGATION = re.compile(r"[ーｰ～〜]+")
+_PUNCT_MAP = {"！": "！", "!": "！", "？": "？", "?": "？", "…": "…"}
+_KATAKANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+
+class _Table:
+    def __init__(self, rows: list[tuple[str, str, str]], path: str, mtime: Optional[float]) -> None:
+        self.path = path
+        self.mtime = mtime
+        self.translations: list[str] = []
+        self.kinds: list[str] = []
+        parts = []
+        for pattern, translation, kind in rows:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                logger.warning(f"忽略无效的快速规则 {pattern!r}: {e}")
+                continue
+            parts.append(f"(?P<r{len(self.translations)}>{pattern})")
+            self.translations.append(translation)
+            self.kinds.append(kind or "rule")
+        self.regex = re.compile("|".join(parts)) if parts else None
+
+    def match(self, core: str) -> Optional[int]:
+        if self.regex is None:
+            return None
+        m = self.regex.fullmatch(core)
+        if m is None:
+            return None
+        return int(m.lastgroup[1:])
+
+
+_lock = threading.Lock()
+_table: Optional[_Table] = None
+_last_check = 0.0
+
+
+def enabled() -> bool:
+    return os.getenv("DS_FASTPATH", "1").lower() not in ("0", "false", "no")
+
+
+def _table_path() -> str:
+    path = os.getenv("DS_FASTPATH_TABLE") or TABLE_PATH
+    if not os.path.exists(path) and os.path.exists(_BUNDLED_PATH):
+        return _BUNDLED_PATH
+    return path
+
+
+def load_table(path: Optional[str] = None) -> _Table:
+    """Read and compile a rule table (an empty table if the file is missing)."""
+    path = path or _table_path()
+    rows = []
+    try:
+        mtime = os.path.getmtime(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                pattern = (row.get("pattern") or "").strip()
+                translation = (row.get("translation") or "").strip()
+                if pattern and translation:
+                    rows.append((pattern, translation, (row.get("kind") or "").strip()))
+    except OSError:
+        mtime = None
+    return _Table(rows, path, mtime)
+
+
+def _get_table() -> _Table:
+    global _table, _last_check
+    now = time.monotonic()
+    table = _table
+    if table is not None and now - _last_check < _RELOAD_CHECK_INTERVAL:
+        return table
+    with _lock:
+        _last_check = now
+        path = _table_path()
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if _table is None or _table.path != path or _table.mtime != mtime:
+            _table = load_table(path)
+        return _table
+
+
+def normalize(text: str) -> tuple[str, str]:
+    """Split ``text`` into the matching key and its full-width trailing punctuation."""
+    text = text.strip().strip("「」『』").strip()
+    m = _TRAILING.search(text)
+    suffix = ""
+    if m:
+        suffix = "".join(_PUNCT_MAP.get(ch, "") for ch in m.group(0))
+        text = text[:m.start()]
+    core = _ELONGATION.sub("ー", text.translate(_KATAKANA))
+    return core, suffix
+
+
+def handles_cached() -> Optional[Callable[[str], bool]]:
+    """A memoised ``text -> bool`` "does a rule cover this cue" for bulk scans (None when disabled)."""
+    if not enabled():
+        return None
+    return functools.lru_cache(maxsize=1 << 16)(lambda text: lookup(text) is not None)
+
+
+def lookup(text: str) -> Optional[tuple[str, str]]:
+    """Return ``(translation, kind)`` when a rule covers the whole cue, else None."""
+    core, suffix = normalize(text)
+    if not core:
+        return None
+    table = _get_table()
+    idx = table.match(core)
+    if idx is None:
+        return None
+    return table.translations[idx] + suffix, table.kinds[idx]
@@ -0,0 +1,212 @@
+"""Post-translation glossary compliance check.
+
+The lexicon is in the prompt, but the model does not always use the
+mapped terms. After a file is translated, ``check_and_fix`` finds the
+cues whose source contains a lexicon term (the same matcher routing
+uses, ``Lexicon.terms_in``) but whose translation lacks the mapped
+target, and re-asks only those cues: up to ``DS_GLOSSARY_BATCH``
+(default 40) cues per correction request, answered as JSON.
+
+A correction is accepted only when it contains every required target
+and passes the ``validate`` sanity checks;
+accepted corrections replace the cue's translation and the
+``translation_cache`` row, so later runs get the fixed text from the
+cache. Requests per file are capped at ``DS_GLOSSARY_MAX_RATIO`` of its
+cues (default 0.05, at least one request); violations beyond the cap
+are reported, not fixed.
+
+Correction requests are accounted as the ``glossary`` route in the
+``[ROUTE]`` lines; violations, fixes and requests per run are in
+``format_stats`` (``[GLOSSARY]``). ``DS_GLOSSARY_CHECK=0`` disables the
+stage.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from ds_translator import db
+from ds_translator import lexicon as lex
+from ds_translator import metrics
+from ds_translator import routing
+from ds_translator import settings
+from ds_translator import validate
+
+logger = logging.getLogger("ds_translator.glossary")
+
+ROUTE = "glossary"
+FAILED = "[翻译失败]"
+DEFAULT_BATCH = 40
+DEFAULT_MAX_RATIO = 0.05
+# completion budget of one correction request
+_MAX_BATCH_TOKENS = 8000
+
+CORRECTION_SYSTEM = (
+    "你是字幕校对。下面 JSON 中每条字幕的中文译文（zh）没有使用词典（terms，日语 -> 规定译法）给出的译法。"
+    "请在尽量保留原译文语气和内容的前提下修正译文，使其使用规定的译法，不要改动其它部分。"
+    '只输出 JSON：{"items": [{"id": 编号, "zh": "修正后的译文"}]}'
+)
+
+
+class Violation(NamedTuple):
+    index: int
+    text: str
+    translation: str
+    # lexicon term -> required target that the translation lacks
+    missing: dict
+
+
+_lock = threading.Lock()
+# cues, cues_with_terms, violations, fixed, requests
+_stats = [0, 0, 0, 0, 0]
+
+
+def enabled() -> bool:
+    return os.getenv("DS_GLOSSARY_CHECK", "1").lower() not in ("0", "false", "no")
+
+
+def _env_number(name: str, default, cast):
+    try:
+        return cast(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def find_violations(cues, lexicon) -> tuple[int, list[Violation]]:
+    """Cues that contain a lexicon term but not its target; returns (cues with terms, violations)."""
+    with_terms = 0
+    violations = []
+    if not lexicon:
+        return with_terms, violations
+    for i, cue in enumerate(cues):
+        text = cue["text"].strip()
+        translation = cue["translation"]
+        if not text or not translation or translation == FAILED:
+            continue
+        terms = lex.terms_in(lexicon, text)
+        if not terms:
+            continue
+        with_terms += 1
+        missing = {term: lexicon[term] for term in terms if lexicon[term] not in translation}
+        if missing:
+            violations.append(Violation(i, text, translation, missing))
+    return with_terms, violations
+
+
+def parse_corrections(content: str) -> dict[int, str]:
+    """``{"items": [{"id", "zh"}]}`` (or a bare list, optionally fenced) -> id -> corrected text."""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.strip("`")
+        if content.startswith("json"):
+            content = content[4:]
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return {}
+    items = data.get("items") if isinstance(data, dict) else data
+    out = {}
+    for item in items if isinstance(items, list) else ():
+        if not isinstance(item, dict) or not isinstance(item.get("zh"), str):
+            continue
+        try:
+            out[int(item["id"])] = item["zh"].strip()
+        except (KeyError, TypeError, ValueError):
+            continue
+    return out
+
+
+def _request(batch: list[Violation]) -> dict[int, str]:
+    """Send one correction request; returns batch position -> corrected text."""
+    from ds_translator import api
+
+    items = [{"id": k, "ja": v.text, "zh": v.translation, "terms": v.missing} for k, v in enumerate(batch)]
+    payload = {
+        "model": settings.get().model,
+        "messages": [
+            {"role": "system", "content": CORRECTION_SYSTEM},
+            {"role": "user", "content": json.dumps({"items": items}, ensure_ascii=False)},
+        ],
+        "temperature": 0.1,
+        "max_tokens": min(_MAX_BATCH_TOKENS, sum(routing.max_tokens_for(v.text) + 16 for v in batch)),
+        "response_format": {"type": "json_object"},
+    }
+    start = time.perf_counter()
+    response = api._post_chat_completion(payload, route=ROUTE)
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    result = response.json()
+    api._record_usage(result, route=ROUTE)
+    routing.record(ROUTE, time.perf_counter() - start, result.get("usage"))
+    return parse_corrections(result["choices"][0]["message"]["content"])
+
+
+def check_and_fix(cues, lexicon, fname: Optional[str] = None, bus=None) -> dict:
+    """Find glossary violations in ``cues`` and re-ask them in batches (updates ``cues`` in place)."""
+    with metrics.timer("glossary.check"):
+        with_terms, violations = find_violations(cues, lexicon)
+    fixed = 0
+    requests = 0
+    if violations:
+        batch_size = max(1, _env_number("DS_GLOSSARY_BATCH", DEFAULT_BATCH, int))
+        ratio = _env_number("DS_GLOSSARY_MAX_RATIO", DEFAULT_MAX_RATIO, float)
+        max_requests = max(1, math.floor(len(cues) * ratio))
+        for start in range(0, len(violations), batch_size):
+            if requests >= max_requests:
+                break
+            batch = violations[start:start + batch_size]
+            requests += 1
+            try:
+                corrections = _request(batch)
+            except Exception as e:
+                logger.warning(f"词库校验修正请求失败: {e}")
+                continue
+            for k, v in enumerate(batch):
+                corrected = corrections.get(k)
+                if not corrected or any(target not in corrected for target in v.missing.values()):
+                    continue
+                if validate.enabled() and validate.check(v.text, corrected):
+                    continue
+                cues[v.index]["translation"] = corrected
+                db.save_translation_to_db(v.text, corrected)
+                fixed += 1
+        metrics.inc("glossary.violations", len(violations))
+        metrics.inc("glossary.fixed", fixed)
+        metrics.inc("glossary.requests", requests)
+        if bus is not None and fname is not None:
+            bus.publish("file_info", file=fname,
+                        message=f"词库校验：{len(violations)} 条未使用词库译法，已修正 {fixed} 条（{requests} 次请求）")
+    with _lock:
+        for k, n in enumerate((len(cues), with_terms, len(violations), fixed, requests)):
+            _stats[k] += n
+    return {"cues": len(cues), "with_terms": with_terms, "violations": len(violations), "fixed": fixed, "requests": requests}
+
+
+def stats() -> dict:
+    with _lock:
+        cues, with_terms, violations, fixed, requests = _stats
+    return {"cues": cues, "with_terms": with_terms, "violations": violations, "fixed": fixed, "requests": requests}
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats[:] = [0] * len(_stats)
+
+
+def format_stats(data: Optional[dict] = None) -> list[str]:
+    """Summary line for the run (empty when no cue contained a lexicon term)."""
+    data = stats() if data is None else data
+    if not data["with_terms"]:
+        return []
+    violations = data["violations"]
+    rate = data["fixed"] / violations * 100 if violations else 100.0
+    per_hundred = data["requests"] / data["cues"] * 100 if data["cues"] else 0.0
+    return [
+        f"{data['with_terms']} 条字幕含词库术语，{violations} 条未使用词库译法，"
+        f"修正 {data['fixed']} 条 ({rate:.0f}%)，额外请求 {data['requests']} 次（每百条字幕 {per_hundred:.2f} 次）"
+    ]
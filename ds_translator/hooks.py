@@ -0,0 +1,116 @@
+"""Pre/post-translation hook pipeline for ``translate_srt_file``.
+
+Hooks are registry commands in the ``pre_translate`` and
+``post_translate`` groups (see ``plugins/hooks.py`` for the built-in
+ones) and are enabled by name, in order, with ``DS_PRE_HOOKS`` and
+``DS_POST_HOOKS`` (comma separated). Each hook runs once per file over
+the whole list of cues, not once per line::
+
+    @register_commond("pre_translate", "my_hook")
+    def my_hook(cues):
+        for cue in cues:
+            ...
+
+Every cue is a dict:
+    index, timecode  from the source file
+    original         source text, written unchanged to the output
+    text             text that will be translated (pre hooks may edit it)
+    translation      None until translated; a pre hook may fill it to
+                     skip the API, post hooks may rewrite it
+
+A hook mutates the cues in place or returns a new list. Post hooks also
+see translations reused by incremental re-translation, so they must be
+idempotent. A hook that raises is logged and skipped. Time spent in each
+hook is accumulated for the run (``format_stats``) and, with
+``DS_METRICS=1``, recorded as the ``hook`` histogram.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable
+
+from ds_translator import metrics
+
+logger = logging.getLogger("ds_translator.hooks")
+
+PRE = "pre_translate"
+POST = "post_translate"
+_ENV = {PRE: "DS_PRE_HOOKS", POST: "DS_POST_HOOKS"}
+
+_lock = threading.Lock()
+# (stage, name) -> [files, cues, seconds]
+_stats: dict[tuple[str, str], list] = {}
+# stage -> (env value, [(name, fn), ...]); re-resolved when the env var changes
+_resolved: dict[str, tuple[str, list]] = {}
+_warned: set[str] = set()
+
+
+def configured(stage: str) -> list[tuple[str, Callable[[list], Any]]]:
+    """The hooks enabled for ``stage``, resolved through the command registry."""
+    spec = os.getenv(_ENV[stage], "")
+    cached = _resolved.get(stage)
+    if cached is not None and cached[0] == spec:
+        return cached[1]
+    hooks = []
+    for name in (n.strip() for n in spec.split(",")):
+        if not name:
+            continue
+        from utils.registry import resolve
+
+        fn = resolve(stage, name)
+        if fn is None:
+            if (stage, name) not in _warned:
+                _warned.add((stage, name))
+                logger.warning(f"未找到 {stage} 钩子: {name}，已忽略")
+            continue
+        hooks.append((name, fn))
+    _resolved[stage] = (spec, hooks)
+    return hooks
+
+
+def make_cues(subtitles) -> list[dict]:
+    """Turn parsed ``(index, timecode, text)`` tuples into hook cue dicts."""
+    return [
+        {"index": idx, "timecode": timecode, "original": text, "text": text, "translation": None}
+        for idx, timecode, text in subtitles
+    ]
+
+
+def run(stage: str, cues: list[dict]) -> list[dict]:
+    """Run every hook configured for ``stage`` over ``cues`` and return the result."""
+    for name, fn in configured(stage):
+        start = time.perf_counter()
+        try:
+            result = fn(cues)
+            if result is not None:
+                cues = result
+        except Exception as e:
+            logger.warning(f"{stage} 钩子 {name} 出错，已跳过: {e}")
+            metrics.inc("hook.errors", hook=name, stage=stage)
+        elapsed = time.perf_counter() - start
+        metrics.observe("hook", elapsed, hook=name, stage=stage)
+        with _lock:
+            entry = _stats.setdefault((stage, name), [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += len(cues)
+            entry[2] += elapsed
+    return cues
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def format_stats() -> list[str]:
+    """One line per hook that ran, slowest first (empty when no hooks are enabled)."""
+    with _lock:
+        rows = sorted(_stats.items(), key=lambda kv: kv[1][2], reverse=True)
+    lines = []
+    for (stage, name), (files, cues, seconds) in rows:
+        per_cue = seconds / cues * 1e6 if cues else 0.0
+        lines.append(f"{stage}/{name}: {seconds * 1000:.2f} ms over {files} file(s), {cues} cues ({per_cue:.1f} us/cue)")
+    return lines
@@ -30,6 +30,7 @@ _ICONS_EMOJI = {
     "folder": "📁",
     "done": "✔️",
     "party": "🎉",
+    "reuse": "♻️",
 }
 
 _ICONS_ASCII = {
@@ -42,6 +43,7 @@ _ICONS_ASCII = {
     "folder": "[DIR]",
     "done": "[OK]",
     "party": "[DONE]",
+    "reuse": "[REUSE]",
 }
 
 
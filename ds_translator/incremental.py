@@ -0,0 +1,97 @@
+"""Reuse translations from a previous bilingual output when a source changes.
+
+When ``translate_srt_file`` finds an existing ``-roasted.srt`` for the
+file, the new source cues are aligned with the previous output's
+original lines using a sequence diff (``difflib.SequenceMatcher`` on the
+cue texts). Cues inside matching runs keep their previous translation
+and take the new index and timecode; only inserted or edited cues go
+through ``api.translate_text``. A timing-only edit therefore makes no API
+calls at all.
+
+Previous translations are not reused when they are the failure marker,
+or when the lexicon now has an entry for the text (lexicon edits must
+win, see ``manifest``). Neighbouring cues of an edit keep their old
+translation even though their prompt context would have changed.
+
+Disable with ``DS_INCREMENTAL=0`` or ``main.py --full``.
+"""
+from __future__ import annotations
+
+import difflib
+import os
+from typing import Iterable, Iterator, Optional
+
+FAILED_MARKER = "[翻译失败]"
+
+
+def enabled() -> bool:
+    return os.getenv("DS_INCREMENTAL", "1").lower() not in ("0", "false", "no")
+
+
+def iter_bilingual_srt(lines: Iterable[str]) -> Iterator[tuple[str, str, str, str]]:
+    """Parse output written by ``rebuild_srt`` line by line: (index, timecode, original, translation).
+
+    Each block is index, timecode, one original line, then the translation
+    (which may span several lines); blocks end at an empty line. Blocks
+    that do not fit are skipped. ``lines`` may be an open file.
+    """
+    block: list[str] = []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if line:
+            block.append(line)
+            continue
+        if block:
+            if len(block) >= 3 and block[0].strip().isdigit() and "-->" in block[1]:
+                yield block[0].strip(), block[1].strip(), block[2].strip(), "\n".join(block[3:]).strip()
+            block = []
+    if len(block) >= 3 and block[0].strip().isdigit() and "-->" in block[1]:
+        yield block[0].strip(), block[1].strip(), block[2].strip(), "\n".join(block[3:]).strip()
+
+
+def parse_bilingual_srt(content: str) -> list[tuple[str, str, str, str]]:
+    """Parse a whole bilingual output (see ``iter_bilingual_srt``)."""
+    return list(iter_bilingual_srt(content.split("\n")))
+
+
+def read_bilingual_srt(path: str) -> list[tuple[str, str, str, str]]:
+    """Stream the blocks of a bilingual file from disk (non-UTF-8 files are decoded whole)."""
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            return list(iter_bilingual_srt(f))
+    except UnicodeDecodeError:
+        # hand-edited files are not always saved as UTF-8
+        from ds_translator.srt import _read_text_with_fallback
+
+        content, _ = _read_text_with_fallback(path, progress_callback=lambda op, msg: None)
+        return parse_bilingual_srt(content)
+
+
+def load_previous(output_path: str) -> Optional[list[tuple[str, str, str, str]]]:
+    """Return the cues of an existing bilingual output, or None if there is none."""
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+    return parse_bilingual_srt(content) or None
+
+
+def reusable_translations(subtitles, previous, lexicon=None) -> list[Optional[str]]:
+    """For each new cue, the previous translation to reuse, or None to translate it."""
+    new_texts = [text for _idx, _tc, text in subtitles]
+    old_texts = [original for _idx, _tc, original, _trans in previous]
+    reuse: list[Optional[str]] = [None] * len(new_texts)
+    matcher = difflib.SequenceMatcher(None, new_texts, old_texts, autojunk=False)
+    for tag, i1, i2, j1, _j2 in matcher.get_opcodes():
+        if tag != "equal":
+            continue
+        for k in range(i2 - i1):
+            text = new_texts[i1 + k]
+            translation = previous[j1 + k][3]
+            if not text.strip() or translation == FAILED_MARKER:
+                continue
+            if lexicon and text.strip() in lexicon:
+                continue
+            reuse[i1 + k] = translation
+    return reuse
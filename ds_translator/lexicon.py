@@ -1,7 +1,52 @@
+"""Lexicon (glossary) store.
+
+The glossary is ``data/lexicon/lexicon.csv`` (columns
+``original,translation``) plus optional per-show files
+``data/lexicon/shows/<show>.csv`` with the same columns. Each show file
+is a namespace: a subtitle whose file name starts with the show name
+(case-insensitive, longest name wins; ``DS_LEXICON_SHOW`` forces one)
+sees the global entries overlaid with that show's entries.
+
+The CSVs are compiled into an indexed SQLite file
+(``data/cache_db/lexicon.db``, ``DS_LEXICON_DB`` to override) that
+records the sources' stat signature and content hash:
+
+- an unchanged signature costs a few ``stat`` calls and no reads; the
+  check runs at most every couple of seconds;
+- a changed signature with unchanged content (``touch``, checkout) only
+  refreshes the recorded signature;
+- changed content is recompiled into a temporary file that is swapped
+  in atomically, so other processes never read a half-written store.
+
+``shared_store()`` is the single instance used by the pipeline, the
+service and the retry worker. ``get(namespace)`` returns a read-only
+``Lexicon`` dict built once per compiled version and shared by all
+callers, together with a term matcher and the formatted prompt chunk.
+"""
+from __future__ import annotations
+
 import csv
+import hashlib
+import io
+import itertools
+import json
+import logging
 import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("ds_translator.lexicon")
 
 LEXICON_PATH = "./data/lexicon/lexicon.csv"
+SHOWS_DIR = "./data/lexicon/shows"
+COMPILED_PATH = "./data/cache_db/lexicon.db"
+# namespace of lexicon.csv
+GLOBAL = ""
+# bump when the compiled schema changes
+FORMAT = 1
+# how often (seconds) to check the source files for changes
+_RELOAD_CHECK_INTERVAL = 2.0
 
 
 def ensure_lexicon_exists():
@@ -15,24 +60,425 @@ def ensure_lexicon_exists():
             writer.writerow(["ありがとう", "谢谢"])
 
 
-def load_lexicon():
-    """Load lexicon CSV into a dict. CSV columns: original,translation"""
+def parse_csv(content: str) -> dict:
+    """original -> translation from CSV text with ``original,translation`` columns."""
     mapping = {}
-    if not os.path.exists(LEXICON_PATH):
-        return mapping
-
-    with open(LEXICON_PATH, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            orig = row.get("original")
-            trans = row.get("translation")
-            if orig and trans:
-                mapping[orig.strip()] = trans.strip()
+    for row in csv.DictReader(io.StringIO(content)):
+        orig = (row.get("original") or "").strip()
+        trans = (row.get("translation") or "").strip()
+        if orig and trans:
+            mapping[orig] = trans
     return mapping
 
 
+class TermMatcher:
+    """Finds lexicon terms inside a line: leftmost, longest first, no overlaps.
+
+    Each position costs one set lookup per distinct term length (and is
+    skipped outright unless some term starts with that character), so a
+    lookup does not slow down as the lexicon grows the way a regex
+    alternation of every term does.
+    """
+
+    def __init__(self, terms) -> None:
+        self._terms = frozenset(t for t in terms if t)
+        self._first = frozenset(t[0] for t in self._terms)
+        self._lengths = sorted({len(t) for t in self._terms}, reverse=True)
+
+    def findall(self, text: str) -> list[str]:
+        terms, first, lengths = self._terms, self._first, self._lengths
+        hits = []
+        n = len(text)
+        i = 0
+        while i < n:
+            if text[i] in first:
+                for length in lengths:
+                    if i + length <= n and text[i:i + length] in terms:
+                        hits.append(text[i:i + length])
+                        i += length
+                        break
+                else:
+                    i += 1
+            else:
+                i += 1
+        return hits
+
+
+class Lexicon(dict):
+    """original -> translation for one namespace.
+
+    Instances are shared between threads and callers; treat them as
+    read-only. ``version`` is the content hash of the sources it was
+    built from.
+    """
+
+    def __init__(self, entries=(), namespace: str = GLOBAL, version: Optional[str] = None) -> None:
+        super().__init__(entries)
+        self.namespace = namespace
+        self.version = version
+        self._matcher: Optional[TermMatcher] = None
+        self._prompt: dict[int, tuple[str, frozenset]] = {}
+
+    def terms_in(self, text: str) -> list[str]:
+        if self._matcher is None:
+            self._matcher = TermMatcher(self)
+        return self._matcher.findall(text)
+
+    def prompt_chunk(self, max_chars: int) -> tuple[str, frozenset]:
+        chunk = self._prompt.get(max_chars)
+        if chunk is None:
+            chunk = _truncated_lines(self, max_chars)
+            self._prompt[max_chars] = chunk
+        return chunk
+
+
+# id(lexicon) -> (lexicon, len(lexicon), matcher), for plain dicts passed in
+# by callers (dicts cannot be weakly referenced). Holding the dict keeps its
+# id from being reused by another one while the entry exists.
+_dict_matchers: dict[int, tuple[dict, int, TermMatcher]] = {}
+
+
+def terms_in(lexicon, text: str) -> list[str]:
+    """Lexicon terms that occur inside ``text`` (longest match first, no overlaps)."""
+    if not lexicon:
+        return []
+    if isinstance(lexicon, Lexicon):
+        return lexicon.terms_in(text)
+    entry = _dict_matchers.get(id(lexicon))
+    if entry is not None and entry[0] is lexicon and entry[1] == len(lexicon):
+        matcher = entry[2]
+    else:
+        matcher = TermMatcher(lexicon)
+        if len(_dict_matchers) > 8:
+            _dict_matchers.clear()
+        _dict_matchers[id(lexicon)] = (lexicon, len(lexicon), matcher)
+    return matcher.findall(text)
+
+
+def _truncated_lines(lexicon, max_chars: int) -> tuple[str, frozenset]:
+    """``original -> translation`` lines in lexicon order up to ``max_chars``, and the keys included."""
+    lines = [f"{k} -> {v}" for k, v in lexicon.items()]
+    s = "\n".join(lines)
+    if len(s) <= max_chars:
+        return s, frozenset(lexicon)
+    # otherwise truncate by entries until under limit
+    total = 0
+    count = 0
+    for line in lines:
+        if total + len(line) + 1 > max_chars:
+            break
+        total += len(line) + 1
+        count += 1
+    return "\n".join(lines[:count]), frozenset(itertools.islice(lexicon, count))
+
+
+def format_for_prompt(lexicon, max_chars: int, text: Optional[str] = None) -> str:
+    """The lexicon as prompt lines: as many entries as fit in ``max_chars``.
+
+    When the lexicon does not fit, the entries whose terms occur in
+    ``text`` are appended even if they fell outside the truncated part,
+    so large lexicons still contribute what the line needs.
+    """
+    if not lexicon:
+        return ""
+    if isinstance(lexicon, Lexicon):
+        chunk, included = lexicon.prompt_chunk(max_chars)
+    else:
+        chunk, included = _truncated_lines(lexicon, max_chars)
+    if text and len(included) < len(lexicon):
+        extra = [f"{k} -> {lexicon[k]}" for k in dict.fromkeys(terms_in(lexicon, text)) if k not in included]
+        if extra:
+            chunk = "\n".join([chunk, *extra]) if chunk else "\n".join(extra)
+    return chunk
+
+
+def _sources(source: str, shows_dir: str) -> list[tuple[str, str]]:
+    """(namespace, path) of every lexicon CSV, global first."""
+    out = []
+    if os.path.exists(source):
+        out.append((GLOBAL, source))
+    try:
+        names = sorted(os.listdir(shows_dir))
+    except OSError:
+        names = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext.lower() == ".csv" and stem:
+            out.append((stem, os.path.join(shows_dir, name)))
+    return out
+
+
+def _signature(sources) -> list:
+    sig = []
+    for namespace, path in sources:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        sig.append([namespace, st.st_size, st.st_mtime_ns])
+    return sig
+
+
+def _read_sources(sources) -> tuple[str, list[tuple[str, str]]]:
+    """Content hash over all sources and their decoded text."""
+    h = hashlib.sha256()
+    contents = []
+    for namespace, path in sources:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            continue
+        if namespace != GLOBAL:
+            h.update(b"\0" + namespace.encode("utf-8") + b"\0")
+        # without show files this is the plain SHA-256 of lexicon.csv (as recorded in existing manifests)
+        h.update(data)
+        contents.append((namespace, data.decode("utf-8", "replace")))
+    return h.hexdigest()[:16], contents
+
+
+def source_version(source: Optional[str] = None, shows_dir: Optional[str] = None) -> Optional[str]:
+    """Content hash of the lexicon sources (None if there are none)."""
+    sources = _sources(source or LEXICON_PATH, shows_dir or SHOWS_DIR)
+    if not sources:
+        return None
+    return _read_sources(sources)[0]
+
+
+class LexiconStore:
+    """The compiled lexicon and its per-namespace views (see the module docstring)."""
+
+    def __init__(self, source: Optional[str] = None, shows_dir: Optional[str] = None, compiled: Optional[str] = None) -> None:
+        self.source = source or LEXICON_PATH
+        self.shows_dir = shows_dir or SHOWS_DIR
+        self.compiled = compiled or os.getenv("DS_LEXICON_DB") or COMPILED_PATH
+        self._lock = threading.RLock()
+        self._last_check = 0.0
+        self._signature = None
+        self._version: Optional[str] = None
+        # namespace -> entry count
+        self._counts: dict[str, int] = {}
+        self._views: dict[str, Lexicon] = {}
+        # parsed sources kept in memory when the compiled file cannot be written
+        self._fallback: Optional[dict[str, dict]] = None
+
+    # -- compiled file -------------------------------------------------
+
+    def _connect(self):
+        import sqlite3
+
+        return sqlite3.connect(self.compiled)
+
+    def _read_meta(self) -> dict:
+        import sqlite3
+
+        if not os.path.exists(self.compiled):
+            return {}
+        try:
+            conn = self._connect()
+            try:
+                return dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return {}
+
+    def _write_meta(self, signature) -> None:
+        import sqlite3
+
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("UPDATE meta SET value = ? WHERE key = 'signature'", (json.dumps(signature),))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.debug(f"无法更新词库签名: {e}")
+
+    def _compile(self, version: str, signature, parsed: dict[str, dict]) -> None:
+        """Write ``parsed`` to a temporary database and swap it in."""
+        import sqlite3
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.compiled)), exist_ok=True)
+        tmp = f"{self.compiled}.tmp-{os.getpid()}-{threading.get_ident()}"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        conn = sqlite3.connect(tmp)
+        try:
+            self._write_compiled(conn, version, signature, parsed)
+        except BaseException:
+            conn.close()
+            os.remove(tmp)
+            raise
+        conn.close()
+        try:
+            os.replace(tmp, self.compiled)
+        except OSError:
+            os.remove(tmp)
+            raise
+
+    @staticmethod
+    def _write_compiled(conn, version: str, signature, parsed: dict[str, dict]) -> None:
+        conn.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE entries (
+                pos INTEGER PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                original TEXT NOT NULL,
+                translation TEXT NOT NULL
+            );
+        """)
+        rows = ((namespace, k, v) for namespace, mapping in parsed.items() for k, v in mapping.items())
+        conn.executemany("INSERT INTO entries (namespace, original, translation) VALUES (?, ?, ?)", rows)
+        conn.execute("CREATE UNIQUE INDEX idx_lexicon_entry ON entries(namespace, original)")
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+            ("format", str(FORMAT)),
+            ("version", version),
+            ("signature", json.dumps(signature)),
+            ("compiled_at", str(time.time())),
+        ])
+        conn.commit()
+
+    def _sync(self, sources, signature) -> str:
+        """Bring the compiled file up to date with ``sources``; returns the content version."""
+        import sqlite3
+
+        meta = self._read_meta()
+        current = meta.get("format") == str(FORMAT)
+        if current and meta.get("signature") == json.dumps(signature):
+            self._fallback = None
+            return meta["version"]
+        version, contents = _read_sources(sources)
+        if current and meta.get("version") == version:
+            # touched or checked out again without a content change
+            self._write_meta(signature)
+            self._fallback = None
+            return version
+        parsed: dict[str, dict] = {}
+        for namespace, content in contents:
+            parsed[namespace] = parse_csv(content)
+        start = time.perf_counter()
+        try:
+            self._compile(version, signature, parsed)
+            self._fallback = None
+            logger.debug(f"词库已编译: {sum(map(len, parsed.values()))} 条, {len(parsed)} 个命名空间, "
+                         f"{time.perf_counter() - start:.3f}s")
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"无法写入编译后的词库 {self.compiled}，本次在内存中使用: {e}")
+            self._fallback = parsed
+        return version
+
+    def _load_counts(self) -> dict[str, int]:
+        if self._fallback is not None:
+            return {namespace: len(mapping) for namespace, mapping in self._fallback.items()}
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT namespace, COUNT(*) FROM entries GROUP BY namespace").fetchall())
+        finally:
+            conn.close()
+
+    def _load_view(self, namespace: str) -> Lexicon:
+        if self._fallback is not None:
+            entries = dict(self._fallback.get(GLOBAL, {}))
+            if namespace != GLOBAL:
+                entries.update(self._fallback.get(namespace, {}))
+            return Lexicon(entries, namespace, self._version)
+        conn = self._connect()
+        try:
+            query = "SELECT original, translation FROM entries WHERE namespace = ? ORDER BY pos"
+            view = Lexicon(conn.execute(query, (GLOBAL,)), namespace, self._version)
+            if namespace != GLOBAL:
+                view.update(conn.execute(query, (namespace,)))
+        finally:
+            conn.close()
+        return view
+
+    # -- public API ----------------------------------------------------
+
+    def refresh(self, force: bool = False) -> bool:
+        """Pick up edited sources; returns True when the content changed."""
+        now = time.monotonic()
+        if not force and self._version is not None and now - self._last_check < _RELOAD_CHECK_INTERVAL:
+            return False
+        with self._lock:
+            self._last_check = now
+            sources = _sources(self.source, self.shows_dir)
+            signature = _signature(sources)
+            if not force and self._version is not None and signature == self._signature:
+                return False
+            version = self._sync(sources, signature)
+            self._signature = signature
+            if not force and version == self._version:
+                return False
+            self._version = version
+            self._counts = self._load_counts()
+            self._views = {}
+            return True
+
+    def get(self, namespace: str = GLOBAL) -> Lexicon:
+        """The shared view of ``namespace`` (global entries overlaid with the show's)."""
+        self.refresh()
+        view = self._views.get(namespace)
+        if view is None:
+            with self._lock:
+                view = self._views.get(namespace)
+                if view is None:
+                    view = self._load_view(namespace)
+                    self._views[namespace] = view
+        return view
+
+    def namespaces(self) -> dict[str, int]:
+        """Entry count per namespace (``""`` is the global lexicon)."""
+        self.refresh()
+        return dict(self._counts)
+
+    @property
+    def version(self) -> Optional[str]:
+        self.refresh()
+        return self._version
+
+    def namespace_for(self, filename: str) -> str:
+        """The show namespace a subtitle file belongs to (``""`` if none)."""
+        forced = os.getenv("DS_LEXICON_SHOW")
+        if forced is not None:
+            return forced.strip()
+        name = os.path.basename(filename).casefold()
+        best = GLOBAL
+        for namespace in self.namespaces():
+            if namespace and len(namespace) > len(best) and name.startswith(namespace.casefold()):
+                best = namespace
+        return best
+
+    def for_file(self, filename: str) -> Lexicon:
+        return self.get(self.namespace_for(filename))
+
+
+_shared: Optional[LexiconStore] = None
+_shared_lock = threading.Lock()
+
+
+def shared_store() -> LexiconStore:
+    """The process-wide store (created on first use)."""
+    global _shared
+    store = _shared
+    if store is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = LexiconStore()
+            store = _shared
+    return store
+
+
+def load_lexicon(namespace: str = GLOBAL):
+    """The shared lexicon view of ``namespace``; treat it as read-only."""
+    return shared_store().get(namespace)
+
+
 def get_lexicon_translation(text, lexicon=None):
     """Return translation from lexicon dict if exists, otherwise None."""
     if lexicon is None:
-        lexicon = load_lexicon()
+        lexicon = shared_store().get()
     return lexicon.get(text.strip())
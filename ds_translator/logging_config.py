@@ -1,75 +1,262 @@
+import atexit
+import copy
 import logging
+import queue
 import sys
 import os
-from logging import StreamHandler, FileHandler
+import threading
+import time
+from logging import StreamHandler, Handler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from logging import Logger
 
+RETRY_LOGGER_NAME = "ds_translator.retry"
+
+# The background listener that owns the real (console/file) handlers
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock ``prepare`` renders the message *and the traceback* in the
+    calling thread, which is exactly the work we want off the translation
+    hot path. Here only ``msg % args`` is resolved (so mutable args cannot
+    change before the listener sees them); ``exc_info`` travels with the
+    record and is formatted by the listener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _NameFilter(logging.Filter):
+    """Accept (or, with ``exclude=True``, reject) records of one logger subtree."""
+
+    def __init__(self, name, exclude=False):
+        super().__init__()
+        self._prefix = name
+        self._exclude = exclude
+
+    def filter(self, record):
+        match = record.name == self._prefix or record.name.startswith(self._prefix + ".")
+        return not match if self._exclude else match
+
+
+class _CollapsingHandler(Handler):
+    """Forward records to ``target`` but collapse runs of identical messages.
+
+    A record equal (same logger, level and message) to the previous one
+    within ``window`` seconds is counted instead of emitted. When a
+    different record arrives, the window expires or the listener stops, a
+    single "repeated N times" summary is written.
+    """
+
+    def __init__(self, target, window=30.0):
+        super().__init__(level=target.level)
+        self.target = target
+        self.window = window
+        self._last_key = None
+        self._last_record = None
+        self._last_time = 0.0
+        self._repeats = 0
+
+    def _flush_repeats(self):
+        if self._repeats and self._last_record is not None:
+            summary = copy.copy(self._last_record)
+            summary.msg = f"（上一条消息又重复了 {self._repeats} 次）{self._last_record.msg}"
+            summary.args = None
+            summary.exc_info = None
+            summary.exc_text = None
+            self.target.handle(summary)
+        self._repeats = 0
+
+    def emit(self, record):
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        if key == self._last_key and now - self._last_time <= self.window:
+            self._repeats += 1
+            return
+        self._flush_repeats()
+        self._last_key = key
+        self._last_record = record
+        self._last_time = now
+        self.target.handle(record)
+
+    def flush(self):
+        self._flush_repeats()
+        self.target.flush()
+
+    def close(self):
+        self.flush()
+        self.target.close()
+        super().close()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _build_console_handler(level, fmt):
+    """RichHandler on the shared console, or a plain stdout handler as fallback."""
+    try:
+        # Rich provides nicer, uv-like colored output. Render to the same
+        # Console as the progress bars (rich_progress.shared_console) so log
+        # lines are printed above the live progress line instead of through it.
+        from rich.logging import RichHandler
+        from ds_translator.console import shared_console
+
+        # For subtle informational output we prefer not to include the
+        # time/level badges for every INFO message; keep tracebacks rich
+        # but render plain INFO messages without extra badges so they
+        # visually match `subtle()` output.
+        handler = RichHandler(
+            console=shared_console,
+            rich_tracebacks=True,
+            show_time=False,
+            show_level=False,
+            show_path=False,
+            markup=True,
+        )
+        # RichHandler generally handles formatting internally; avoid double
+        # formatting by setting a minimal formatter for compatibility.
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    except Exception:
+        # fallback to a plain console handler with padded level names (uv-style)
+        handler = StreamHandler(stream=sys.stdout)
+        handler.setFormatter(fmt)
+    handler.setLevel(level)
+    return handler
+
+
+class _LazyConsoleHandler(Handler):
+    """Console handler that builds the real (Rich) handler on the first record.
+
+    ``rich.logging`` pulls in Rich's traceback renderer and pygments; runs
+    that never log to the console should not pay for importing them.
+    Records are only emitted from the listener thread, so no locking is
+    needed around the construction.
+    """
+
+    def __init__(self, level, fmt):
+        super().__init__(level=level)
+        self._fmt = fmt
+        self._target = None
+
+    def emit(self, record):
+        if self._target is None:
+            self._target = _build_console_handler(self.level, self._fmt)
+        self._target.handle(record)
+
+    def flush(self):
+        if self._target is not None:
+            self._target.flush()
+
+    def close(self):
+        if self._target is not None:
+            self._target.close()
+        super().close()
+
 
 def init_logging(level=logging.INFO):
-    """Initialize a simple global logger for the ds_translator package."""
+    """Initialize the global ds_translator logger.
+
+    Loggers only enqueue records; a single background QueueListener owns
+    the console handler (Rich, on the shared console) and the rotating
+    ``retry.log`` file handler, and collapses repeated identical messages.
+
+    Environment:
+        DS_CONSOLE_LOG           0 disables console logging
+        DS_RETRY_LOG             retry log path (default data/logs/retry.log)
+        DS_RETRY_LOG_MAX_BYTES   rotate retry.log at this size (default 5 MiB)
+        DS_RETRY_LOG_BACKUPS     rotated files to keep (default 3)
+        DS_LOG_DEDUP_WINDOW      seconds within which repeats collapse (default 30)
+    """
+    global _listener
     logger = logging.getLogger("ds_translator")
     if logger.handlers:
         # already configured
         return logger
 
-    logger.setLevel(level)
-    fmt = logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s", "%Y-%m-%d %H:%M:%S")
+    with _listener_lock:
+        if logger.handlers:
+            return logger
 
-    # Optionally add a console handler. Prefer RichHandler (colored/pretty)
-    # to resemble uv/uvicorn console output, but fall back to a plain
-    # StreamHandler when Rich is not available or DS_CONSOLE_LOG is disabled.
-    console_enabled = os.getenv("DS_CONSOLE_LOG", "1").lower() not in ("0", "false", "no")
-    if console_enabled:
+        logger.setLevel(level)
+        fmt = logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s", "%Y-%m-%d %H:%M:%S")
         try:
-            # Rich provides nicer, uv-like colored output. Configure it to show
-            # timestamps and level badges similar to uv/uvicorn while keeping
-            # tracebacks pretty.
-            from rich.logging import RichHandler
-            from rich.console import Console
-
-            rich_console = Console()
-            # For subtle informational output we prefer not to include the
-            # time/level badges for every INFO message; keep tracebacks rich
-            # but render plain INFO messages without extra badges so they
-            # visually match `subtle()` output.
-            rh = RichHandler(
-                console=rich_console,
-                rich_tracebacks=True,
-                show_time=False,
-                show_level=False,
-                show_path=False,
-                markup=True,
+            window = float(os.getenv("DS_LOG_DEDUP_WINDOW", "30"))
+        except ValueError:
+            window = 30.0
+
+        handlers = []
+        console_enabled = os.getenv("DS_CONSOLE_LOG", "1").lower() not in ("0", "false", "no")
+        if console_enabled:
+            console_handler = _LazyConsoleHandler(level, fmt)
+            collapsed = _CollapsingHandler(console_handler, window=window)
+            # retry records go to the file only, as before
+            collapsed.addFilter(_NameFilter(RETRY_LOGGER_NAME, exclude=True))
+            handlers.append(collapsed)
+
+        # Dedicated retry log file. This keeps retry-related noise out of the
+        # console while making a persistent, size-bounded record.
+        retry_logger = logging.getLogger(RETRY_LOGGER_NAME)
+        try:
+            logs_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'logs')
+            logs_dir = os.path.abspath(logs_dir)
+            os.makedirs(logs_dir, exist_ok=True)
+            retry_log_path = os.getenv('DS_RETRY_LOG', os.path.join(logs_dir, 'retry.log'))
+            fh = RotatingFileHandler(
+                retry_log_path,
+                maxBytes=_env_int("DS_RETRY_LOG_MAX_BYTES", 5 * 1024 * 1024),
+                backupCount=_env_int("DS_RETRY_LOG_BACKUPS", 3),
+                encoding='utf-8',
+                delay=True,
             )
-            rh.setLevel(level)
-            # RichHandler generally handles formatting internally; avoid double
-            # formatting by setting a minimal formatter for compatibility.
-            rh.setFormatter(logging.Formatter("%(message)s"))
-            logger.addHandler(rh)
-        except Exception:
-            # fallback to a plain console handler with padded level names (uv-style)
-            sh = StreamHandler(stream=sys.stdout)
-            sh.setLevel(level)
-            sh.setFormatter(fmt)
-            logger.addHandler(sh)
-
-    # Also prepare a dedicated retry logger that writes to a file. This keeps
-    # retry-related noise out of the console while making a persistent record.
-    try:
-        logs_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'logs')
-        logs_dir = os.path.abspath(logs_dir)
-        os.makedirs(logs_dir, exist_ok=True)
-        retry_log_path = os.getenv('DS_RETRY_LOG', os.path.join(logs_dir, 'retry.log'))
-        retry_logger = logging.getLogger('ds_translator.retry')
-        if not retry_logger.handlers:
-            fh = FileHandler(retry_log_path, encoding='utf-8')
             fh.setLevel(logging.DEBUG)
             fh.setFormatter(fmt)
-            retry_logger.addHandler(fh)
+            collapsed_file = _CollapsingHandler(fh, window=window)
+            collapsed_file.addFilter(_NameFilter(RETRY_LOGGER_NAME))
+            handlers.append(collapsed_file)
+        except Exception as e:
+            # Never let logging setup crash the application
+            sys.stderr.write(f'无法初始化重试日志文件处理器: {e}\n')
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _DeferredQueueHandler(log_queue)
+        logger.addHandler(queue_handler)
+        if not retry_logger.handlers:
+            retry_logger.addHandler(queue_handler)
             retry_logger.propagate = False
-    except Exception:
-        # Never let logging setup crash the application
-        logger.exception('无法初始化重试日志文件处理器')
 
-    # avoid propagation to root logger handlers twice
-    logger.propagate = False
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+        # avoid propagation to root logger handlers twice
+        logger.propagate = False
     return logger
+
+
+def shutdown_logging():
+    """Drain the log queue, write pending repeat summaries and stop the listener."""
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is None:
+        return
+    try:
+        listener.stop()
+    finally:
+        for h in listener.handlers:
+            try:
+                h.flush()
+            except Exception:
+                pass
@@ -0,0 +1,157 @@
+"""Keep the translation cache bounded and its database compact.
+
+Left alone, ``translation_cache.db`` only grows. Failure markers written
+by the retry worker stay forever, every line ever translated stays, and
+deleted pages are never returned to the file system. ``run()`` does one
+maintenance pass:
+
+1. expire ``[翻译失败]`` markers older than ``DS_CACHE_FAILED_TTL`` hours
+   (default 168), so those lines are translated again;
+2. drop stale entries: rows shadowed by the global lexicon (it is
+   consulted before the cache, so they are never read), and the import
+   state of cache exports not imported for ``DS_SYNC_STATE_TTL`` days
+   (default 90);
+3. evict unverified rows beyond ``DS_CACHE_MAX_ROWS`` rows or
+   ``DS_CACHE_MAX_MB`` megabytes (0 = no limit, the default), least
+   valuable first: hit count discounted by the time since last use
+   (``DS_CACHE_EVICT_DAYS``, default 30, see ``db.evict``);
+4. drop indexes that duplicate the primary key (the old ``idx_original``);
+5. return free pages with ``PRAGMA incremental_vacuum`` and refresh the
+   planner statistics with ``ANALYZE``.
+
+Caches created before incremental vacuum was enabled need one full
+``VACUUM`` to switch over. ``main.py --maintain-cache`` does it
+(``compact=True``); scheduled passes leave it to the command. Database
+size and lookup latency (the same sample of keys) are measured before
+and after, and ``format_result`` turns the result into report lines.
+
+``main.py --watch`` and ``--serve`` call ``maybe_run()`` between jobs. It
+runs a pass when the last one recorded in the database is older than
+``DS_CACHE_MAINTAIN_HOURS`` (default 24; 0 disables scheduled passes).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from ds_translator import db
+from ds_translator import lexicon as lex
+from ds_translator import metrics
+
+logger = logging.getLogger("ds_translator.maintenance")
+
+FAILED = "[翻译失败]"
+# keys timed before and after a pass
+LATENCY_SAMPLE = 1000
+# pages freed per scheduled pass, so a pass never stalls a job for long
+SCHEDULED_VACUUM_PAGES = 20_000
+# seconds between checks of the last-run time in long-running modes
+_CHECK_INTERVAL = 60.0
+
+_next_check = 0.0
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _measure(keys: list[str]) -> dict:
+    size = db.get_size()
+    timings = sorted(db.time_lookups(keys))
+    size["p50_us"] = statistics.median(timings) * 1e6 if timings else 0.0
+    size["p95_us"] = timings[int(len(timings) * 0.95)] * 1e6 if timings else 0.0
+    return size
+
+
+def _ago(**delta) -> str:
+    return (datetime.now() - timedelta(**delta)).isoformat()
+
+
+def run(compact: bool = False) -> dict:
+    """One maintenance pass over the cache (see the module docstring)."""
+    start = time.perf_counter()
+    keys = db.sample_keys(LATENCY_SAMPLE)
+    result = {"before": _measure(keys)}
+    with metrics.timer("maintenance.expire"):
+        result["expired"] = db.expire_translation(FAILED, _ago(hours=_env_number("DS_CACHE_FAILED_TTL", 168)))
+        result["shadowed"] = db.delete_unverified(lex.shared_store().get())
+        result["origins"] = db.forget_sync_origins(_ago(days=_env_number("DS_SYNC_STATE_TTL", 90)))
+
+    size = db.get_size()
+    target = size["rows"]
+    max_rows = int(_env_number("DS_CACHE_MAX_ROWS", 0))
+    max_bytes = _env_number("DS_CACHE_MAX_MB", 0) * 1024 * 1024
+    if max_rows > 0:
+        target = min(target, max_rows)
+    used = size["bytes"] - size["free_bytes"]
+    if max_bytes > 0 and used > max_bytes:
+        # pages hold rows and their index entries alike, so size scales with rows
+        target = min(target, int(size["rows"] * max_bytes / used))
+    result["evicted"] = db.evict(size["rows"] - target, _env_number("DS_CACHE_EVICT_DAYS", 30))
+
+    result["indexes"] = db.drop_redundant_indexes()
+    result["vacuum"] = db.vacuum(0 if compact else SCHEDULED_VACUUM_PAGES, convert=compact)
+    db.analyze()
+    result["after"] = _measure(keys)
+    result["seconds"] = time.perf_counter() - start
+    for key in ("expired", "shadowed", "evicted"):
+        metrics.inc(f"maintenance.{key}", result[key])
+    db.record_maintenance(result)
+    return result
+
+
+def due() -> bool:
+    """Whether a scheduled pass is due (``DS_CACHE_MAINTAIN_HOURS`` since the last one)."""
+    hours = _env_number("DS_CACHE_MAINTAIN_HOURS", 24)
+    if hours <= 0:
+        return False
+    last = db.get_last_maintenance()
+    return last is None or last < _ago(hours=hours)
+
+
+def maybe_run() -> Optional[dict]:
+    """Run a pass if one is due; cheap enough to call between every job."""
+    global _next_check
+    now = time.monotonic()
+    if now < _next_check:
+        return None
+    _next_check = now + _CHECK_INTERVAL
+    if not due():
+        return None
+    try:
+        return run()
+    except Exception as e:
+        # a locked or read-only cache must not stop the watcher or the service
+        logger.warning(f"缓存维护失败: {e}")
+        return None
+
+
+def _mb(n: float) -> str:
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+def format_result(result: dict) -> list[str]:
+    """Report lines of one ``run``."""
+    before, after = result["before"], result["after"]
+    lines = [
+        f"过期失败标记 {result['expired']} 条，删除被词库覆盖的条目 {result['shadowed']} 条，"
+        f"超出上限淘汰 {result['evicted']} 条"
+        + (f"，清除 {result['origins']} 个长期未导入的缓存导出记录" if result["origins"] else ""),
+        f"数据库 {_mb(before['bytes'])} -> {_mb(after['bytes'])}（{before['rows']} -> {after['rows']} 条，"
+        f"空闲 {_mb(after['free_bytes'])}），查询延迟中位数 {before['p50_us']:.1f} -> {after['p50_us']:.1f} µs，"
+        f"p95 {before['p95_us']:.1f} -> {after['p95_us']:.1f} µs，用时 {result['seconds']:.2f} s",
+    ]
+    if result["indexes"]:
+        lines.append(f"已删除与主键重复的索引: {', '.join(result['indexes'])}")
+    if result["vacuum"] == "converted":
+        lines.append("已转换为增量回收空间（完整 VACUUM 一次），以后的维护只需回收空闲页")
+    elif result["vacuum"] == "off":
+        lines.append("缓存尚未启用增量回收空间，运行 python main.py --maintain-cache 转换后才会缩小文件")
+    return lines
@@ -0,0 +1,219 @@
+"""Translation manifest: what each roasted output was produced from.
+
+``data/manifest.json`` (``DS_MANIFEST`` to override) maps every source
+subtitle name to the size, mtime and SHA-256 it had when it was
+translated, the output's size and mtime, and the settings used (model
+and lexicon version). ``pending_files`` uses it to return only new or
+changed sources:
+
+- the stat signature is compared first, so unchanged files cost one
+  ``stat`` and no reads; only a changed signature triggers hashing (a
+  ``touch`` without content change just refreshes the record);
+- an output whose size/mtime no longer match the record (e.g. left
+  behind by an interrupted run) is not counted as done;
+- a different lexicon version re-queues the file (lexicon hits are
+  resolved before the cache, so the re-run costs no API calls).
+
+The model is recorded for reference only: the translation cache is not
+keyed by model, so re-queueing on a model change would just rebuild the
+same output from the cache.
+
+Outputs that predate the manifest are adopted as-is on first sight.
+Inside ``batch()`` finished files are kept in memory and written every
+``FLUSH_EVERY`` records and when the batch ends, instead of rewriting the
+whole file after every translation.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+logger = logging.getLogger("ds_translator.manifest")
+
+MANIFEST_PATH = os.getenv("DS_MANIFEST") or os.path.abspath(os.path.join(os.getcwd(), "data", "manifest.json"))
+VERSION = 1
+# records held in memory inside batch() before the manifest is rewritten
+FLUSH_EVERY = 50
+
+_lock = threading.Lock()
+# records not yet written, and how many batch() blocks are open
+_unsaved: dict = {}
+_batches = 0
+
+
+def output_name(filename: str) -> str:
+    """``movie.srt`` -> ``movie-roasted.srt``."""
+    name, ext = os.path.splitext(filename)
+    return f"{name}-roasted{ext}"
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def lexicon_version() -> Optional[str]:
+    """Short content hash of the lexicon CSVs, show files included (None if there are none)."""
+    from ds_translator import lexicon as lex
+
+    return lex.source_version()
+
+
+def current_settings() -> dict:
+    from ds_translator import settings
+
+    return {"model": settings.get().model, "lexicon": lexicon_version()}
+
+
+def source_signature(path: str) -> dict:
+    """Size, mtime and hash of a source file; take it *before* translating."""
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": file_sha256(path)}
+
+
+def load() -> dict:
+    """Return the ``files`` mapping (empty when missing or unreadable)."""
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"无法读取清单 {MANIFEST_PATH}，将重新建立: {e}")
+        return {}
+    if data.get("version") != VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save(files: dict) -> None:
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION, "files": files}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def record(input_path: str, output_path: str, signature: Optional[dict] = None, settings: Optional[dict] = None) -> None:
+    """Record a finished translation of ``input_path`` into ``output_path``."""
+    if not os.path.exists(output_path):
+        # nothing was written (e.g. no cues parsed)
+        return
+    signature = signature or source_signature(input_path)
+    ost = os.stat(output_path)
+    entry = dict(signature)
+    entry.update(settings or current_settings())
+    entry.update({
+        "output_size": ost.st_size,
+        "output_mtime_ns": ost.st_mtime_ns,
+        "translated_at": datetime.now().isoformat(timespec="seconds"),
+    })
+    with _lock:
+        _unsaved[os.path.basename(input_path)] = entry
+        if _batches and len(_unsaved) < FLUSH_EVERY:
+            return
+        _flush_locked()
+
+
+def _flush_locked() -> None:
+    if not _unsaved:
+        return
+    files = load()
+    files.update(_unsaved)
+    save(files)
+    _unsaved.clear()
+
+
+def flush() -> None:
+    """Write the records kept in memory (raises ``OSError``; they are kept for the next try)."""
+    with _lock:
+        _flush_locked()
+
+
+@contextmanager
+def batch() -> Iterator[None]:
+    """Keep ``record`` calls in memory for a run of files and write them once at the end."""
+    global _batches
+    with _lock:
+        _batches += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _batches -= 1
+            try:
+                _flush_locked()
+            except OSError as e:
+                logger.warning(f"无法写入清单 {MANIFEST_PATH}: {e}")
+
+
+def pending_files(input_dir: str, output_dir: str) -> list[str]:
+    """Names of ``.srt`` files in ``input_dir`` that are new or changed since their output was written."""
+    with _lock:
+        files = load()
+        files.update(_unsaved)
+        outputs = {}
+        with os.scandir(output_dir) as it:
+            for entry in it:
+                if entry.name.lower().endswith(".srt"):
+                    outputs[entry.name] = entry
+        lexicon = lexicon_version()
+        settings = None
+        pending = []
+        dirty = False
+
+        with os.scandir(input_dir) as it:
+            sources = [e for e in it if e.name.lower().endswith(".srt")]
+        for src in sources:
+            name = src.name
+            out = outputs.get(output_name(name))
+            if out is None:
+                pending.append(name)
+                continue
+            st = src.stat()
+            ost = out.stat()
+            rec = files.get(name)
+            if rec is None:
+                # translated before the manifest existed: adopt the output
+                settings = settings or current_settings()
+                files[name] = {
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "sha256": file_sha256(src.path),
+                    **settings,
+                    "output_size": ost.st_size,
+                    "output_mtime_ns": ost.st_mtime_ns,
+                    "translated_at": None,
+                }
+                dirty = True
+                continue
+            if rec.get("lexicon") != lexicon:
+                pending.append(name)
+                continue
+            if (ost.st_size, ost.st_mtime_ns) != (rec.get("output_size"), rec.get("output_mtime_ns")):
+                pending.append(name)
+                continue
+            if (st.st_size, st.st_mtime_ns) == (rec.get("size"), rec.get("mtime_ns")):
+                continue
+            if file_sha256(src.path) == rec.get("sha256"):
+                rec["size"], rec["mtime_ns"] = st.st_size, st.st_mtime_ns
+                dirty = True
+                continue
+            pending.append(name)
+
+        if dirty or _unsaved:
+            try:
+                save(files)
+                _unsaved.clear()
+            except OSError as e:
+                logger.warning(f"无法写入清单 {MANIFEST_PATH}: {e}")
+    return pending
@@ -0,0 +1,324 @@
+"""Lightweight pipeline metrics: counters, gauges and latency histograms.
+
+Metrics are disabled unless ``DS_METRICS`` is set (1/true/yes) or
+``enable()`` is called. When disabled every recording function returns
+immediately and ``timer()`` hands back a shared no-op context manager, so
+instrumented code pays one global lookup and one branch per call.
+
+Usage:
+    from ds_translator import metrics
+
+    with metrics.timer("srt.parse"):
+        subtitles = parse_srt(content)
+    metrics.inc("api.source", source="cache")
+    metrics.gauge_add("api.in_flight", 1)
+
+    with metrics.file_scope("movie.srt"):
+        ...  # everything recorded here is also aggregated per file
+
+At the end of a run ``write_reports(logs_dir)`` writes a JSON summary and,
+with ``DS_METRICS_PROM=1``, a Prometheus text-format file.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Optional
+
+_ENABLED = os.getenv("DS_METRICS", "0").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds in seconds (roughly x2.5 steps, 0.1ms .. 60s)
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_lock = threading.Lock()
+# key: (name, labels) where labels is a sorted tuple of (k, v) pairs
+_counters: dict[tuple, float] = {}
+_gauges: dict[tuple, float] = {}
+_gauge_peaks: dict[tuple, float] = {}
+_histograms: dict[tuple, "_Histogram"] = {}
+# Current file label (per thread); set by file_scope()
+_local = threading.local()
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile (upper bound of the bucket that contains it)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+
+def enable(flag: bool = True) -> None:
+    """Turn metrics collection on (or off) at runtime."""
+    global _ENABLED
+    _ENABLED = bool(flag)
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def reset() -> None:
+    """Drop everything recorded so far."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _gauge_peaks.clear()
+        _histograms.clear()
+
+
+def _keys(name: str, labels: dict[str, Any]):
+    """Yield the global key and, inside a file scope, the per-file key."""
+    base = tuple(sorted(labels.items())) if labels else ()
+    yield (name, base)
+    fname = getattr(_local, "file", None)
+    if fname is not None:
+        yield (name, base + (("file", fname),))
+
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    """Increase counter ``name`` by ``value``."""
+    if not _ENABLED:
+        return
+    with _lock:
+        for key in _keys(name, labels):
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels: Any) -> None:
+    """Record one latency sample (seconds) into histogram ``name``."""
+    if not _ENABLED:
+        return
+    with _lock:
+        for key in _keys(name, labels):
+            h = _histograms.get(key)
+            if h is None:
+                h = _histograms[key] = _Histogram()
+            h.add(seconds)
+
+
+def gauge_set(name: str, value: float, **labels: Any) -> None:
+    """Set gauge ``name`` (gauges are global, never per file)."""
+    if not _ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _gauges[key] = value
+        if value > _gauge_peaks.get(key, float("-inf")):
+            _gauge_peaks[key] = value
+
+
+def gauge_add(name: str, delta: float, **labels: Any) -> None:
+    """Add ``delta`` to gauge ``name`` (use +1/-1 around in-flight work)."""
+    if not _ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        value = _gauges.get(key, 0) + delta
+        _gauges[key] = value
+        if value > _gauge_peaks.get(key, float("-inf")):
+            _gauge_peaks[key] = value
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name: str, labels: dict[str, Any]) -> None:
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str, **labels: Any):
+    """Context manager that records the elapsed time of its block."""
+    if not _ENABLED:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+@contextmanager
+def file_scope(filename: Optional[str]):
+    """Aggregate everything recorded in this thread under ``file=filename`` too."""
+    previous = getattr(_local, "file", None)
+    _local.file = filename
+    try:
+        yield
+    finally:
+        _local.file = previous
+
+
+# ----------------------
+# Export
+# ----------------------
+def _label_dict(labels: tuple) -> dict[str, Any]:
+    return {k: v for k, v in labels}
+
+
+def summary() -> dict[str, Any]:
+    """Return a JSON-serialisable snapshot of all metrics."""
+    with _lock:
+        counters = [
+            {"name": n, "labels": _label_dict(l), "value": v}
+            for (n, l), v in sorted(_counters.items(), key=lambda kv: (kv[0][0], str(kv[0][1])))
+        ]
+        gauges = [
+            {"name": n, "labels": _label_dict(l), "value": v, "peak": _gauge_peaks.get((n, l), v)}
+            for (n, l), v in sorted(_gauges.items(), key=lambda kv: (kv[0][0], str(kv[0][1])))
+        ]
+        histograms = []
+        for (n, l), h in sorted(_histograms.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+            histograms.append({
+                "name": n,
+                "labels": _label_dict(l),
+                "count": h.count,
+                "sum": round(h.total, 6),
+                "mean": round(h.total / h.count, 6) if h.count else 0.0,
+                "min": round(h.min, 6) if h.count else 0.0,
+                "max": round(h.max, 6),
+                "p50": round(h.quantile(0.5), 6),
+                "p95": round(h.quantile(0.95), 6),
+            })
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "counters": counters,
+        "gauges": gauges,
+        "histograms": histograms,
+    }
+
+
+def _prom_name(name: str) -> str:
+    return "ds_" + "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def _prom_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in items
+    )
+    return "{" + body + "}"
+
+
+def prometheus_text() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    out: list[str] = []
+    with _lock:
+        seen: set[str] = set()
+        for (n, l), v in sorted(_counters.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+            pn = _prom_name(n) + "_total"
+            if pn not in seen:
+                out.append(f"# TYPE {pn} counter")
+                seen.add(pn)
+            out.append(f"{pn}{_prom_labels(l)} {v}")
+        for (n, l), v in sorted(_gauges.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+            pn = _prom_name(n)
+            if pn not in seen:
+                out.append(f"# TYPE {pn} gauge")
+                seen.add(pn)
+            out.append(f"{pn}{_prom_labels(l)} {v}")
+        for (n, l), h in sorted(_histograms.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+            pn = _prom_name(n) + "_seconds"
+            if pn not in seen:
+                out.append(f"# TYPE {pn} histogram")
+                seen.add(pn)
+            cumulative = 0
+            for bound, c in zip(BUCKETS, h.counts):
+                cumulative += c
+                out.append(f"{pn}_bucket{_prom_labels(l, (('le', bound),))} {cumulative}")
+            out.append(f"{pn}_bucket{_prom_labels(l, (('le', '+Inf'),))} {h.count}")
+            out.append(f"{pn}_sum{_prom_labels(l)} {h.total}")
+            out.append(f"{pn}_count{_prom_labels(l)} {h.count}")
+    return "\n".join(out) + "\n"
+
+
+def write_reports(logs_dir: str, prometheus: Optional[bool] = None) -> list[str]:
+    """Write ``metrics-<timestamp>.json`` (and optionally ``metrics.prom``).
+
+    Returns the list of written paths; does nothing when metrics are disabled.
+    """
+    if not _ENABLED:
+        return []
+    if prometheus is None:
+        prometheus = os.getenv("DS_METRICS_PROM", "0").lower() in ("1", "true", "yes")
+    os.makedirs(logs_dir, exist_ok=True)
+    written = []
+    json_path = os.path.join(logs_dir, f"metrics-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(summary(), f, ensure_ascii=False, indent=2)
+    written.append(json_path)
+    if prometheus:
+        # fixed name so a node_exporter textfile collector can pick it up
+        prom_path = os.path.join(logs_dir, "metrics.prom")
+        tmp_path = prom_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, prom_path)
+        written.append(prom_path)
+    return written
+
+
+def format_stage_table(top: int = 12) -> list[str]:
+    """Return short human-readable lines for the slowest stages (global only)."""
+    rows = [h for h in summary()["histograms"] if "file" not in h["labels"]]
+    rows.sort(key=lambda h: h["sum"], reverse=True)
+    lines = []
+    for h in rows[:top]:
+        label = h["name"]
+        extra = {k: v for k, v in h["labels"].items()}
+        if extra:
+            label += "{" + ",".join(f"{k}={v}" for k, v in extra.items()) + "}"
+        lines.append(f"{label:<36} n={h['count']:<7} total={h['sum']:.3f}s mean={h['mean'] * 1000:.2f}ms p95<={h['p95'] * 1000:.1f}ms")
+    return lines
@@ -0,0 +1,227 @@
+"""Dry-run planning: what a batch will cost before anything is sent.
+
+``plan(jobs, lexicon)`` walks the same decisions as ``translate_srt_file``
+without calling the API or writing outputs:
+
+1. every file is read and parsed (in worker processes when there are
+   enough files, ``DS_PLAN_WORKERS``), together with the incremental
+   reuse check against an existing output;
+2. pre-translate hooks run over the cues, then each remaining cue is
+   classified as lexicon (the file's show namespace when ``lexicon`` is
+   a ``LexiconStore``) / fast path / cache / API, with the cache
+   resolved in bulk (``db.get_translations_bulk``, hit counts are left
+   alone). A text sent to the API earlier in the batch counts as a cache
+   hit afterwards, as it would in a real run;
+3. API cues are routed (``routing.choose``) and their prompt and
+   completion tokens estimated. The system prompt is the same for every
+   full-prompt request with the same lexicon, so after the first one its
+   leading 64-token blocks are counted as prefix-cache hits;
+4. wall time is ``calls x DS_PLAN_LATENCY / DS_PLAN_CONCURRENCY``
+   (the pipeline sends one request at a time, so concurrency defaults
+   to 1), but no faster than ``DS_PLAN_RPM`` requests per minute allows.
+
+Token counts are estimates (about 0.6 tokens per CJK character and 0.3
+per other character), good for budgeting, not billing.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import math
+import os
+import re
+import sqlite3
+from typing import Optional
+
+from ds_translator import api
+from ds_translator import db
+from ds_translator import fastpath
+from ds_translator import hooks
+from ds_translator import incremental
+from ds_translator import lexicon as lex
+from ds_translator import routing
+
+logger = logging.getLogger("ds_translator.planner")
+
+# below this many files, parsing in-process beats starting worker processes
+_PARALLEL_MIN_FILES = 8
+# DeepSeek's context cache stores prompt prefixes in blocks of this many tokens
+_CACHE_BLOCK = 64
+# tokens added by the chat format per message
+_MESSAGE_OVERHEAD = 4
+# expected translation length relative to the Japanese source
+_OUTPUT_RATIO = 0.9
+
+_CJK = re.compile(r"[　-〿぀-ヿ㐀-䶿一-鿿＀-￯]")
+
+_worker_lexicon = None
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(_CJK.findall(text))
+    return math.ceil(cjk * 0.6 + (len(text) - cjk) * 0.3)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _init_worker(key_sets) -> None:
+    global _worker_lexicon
+    _worker_lexicon = key_sets
+
+
+def _scan_file(input_path: str, output_path: str, incremental_mode: bool, lexicon_keys=None, slot: int = 0):
+    """Read and parse one file; returns (subtitles, reuse flags or None, error)."""
+    from ds_translator.srt import _read_text_with_fallback, parse_srt
+
+    if lexicon_keys is None:
+        lexicon_keys = _worker_lexicon[slot]
+    try:
+        content, _encoding = _read_text_with_fallback(input_path, progress_callback=lambda *_: None)
+    except OSError as e:
+        return [], None, str(e)
+    subtitles = parse_srt(content)
+    reuse = None
+    if incremental_mode and subtitles:
+        previous = incremental.load_previous(output_path)
+        if previous:
+            reuse = [t is not None for t in incremental.reusable_translations(subtitles, previous, lexicon_keys)]
+    return subtitles, reuse, None
+
+
+def _scan_all(jobs, incremental_mode: bool, lexicons) -> list:
+    # one key set per distinct lexicon view, sent to each worker once
+    key_sets = []
+    slots = {}
+    which = []
+    for lexicon in lexicons:
+        slot = slots.get(id(lexicon))
+        if slot is None:
+            slot = slots[id(lexicon)] = len(key_sets)
+            key_sets.append(frozenset(lexicon))
+        which.append(slot)
+    try:
+        workers = int(os.getenv("DS_PLAN_WORKERS", "0")) or (os.cpu_count() or 1)
+    except ValueError:
+        workers = os.cpu_count() or 1
+    if len(jobs) < _PARALLEL_MIN_FILES or workers < 2:
+        return [_scan_file(i, o, incremental_mode, key_sets[slot]) for (_name, i, o), slot in zip(jobs, which)]
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(key_sets,)) as pool:
+        return list(pool.map(_scan_file, [i for _n, i, _o in jobs], [o for _n, _i, o in jobs],
+                             [incremental_mode] * len(jobs), [None] * len(jobs), which, chunksize=chunksize))
+
+
+def _new_row(name: str) -> dict:
+    return {
+        "file": name, "cues": 0, "local": 0, "reused": 0, "cache": 0, "api": 0,
+        "prompt_tokens": 0, "prompt_cache_hit_tokens": 0, "completion_tokens": 0,
+        "cost": 0.0, "seconds": 0.0, "error": None,
+    }
+
+
+def plan(jobs, lexicon, incremental_mode: Optional[bool] = None) -> dict:
+    """Estimate API calls, tokens, cost and time for ``jobs`` ((name, input, output) tuples).
+
+    ``lexicon`` is a ``LexiconStore`` (each file gets its show's view) or
+    one mapping used for every file.
+    """
+    if incremental_mode is None:
+        incremental_mode = incremental.enabled()
+    if isinstance(lexicon, lex.LexiconStore):
+        lexicons = [lexicon.for_file(name) for name, _i, _o in jobs]
+    else:
+        lexicons = [lexicon or {}] * len(jobs)
+    scans = _scan_all(jobs, incremental_mode, lexicons)
+
+    # per-file cues that still need a translation after hooks / reuse / lexicon / fast path
+    use_fastpath = fastpath.enabled()
+    fast_memo: dict[str, bool] = {}
+    pending = []
+    for (name, _input, _output), lexicon, (subtitles, reuse, error) in zip(jobs, lexicons, scans):
+        row = _new_row(name)
+        row["error"] = error
+        cues = hooks.run(hooks.PRE, hooks.make_cues(subtitles)) if subtitles else []
+        row["cues"] = len(cues)
+        prepared = [(cue["index"], cue["timecode"], cue["text"]) for cue in cues]
+        todo = []
+        for i, cue in enumerate(cues):
+            text = cue["text"].strip()
+            if cue["translation"] is not None or not text:
+                row["local"] += 1
+            elif reuse is not None and reuse[i]:
+                row["reused"] += 1
+            else:
+                local = text in lexicon
+                if not local and use_fastpath:
+                    local = fast_memo.get(text)
+                    if local is None:
+                        local = fast_memo[text] = fastpath.lookup(text) is not None
+                if local:
+                    row["local"] += 1
+                else:
+                    todo.append((i, text))
+        pending.append((row, lexicon, prepared, todo))
+
+    try:
+        cached = db.get_translations_bulk(t for _row, _l, _p, todo in pending for _i, t in todo)
+    except sqlite3.Error as e:
+        logger.warning(f"无法读取翻译缓存，按全部未命中估算: {e}")
+        cached = {}
+
+    from ds_translator.srt import _build_context
+
+    # id(lexicon) -> tokens of the full system prompt built with it
+    full_system: dict[int, int] = {}
+    context_wrapper_tokens = estimate_tokens("上下文（仅供参考）：\n\n\n请只翻译标记为 [NOW] 的那一行，且仅输出译文。") + _MESSAGE_OVERHEAD
+    latency = _env_float("DS_PLAN_LATENCY", 1.5)
+    concurrency = max(_env_float("DS_PLAN_CONCURRENCY", 1), 1)
+    rpm = _env_float("DS_PLAN_RPM", 0)
+
+    seen = set(cached)
+    # system prompts already sent once (their prefix is cached from then on)
+    full_sent = set()
+    rows = []
+    for row, lexicon, prepared, todo in pending:
+        for i, text in todo:
+            if text in seen:
+                row["cache"] += 1
+                continue
+            seen.add(text)
+            route = routing.choose(text, lexicon)
+            if route.compact:
+                messages = routing.compact_messages(text, lexicon)
+                prompt = sum(estimate_tokens(m["content"]) + _MESSAGE_OVERHEAD for m in messages)
+                hit = 0
+            else:
+                system_tokens = full_system.get(id(lexicon))
+                if system_tokens is None:
+                    system = api._build_full_messages("", lexicon)[0]["content"]
+                    system_tokens = full_system[id(lexicon)] = estimate_tokens(system) + _MESSAGE_OVERHEAD
+                context = _build_context(prepared, i, 1)
+                prompt = system_tokens + context_wrapper_tokens + estimate_tokens(context) \
+                    + estimate_tokens(text) + _MESSAGE_OVERHEAD
+                hit = system_tokens // _CACHE_BLOCK * _CACHE_BLOCK if id(lexicon) in full_sent else 0
+                full_sent.add(id(lexicon))
+            completion = min(route.max_tokens, math.ceil(estimate_tokens(text) * _OUTPUT_RATIO) + 2)
+            row["api"] += 1
+            row["prompt_tokens"] += prompt
+            row["prompt_cache_hit_tokens"] += hit
+            row["completion_tokens"] += completion
+            row["cost"] += routing.cost(route.name, prompt - hit, hit, completion)
+        seconds = row["api"] * latency / concurrency
+        if rpm > 0:
+            seconds = max(seconds, row["api"] * 60.0 / rpm)
+        row["seconds"] = seconds
+        rows.append(row)
+
+    totals = _new_row("合计")
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[key] += value
+    return {"files": rows, "totals": totals, "latency": latency, "concurrency": concurrency, "rpm": rpm}
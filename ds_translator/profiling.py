@@ -0,0 +1,207 @@
+"""Opt-in profiling for translation runs.
+
+Enabled with ``DS_PROFILE`` (or ``main.py --profile``):
+
+- ``cprofile``: deterministic cProfile of each ``translate_srt_file`` call,
+  written as ``profile-<file>-<ts>.pstats`` (open with ``python -m pstats``
+  or snakeviz). tracemalloc is on by default in this mode.
+- ``sample``: a background thread samples the translating thread's stack
+  every ``DS_PROFILE_INTERVAL`` seconds (default 0.005). Overhead stays
+  low; results are written as ``profile-<file>-<ts>.samples.txt`` in
+  collapsed-stack format (usable with flamegraph.pl / speedscope).
+  tracemalloc is off unless ``DS_PROFILE_TRACEMALLOC=1``.
+
+With tracemalloc on, the top allocation sites go to
+``profile-<file>-<ts>.alloc.txt``. All files land in ``data/logs``.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import cProfile
+
+# cProfile, pstats and tracemalloc are imported only when a profile is taken,
+# so importing this module (for MODES / from_env) stays cheap.
+MODES = ("cprofile", "sample")
+
+
+def _safe_stem(filename: str) -> str:
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"[^\w.-]+", "_", stem)[:80] or "file"
+
+
+class _StackSampler:
+    """Sample one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.self_hits: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ds_profile_sampler")
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            leaf = frame
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[";".join(stack)] += 1
+            code = leaf.f_code
+            self.self_hits[(code.co_filename, leaf.f_lineno, code.co_name)] += 1
+            self.samples += 1
+
+
+class RunProfiler:
+    """Profiles each file of a run according to ``mode`` and writes reports."""
+
+    def __init__(self, mode: str, logs_dir: str, interval: Optional[float] = None, trace_memory: Optional[bool] = None, top: int = 8) -> None:
+        if mode not in MODES:
+            raise ValueError(f"unknown profile mode {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.logs_dir = logs_dir
+        if interval is None:
+            try:
+                interval = float(os.getenv("DS_PROFILE_INTERVAL", "0.005"))
+            except ValueError:
+                interval = 0.005
+        self.interval = max(0.0005, interval)
+        if trace_memory is None:
+            env = os.getenv("DS_PROFILE_TRACEMALLOC")
+            trace_memory = (mode == "cprofile") if env is None else env.lower() in ("1", "true", "yes")
+        self.trace_memory = trace_memory
+        self.top = top
+        os.makedirs(logs_dir, exist_ok=True)
+
+    def _base_path(self, filename: str) -> str:
+        ts = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return os.path.join(self.logs_dir, f"profile-{_safe_stem(filename)}-{ts}")
+
+    @contextmanager
+    def profile(self, filename: str):
+        """Profile the enclosed block; yields a list that receives summary lines."""
+        import tracemalloc
+
+        summary: list[str] = []
+        base = self._base_path(filename)
+        started_tracemalloc = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(int(os.getenv("DS_PROFILE_TRACEMALLOC_FRAMES", "1")))
+            started_tracemalloc = True
+
+        profiler = sampler = None
+        if self.mode == "cprofile":
+            import cProfile
+
+            profiler = cProfile.Profile()
+        else:
+            sampler = _StackSampler(threading.get_ident(), self.interval)
+
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        else:
+            sampler.start()
+        try:
+            yield summary
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            else:
+                sampler.stop()
+            elapsed = time.perf_counter() - start
+
+            try:
+                if profiler is not None:
+                    summary.extend(self._write_cprofile(profiler, base, elapsed))
+                else:
+                    summary.extend(self._write_samples(sampler, base, elapsed))
+                if started_tracemalloc:
+                    summary.extend(self._write_allocations(base))
+            finally:
+                if started_tracemalloc:
+                    tracemalloc.stop()
+
+    def _write_cprofile(self, profiler: cProfile.Profile, base: str, elapsed: float) -> list[str]:
+        import io
+        import pstats
+
+        path = base + ".pstats"
+        profiler.dump_stats(path)
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        rows = []
+        for (fname, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():  # type: ignore[attr-defined]
+            rows.append((tt, ct, nc, f"{func} ({os.path.basename(fname)}:{line})"))
+        rows.sort(reverse=True)
+        lines = [f"cProfile {elapsed:.2f}s -> {path}"]
+        for tt, ct, nc, label in rows[:self.top]:
+            lines.append(f"  self={tt:.3f}s cum={ct:.3f}s calls={nc:<7} {label}")
+        return lines
+
+    def _write_samples(self, sampler: _StackSampler, base: str, elapsed: float) -> list[str]:
+        path = base + ".samples.txt"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        lines = [f"sampled {sampler.samples} stacks every {self.interval * 1000:.1f}ms over {elapsed:.2f}s -> {path}"]
+        total = sampler.samples or 1
+        for (fname, line, func), count in sampler.self_hits.most_common(self.top):
+            lines.append(f"  {count / total:6.1%} {func} ({os.path.basename(fname)}:{line})")
+        return lines
+
+    def _write_allocations(self, base: str) -> list[str]:
+        import tracemalloc
+
+        path = base + ".alloc.txt"
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        stats = snapshot.statistics("lineno")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"current={current / 1024:.1f} KiB peak={peak / 1024:.1f} KiB\n\n")
+            for stat in stats[:50]:
+                f.write(f"{stat}\n")
+        return [f"tracemalloc peak={peak / 1024:.1f} KiB -> {path}"]
+
+
+def from_env(mode: Optional[str], logs_dir: str) -> Optional[RunProfiler]:
+    """Build a RunProfiler from an explicit mode or ``DS_PROFILE`` (None if off)."""
+    mode = (mode or os.getenv("DS_PROFILE", "")).strip().lower()
+    if mode in ("", "0", "false", "no", "off"):
+        return None
+    if mode in ("1", "true", "yes"):
+        mode = "sample"
+    return RunProfiler(mode, logs_dir)
+
+
+def profile_file(profiler: Optional[RunProfiler], filename: str):
+    """Return ``profiler.profile(filename)`` or a no-op context when profiling is off."""
+    if profiler is None:
+        return nullcontext([])
+    return profiler.profile(filename)
@@ -0,0 +1,164 @@
+"""Ingest hand-corrected bilingual subtitles into the translation cache.
+
+Editors correct ``-roasted.srt`` outputs and put them in
+``data/proofread`` (subdirectories are fine). ``ingest`` reads every
+``.srt`` there with the streaming block parser
+(``incremental.read_bilingual_srt``). It aligns each file's original
+lines with the cues of its source subtitle: ``x-roasted.srt`` ->
+``x.srt`` in the input directory, after the pre-translate hooks, so the
+pairs are keyed exactly as ``api.translate_text`` looks them up. The
+alignment is a sequence diff, as in incremental re-translation. Without a
+source file, the proofread file's own original lines are used.
+
+Lines answered by the lexicon or the local fast path are skipped, since
+those are consulted before the cache. Pairs from all files are
+collected. When copies of a line disagree, a verified cached version
+among them is kept; otherwise the newest one that differs from the
+cached translation wins. The pairs are then handed to
+``db.upsert_verified``. That diffs them against the cache in chunks and
+writes the new and corrected ones with ``verified = 1`` in a single
+transaction. Verified rows are never overwritten by API, glossary or
+retry results and are skipped by ``validate.sweep``.
+
+Run with ``main.py --ingest-proofread [DIR]``.
+"""
+from __future__ import annotations
+
+import difflib
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+from ds_translator import db
+from ds_translator import fastpath
+from ds_translator import hooks
+from ds_translator import incremental
+from ds_translator import lexicon as lex
+from ds_translator import metrics
+
+logger = logging.getLogger("ds_translator.proofread")
+
+FAILED = "[翻译失败]"
+_SUFFIX = "-roasted"
+
+
+def source_name(filename: str) -> str:
+    """``movie-roasted.srt`` -> ``movie.srt`` (other names are returned unchanged)."""
+    name, ext = os.path.splitext(filename)
+    return name[:-len(_SUFFIX)] + ext if name.endswith(_SUFFIX) else filename
+
+
+def _source_cues(source_path: str) -> Optional[list[dict]]:
+    from ds_translator.srt import _read_text_with_fallback, parse_srt
+
+    try:
+        content, _ = _read_text_with_fallback(source_path, progress_callback=lambda op, msg: None)
+    except OSError:
+        return None
+    return hooks.run(hooks.PRE, hooks.make_cues(parse_srt(content)))
+
+
+def pairs_for_file(path: str, source_path: Optional[str], lexicon=None,
+                   is_fast: Optional[Callable[[str], bool]] = None) -> tuple[list[tuple[str, str]], dict]:
+    """Aligned (cache key, corrected translation) pairs of one proofread file."""
+    blocks = incremental.read_bilingual_srt(path)
+    cues = _source_cues(source_path) if source_path else None
+    has_source = cues is not None
+    if cues is None:
+        cues = hooks.run(hooks.PRE, hooks.make_cues([(idx, tc, original) for idx, tc, original, _ in blocks]))
+    matcher = difflib.SequenceMatcher(
+        None, [cue["original"].strip() for cue in cues], [block[2] for block in blocks], autojunk=False
+    )
+    pairs = []
+    aligned = 0
+    local = 0
+    for tag, i1, i2, j1, _j2 in matcher.get_opcodes():
+        if tag != "equal":
+            continue
+        aligned += i2 - i1
+        for k in range(i2 - i1):
+            cue = cues[i1 + k]
+            key = cue["text"].strip()
+            translation = blocks[j1 + k][3]
+            # pre hooks that fill a translation bypass the cache
+            if not key or not translation or translation == FAILED or cue["translation"] is not None:
+                continue
+            if (lexicon and key in lexicon) or (is_fast is not None and is_fast(key)):
+                local += 1
+                continue
+            pairs.append((key, translation))
+    return pairs, {"cues": len(blocks), "aligned": aligned, "local": local, "source": has_source}
+
+
+def _proofread_files(directory: str) -> list[str]:
+    paths = []
+    for root, _dirs, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".srt"))
+    # oldest first, so the newest correction of a line wins
+    return sorted(paths, key=lambda p: (os.path.getmtime(p), p))
+
+
+def ingest(directory: str, input_dir: Optional[str] = None, chunk_size: int = 1000) -> dict:
+    """Read every proofread file under ``directory`` and upsert the corrections as verified."""
+    start = time.perf_counter()
+    store = lex.shared_store()
+    # lines repeat across files, so the fast-path check is memoised for the run
+    is_fast = fastpath.handles_cached()
+    corrections: dict[str, str] = {}
+    # key -> every differing translation, oldest first
+    conflicts: dict[str, list[str]] = {}
+    result = {"files": 0, "errors": 0, "without_source": 0, "cues": 0, "aligned": 0, "local": 0, "pairs": 0}
+    with metrics.timer("proofread.parse"):
+        for path in _proofread_files(directory):
+            name = source_name(os.path.basename(path))
+            source = os.path.join(input_dir, name) if input_dir else None
+            try:
+                pairs, info = pairs_for_file(path, source if source and os.path.isfile(source) else None,
+                                             store.for_file(name), is_fast)
+            except OSError as e:
+                logger.warning(f"无法读取校对文件 {path}: {e}")
+                result["errors"] += 1
+                continue
+            result["files"] += 1
+            result["without_source"] += not info["source"]
+            result["cues"] += info["cues"]
+            result["aligned"] += info["aligned"]
+            result["local"] += info["local"]
+            result["pairs"] += len(pairs)
+            for key, translation in pairs:
+                previous = corrections.get(key)
+                if previous is not None and previous != translation:
+                    conflicts.setdefault(key, [previous]).append(translation)
+                corrections[key] = translation
+    if conflicts:
+        # an unedited copy of a line must not undo the correction of another copy
+        cached = db.get_translations_bulk(conflicts)
+        verified = db.get_translations_bulk(conflicts, verified_only=True)
+        for key, candidates in conflicts.items():
+            if verified.get(key) in candidates:
+                corrections[key] = verified[key]
+                continue
+            changed = [c for c in candidates if c != cached.get(key)]
+            corrections[key] = changed[-1] if changed else candidates[-1]
+    result["conflicts"] = len(conflicts)
+    result.update(db.upsert_verified(corrections.items(), chunk_size=chunk_size))
+    result["unique"] = len(corrections)
+    result["seconds"] = time.perf_counter() - start
+    metrics.inc("proofread.files", result["files"])
+    metrics.inc("proofread.written", result["added"] + result["corrected"] + result["confirmed"])
+    return result
+
+
+def format_result(result: dict) -> list[str]:
+    """Summary lines of one ``ingest`` run."""
+    return [
+        f"读取 {result['files']} 个校对文件"
+        + (f"（{result['without_source']} 个未找到源字幕，按校对文件自身的原文对齐）" if result["without_source"] else "")
+        + (f"，{result['errors']} 个无法读取" if result["errors"] else "")
+        + f"，对齐 {result['aligned']}/{result['cues']} 条字幕（{result['local']} 条由词库或本地规则处理，跳过），"
+        f"得到 {result['unique']} 条不同的译文"
+        + (f"（{result['conflicts']} 条有不同改法，取与缓存不同的最新版本）" if result["conflicts"] else ""),
+        f"新增 {result['added']} 条，更正 {result['corrected']} 条，确认 {result['confirmed']} 条，"
+        f"已是人工校对版本 {result['unchanged']} 条，用时 {result['seconds']:.2f} s",
+    ]
@@ -4,6 +4,7 @@ from contextlib import contextmanager
 from typing import Optional
 import sys
 import os
+import threading
 
 from rich.console import Console
 from rich.progress import (
@@ -14,11 +15,9 @@ from rich.progress import (
     Progress,
 )
 
-# Shared Console instance for subtle/info printing across the package. Use
-# this instead of creating independent Console() instances so output from
-# different modules uses the same rendering context and won't disturb live
-# Progress rendering.
-shared_console = Console()
+from ds_translator import metrics
+# re-exported: existing code imports shared_console from this module
+from ds_translator.console import shared_console
 
 
 class SingleLineProgress:
@@ -122,3 +121,177 @@ def run_task(description: str, total: int):
     with SingleLineProgress() as p:
         p.start(description, total)
         yield p
+
+
+class _FileState:
+    __slots__ = ("task_id", "done", "total", "info", "finals", "dirty")
+
+    def __init__(self, task_id) -> None:
+        self.task_id = task_id
+        self.done = 0
+        self.total = None
+        self.info = ""
+        self.finals = []
+        self.dirty = True
+
+
+class _CoalescingProgress(Progress):
+    """Progress that pulls the latest state from a sync hook on every frame."""
+
+    def __init__(self, *columns, sync=None, **kwargs) -> None:
+        # set before Progress.__init__, which already renders once
+        self._sync = sync
+        super().__init__(*columns, **kwargs)
+
+    def get_renderables(self):
+        if self._sync is not None:
+            self._sync()
+        yield from super().get_renderables()
+
+
+class ProgressRenderer:
+    """Render pipeline events (see ``ds_translator.events``) as Rich progress lines.
+
+    Event handlers only record the latest numbers; the Rich refresh thread
+    copies them into the progress tasks once per frame (``fps``), so the
+    translation loop never pays for rendering. Per-file final messages are
+    printed as soon as the file finishes and stay above the live line.
+
+    Usage:
+        with ProgressRenderer():
+            translate_srt_file(src, dst)
+    """
+
+    def __init__(self, console: Optional[Console] = None, fps: float = 10, bus=None) -> None:
+        from ds_translator import events
+
+        self.console = console or shared_console
+        self.bus = bus or events.bus
+        self._files: dict[str, _FileState] = {}
+        self._lock = threading.Lock()
+        self.progress = _CoalescingProgress(
+            # Add a spinner column (green 'dots') so the UI shows the familiar
+            # spinning green-dot indicator like the demo spinner.
+            SpinnerColumn(spinner_name="dots", style="green"),
+            TextColumn("{task.description}"),
+            BarColumn(bar_width=None),
+            # Right-aligned info field (e.g. "12/1000" or the detected encoding)
+            TextColumn("{task.fields[info]}", justify="right"),
+            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+            TimeElapsedColumn(),
+            console=self.console,
+            refresh_per_second=fps,
+            sync=self._sync,
+        )
+
+    def __enter__(self) -> "ProgressRenderer":
+        self.progress.start()
+        self.bus.subscribe(self.handle)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.bus.unsubscribe(self.handle)
+        self.progress.stop()
+
+    def _sync(self) -> None:
+        with metrics.timer("render.sync"):
+            self._sync_states()
+
+    def _sync_states(self) -> None:
+        with self._lock:
+            states = list(self._files.values())
+        for st in states:
+            if not st.dirty:
+                continue
+            st.dirty = False
+            info = f"{st.done}/{st.total}" if st.total and st.done else st.info
+            try:
+                self.progress.update(st.task_id, completed=st.done, info=info)
+            except KeyError:
+                # the file finished (task removed) between the copy and now
+                pass
+
+    def handle(self, event: dict) -> None:
+        kind = event["type"]
+        st = self._files.get(event.get("file"))
+        if kind == "cue_done":
+            # hot path: record only, the refresh thread renders
+            if st is not None:
+                st.done = event["done"]
+                st.dirty = True
+        elif kind == "file_started":
+            task_id = self.progress.add_task(f"Translating {event['file']}", total=None, info="")
+            with self._lock:
+                self._files[event["file"]] = _FileState(task_id)
+        elif st is None:
+            return
+        elif kind == "file_total":
+            st.total = event["total"]
+            st.info = f"0/{st.total}"
+            st.dirty = True
+            self.progress.update(st.task_id, total=st.total)
+        elif kind == "file_info":
+            st.info = event["message"]
+            st.dirty = True
+        elif kind == "file_final":
+            st.finals.append(event["message"])
+        elif kind in ("file_finished", "file_failed"):
+            with self._lock:
+                self._files.pop(event["file"], None)
+            self.progress.remove_task(st.task_id)
+            # redraw now so the prints below don't repeat the stale live line
+            self.progress.refresh()
+            if kind == "file_failed":
+                # Use style argument instead of markup to avoid issues when
+                # the icon text contains square brackets in ASCII mode.
+                from ds_translator.icons import icon
+
+                self.console.print(f"{icon('error')} 处理文件 {event['file']} 时出错: {event['error']}", style="red")
+            for m in st.finals:
+                # Print without soft wrapping so long paths remain on one line
+                self.console.print(m, style="italic dim", soft_wrap=False)
+
+
+class PlainRenderer:
+    """Quiet / non-TTY renderer: no live display, just the final per-file lines."""
+
+    def __init__(self, console: Optional[Console] = None, bus=None) -> None:
+        from ds_translator import events
+
+        self.console = console or shared_console
+        self.bus = bus or events.bus
+        self._finals: dict[str, list] = {}
+
+    def __enter__(self) -> "PlainRenderer":
+        self.bus.subscribe(self.handle)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.bus.unsubscribe(self.handle)
+
+    def handle(self, event: dict) -> None:
+        kind = event["type"]
+        if kind == "file_final":
+            self._finals.setdefault(event["file"], []).append(event["message"])
+        elif kind == "file_failed":
+            from ds_translator.icons import icon
+
+            self._finals.pop(event["file"], None)
+            self.console.print(f"{icon('error')} 处理文件 {event['file']} 时出错: {event['error']}", style="red")
+        elif kind == "file_finished":
+            for m in self._finals.pop(event["file"], []):
+                self.console.print(m, style="italic dim", soft_wrap=True)
+
+
+def create_renderer(console: Optional[Console] = None, quiet: Optional[bool] = None, fps: float = 10, bus=None):
+    """Pick a renderer: Rich progress on a terminal, plain lines otherwise.
+
+    ``quiet`` defaults to ``DS_QUIET``; a console that is not a terminal
+    (pipes, redirected output) always gets the plain renderer.
+    """
+    console = console or shared_console
+    if quiet is None:
+        quiet = os.getenv("DS_QUIET", "0").lower() in ("1", "true", "yes")
+    if quiet or not console.is_terminal:
+        return PlainRenderer(console, bus=bus)
+    return ProgressRenderer(console, fps=fps, bus=bus)
@@ -0,0 +1,206 @@
+"""Difficulty-based routing of API requests.
+
+Before a cue goes to the API, ``choose`` scores how hard it is to
+translate (0 = trivial, 1 = hard) from four signals:
+
+- length          longer lines carry more content and wordplay
+- kanji density   share of kanji among the characters
+- lexicon hits    lexicon terms inside the line (names, show jargon)
+- punctuation     quotes, ellipses and ?!/～ that usually signal tone
+
+With ``DS_ROUTING=1`` cues scoring below ``DS_ROUTE_THRESHOLD`` take the
+``easy`` route: ``DS_EASY_MODEL`` (default: the main model), a compact
+system prompt with only the lexicon entries found in the line, and no
+neighbouring context. Everything else, and every cue when routing is
+off, takes the ``main`` route with the full prompt and context.
+
+``max_tokens`` is sized from the input length on both routes instead of
+a flat 200 (``DS_MAX_TOKENS_CAP`` bounds it).
+
+Per-route calls, latency, tokens and estimated cost are accumulated for
+the run (``format_stats``). Prices are per million tokens as
+``input_miss,input_hit,output`` in ``DS_ROUTE_PRICE_MAIN`` /
+``DS_ROUTE_PRICE_EASY`` (default: DeepSeek chat list price in CNY).
+Signal weights can be tuned with ``DS_ROUTE_WEIGHTS``, e.g.
+``length=0.4,kanji=0.3,lexicon=0.2,punct=0.1``.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from typing import NamedTuple, Optional
+
+from ds_translator import lexicon as lex
+from ds_translator import settings
+
+EASY = "easy"
+MAIN = "main"
+
+DEFAULT_THRESHOLD = 0.35
+DEFAULT_WEIGHTS = {"length": 0.35, "kanji": 0.3, "lexicon": 0.2, "punct": 0.15}
+DEFAULT_PRICE = "2,0.5,8"
+# lines at or above this many characters count as maximally long
+_LONG_LINE = 40
+# lexicon / punctuation signals saturate at this many hits
+_SATURATE = 3
+
+_KANJI = re.compile(r"[㐀-䶿一-鿿々]")
+_TRICKY_PUNCT = re.compile(r"[「」『』…‥？?！!～〜（(]")
+
+COMPACT_SYSTEM = "将下面的日语综艺字幕翻译成口语化的简体中文，使用中文全角标点，只输出译文。"
+
+
+class Route(NamedTuple):
+    name: str
+    model: str
+    compact: bool
+    max_tokens: int
+    score: Optional[float]
+
+
+_lock = threading.Lock()
+# route -> [calls, seconds, prompt_miss, prompt_hit, completion]
+_stats: dict[str, list] = {}
+
+
+def enabled() -> bool:
+    return os.getenv("DS_ROUTING", "0").lower() in ("1", "true", "yes")
+
+
+def threshold() -> float:
+    try:
+        return float(os.getenv("DS_ROUTE_THRESHOLD", DEFAULT_THRESHOLD))
+    except ValueError:
+        return DEFAULT_THRESHOLD
+
+
+def weights() -> dict[str, float]:
+    result = dict(DEFAULT_WEIGHTS)
+    for part in os.getenv("DS_ROUTE_WEIGHTS", "").split(","):
+        key, _, value = part.partition("=")
+        key = key.strip()
+        if key in result:
+            try:
+                result[key] = float(value)
+            except ValueError:
+                pass
+    return result
+
+
+def max_tokens_for(text: str) -> int:
+    """Completion budget for ``text``: generous for its length, bounded by ``DS_MAX_TOKENS_CAP``."""
+    try:
+        cap = int(os.getenv("DS_MAX_TOKENS_CAP", "400"))
+    except ValueError:
+        cap = 400
+    return max(32, min(cap, 16 + 3 * len(text)))
+
+
+def lexicon_hits(text: str, lexicon) -> list[str]:
+    """Lexicon terms that occur inside ``text`` (longest match first, no overlaps)."""
+    return lex.terms_in(lexicon, text)
+
+
+def score(text: str, lexicon=None) -> float:
+    """Difficulty of ``text`` in [0, 1]."""
+    n = len(text)
+    if not n:
+        return 0.0
+    w = weights()
+    signals = {
+        "length": min(n / _LONG_LINE, 1.0),
+        "kanji": len(_KANJI.findall(text)) / n,
+        "lexicon": min(len(lexicon_hits(text, lexicon)), _SATURATE) / _SATURATE,
+        "punct": min(len(_TRICKY_PUNCT.findall(text)), _SATURATE) / _SATURATE,
+    }
+    total = sum(w.values()) or 1.0
+    return sum(w[k] * signals[k] for k in signals) / total
+
+
+def choose(text: str, lexicon=None) -> Route:
+    """Pick the route (model, prompt style, token budget) for one API request."""
+    model = settings.get().model
+    budget = max_tokens_for(text)
+    if not enabled():
+        return Route(MAIN, model, False, budget, None)
+    s = score(text, lexicon)
+    if s < threshold():
+        return Route(EASY, os.getenv("DS_EASY_MODEL") or model, True, budget, s)
+    return Route(MAIN, model, False, budget, s)
+
+
+def compact_messages(text: str, lexicon=None) -> list[dict]:
+    """Short prompt for easy cues: only the lexicon entries that occur in the line."""
+    system = COMPACT_SYSTEM
+    hits = dict.fromkeys(lexicon_hits(text, lexicon))
+    if hits:
+        system += "\n词典：\n" + "\n".join(f"{k} -> {lexicon[k]}" for k in hits)
+    return [{"role": "system", "content": system}, {"role": "user", "content": text}]
+
+
+def record(route: str, seconds: float, usage: Optional[dict]) -> None:
+    """Account one successful request on ``route``."""
+    usage = usage or {}
+    prompt = usage.get("prompt_tokens") or 0
+    hit = usage.get("prompt_cache_hit_tokens") or 0
+    miss = usage.get("prompt_cache_miss_tokens")
+    if miss is None:
+        miss = max(prompt - hit, 0)
+    with _lock:
+        entry = _stats.setdefault(route, [0, 0.0, 0, 0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += miss
+        entry[3] += hit
+        entry[4] += usage.get("completion_tokens") or 0
+
+
+def _prices(route: str) -> tuple[float, float, float]:
+    spec = os.getenv(f"DS_ROUTE_PRICE_{route.upper()}") or os.getenv("DS_ROUTE_PRICE_MAIN") or DEFAULT_PRICE
+    try:
+        miss, hit, out = (float(p) for p in spec.split(","))
+    except ValueError:
+        miss, hit, out = (float(p) for p in DEFAULT_PRICE.split(","))
+    return miss, hit, out
+
+
+def cost(route: str, prompt_miss: int, prompt_hit: int, completion: int) -> float:
+    """Estimated price of the given token counts on ``route``."""
+    p_miss, p_hit, p_out = _prices(route)
+    return (prompt_miss * p_miss + prompt_hit * p_hit + completion * p_out) / 1e6
+
+
+def stats() -> dict[str, dict]:
+    """Per-route totals since the last reset, including the estimated cost."""
+    with _lock:
+        rows = {route: list(entry) for route, entry in _stats.items()}
+    result = {}
+    for route, (calls, seconds, miss, hit, completion) in rows.items():
+        result[route] = {
+            "calls": calls,
+            "seconds": seconds,
+            "prompt_tokens": miss + hit,
+            "completion_tokens": completion,
+            "cost": cost(route, miss, hit, completion),
+        }
+    return result
+
+
+def reset_stats() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def format_stats(data: Optional[dict] = None) -> list[str]:
+    """One line per route that made requests (empty when there were none)."""
+    data = stats() if data is None else data
+    lines = []
+    for route in sorted(data):
+        r = data[route]
+        avg = r["seconds"] / r["calls"] * 1000 if r["calls"] else 0.0
+        lines.append(
+            f"{route}: {r['calls']} 次请求, 平均 {avg:.0f} ms, "
+            f"tokens {r['prompt_tokens']}/{r['completion_tokens']}, 约 ¥{r['cost']:.4f}"
+        )
+    return lines
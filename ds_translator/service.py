@@ -0,0 +1,441 @@
+"""Long-running local translator service.
+
+``main.py --serve`` keeps one process alive with everything a run needs
+already warm: the SQLite connection (and its page cache), the lexicon,
+the retry worker and the pooled HTTP session to the API. ``main.py``
+then acts as a thin client when the service answers on
+``DS_SERVICE_URL`` (default ``http://127.0.0.1:8766``), so a GUI "Run"
+no longer pays interpreter start-up, ``init_db``, lexicon load and TLS
+set-up every time. The client only hands a job over when the service's
+``fingerprint`` (cache database, API base URL and model) matches its own
+settings; otherwise it warns and translates in-process.
+
+All translation work runs on a single worker thread, so jobs are
+serialised and the worker's thread-local DB connection stays open
+between jobs. Scheduled cache maintenance (``maintenance.maybe_run``) is
+queued on the same thread after start-up and after every file job.
+
+The server only binds loopback addresses unless ``DS_SERVICE_ALLOW_REMOTE=1``.
+Every request must carry ``Authorization: Bearer <token>``, where the
+token is generated per run and written to ``data/service.token``
+(``DS_SERVICE_TOKEN_FILE``, readable by the owner only); POST bodies must
+be ``application/json``. File jobs may only read from the service's input
+directory and write to its output directory.
+
+Endpoints:
+    GET  /health            {"ok": true, "pid", "uptime", "jobs", "cache_db", "fingerprint"}
+    POST /translate/lines   {"lines": [...]} -> {"translations": [...]}
+    POST /jobs/files        {"files": [{"input", "output"}, ...], "incremental": null}
+                            -> JSONL stream of pipeline events (see
+                               ``events``; ``cue_done`` rate-limited, plus a
+                               ``heartbeat`` line after ``HEARTBEAT_INTERVAL``
+                               quiet seconds), ending with a ``job_finished``
+                               line carrying cache, source and hook stats
+    POST /shutdown          stop the service
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, Optional
+from urllib.parse import urlparse
+
+from ds_translator import api
+from ds_translator import db
+from ds_translator import events
+from ds_translator import hooks
+from ds_translator import lexicon as lex
+from ds_translator import maintenance
+from ds_translator import manifest
+from ds_translator import metrics
+from ds_translator import glossary
+from ds_translator import routing
+from ds_translator import settings as config
+from ds_translator import validate
+
+logger = logging.getLogger("ds_translator.service")
+
+DEFAULT_URL = "http://127.0.0.1:8766"
+# Seconds between forwarded cue_done events of one file
+PROGRESS_INTERVAL = 0.1
+# Seconds of silence on a job stream before the service sends a heartbeat;
+# the client gives up after STREAM_TIMEOUT seconds without any line
+HEARTBEAT_INTERVAL = 5.0
+STREAM_TIMEOUT = 60.0
+
+_DONE = object()
+
+
+def service_url() -> str:
+    return os.getenv("DS_SERVICE_URL", DEFAULT_URL).rstrip("/")
+
+
+def token_path() -> str:
+    return os.getenv("DS_SERVICE_TOKEN_FILE") or os.path.join(config.REPO_ROOT, "data", "service.token")
+
+
+def read_token() -> Optional[str]:
+    """The running service's token (None when no service has written one)."""
+    try:
+        with open(token_path(), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_token() -> str:
+    token = secrets.token_urlsafe(32)
+    path = token_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    # O_CREAT's mode does not apply to a file left by an earlier run
+    os.chmod(path, 0o600)
+    return token
+
+
+def _auth_headers() -> dict:
+    token = read_token()
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _inside(path: str, root: str) -> bool:
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # different drives
+        return False
+
+
+def fingerprint() -> str:
+    """Digest of the settings a job's results depend on: cache database, API base URL and model."""
+    current = config.get()
+    key = json.dumps([os.path.normcase(db.CACHE_DB), current.api_base.rstrip("/"), current.model])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+class TranslatorService:
+    """Owns the warm state and the single translation worker thread."""
+
+    def __init__(self, input_dir: str, output_dir: str) -> None:
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.started = time.time()
+        self.jobs = 0
+        self._lexicon = lex.shared_store()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="ds_service_worker")
+        # warm everything up on the worker thread that will keep the connection
+        self._executor.submit(self._warm_up).result()
+        self._executor.submit(self._maintain)
+
+    def _warm_up(self) -> None:
+        db.init_db()
+        lex.ensure_lexicon_exists()
+        self._lexicon.refresh(force=True)
+        api._get_http_session()
+        try:
+            api.start_retry_worker()
+        except Exception as e:
+            logger.warning(f"无法启动重试工作线程: {e}")
+
+    def _maintain(self) -> None:
+        """Scheduled cache maintenance; queued on the worker thread behind each job."""
+        result = maintenance.maybe_run()
+        if result is not None:
+            for line in maintenance.format_result(result):
+                logger.info(f"[MAINT] {line}")
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started, 1),
+            "jobs": self.jobs,
+            "cache_db": db.CACHE_DB,
+            "fingerprint": fingerprint(),
+        }
+
+    def translate_lines(self, lines: list[str]) -> list[str]:
+        def _run():
+            self.jobs += 1
+            lexicon = self._lexicon.get()
+            return [api.translate_text(str(line), lexicon=lexicon) for line in lines]
+
+        return self._executor.submit(_run).result()
+
+    def translate_files(self, files: list[dict], incremental_mode: Optional[bool] = None) -> Iterator[dict]:
+        """Run a file job on the worker thread, yielding its events as they happen."""
+        out: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        last_cue: dict[str, float] = {}
+
+        def _forward(event: dict) -> None:
+            kind = event["type"]
+            if kind == "lookup":
+                return
+            if kind == "cue_done" and event["done"] < event["total"]:
+                now = time.monotonic()
+                if now - last_cue.get(event["file"], 0.0) < PROGRESS_INTERVAL:
+                    return
+                last_cue[event["file"]] = now
+            out.put(dict(event))
+
+        def _run():
+            from ds_translator.srt import translate_srt_file
+
+            self.jobs += 1
+            hooks.reset_stats()
+            api.reset_source_counts()
+            routing.reset_stats()
+            glossary.reset_stats()
+            validate.reset_stats()
+            bus = events.bus
+            bus.subscribe(_forward)
+            try:
+                settings = manifest.current_settings()
+                with manifest.batch():
+                    for item in files:
+                        with metrics.file_scope(os.path.basename(item["input"])):
+                            try:
+                                signature = manifest.source_signature(item["input"])
+                                lexicon = self._lexicon.for_file(item["input"])
+                                translate_srt_file(item["input"], item["output"], lexicon=lexicon, bus=bus, incremental_mode=incremental_mode)
+                            except Exception:
+                                # reported through the file_failed event
+                                continue
+                            try:
+                                manifest.record(item["input"], item["output"], signature, settings)
+                            except OSError as e:
+                                logger.warning(f"无法更新清单: {e}")
+                total, hits = db.get_stats()
+                out.put({
+                    "type": "job_finished",
+                    "files": len(files),
+                    "cache_entries": total,
+                    "cache_hits": hits,
+                    "hooks": hooks.format_stats(),
+                    "sources": api.source_counts(),
+                    "routes": routing.format_stats(),
+                    "validate": validate.format_stats(),
+                    "glossary": glossary.format_stats(),
+                })
+            finally:
+                bus.unsubscribe(_forward)
+                out.put(_DONE)
+
+        self._executor.submit(_run)
+        self._executor.submit(self._maintain)
+        while True:
+            try:
+                item = out.get(timeout=HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                # a single slow cue (API retries) must not look like a dead service
+                yield {"type": "heartbeat"}
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def close(self) -> None:
+        self._executor.submit(db.close_connection).result()
+        self._executor.shutdown(wait=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ds-translator-service/1"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> TranslatorService:
+        return self.server.service  # type: ignore[attr-defined]
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from base class
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _authorized(self) -> bool:
+        expected = f"Bearer {self.server.token}"  # type: ignore[attr-defined]
+        if hmac.compare_digest(self.headers.get("Authorization", "").encode("utf-8"), expected.encode("utf-8")):
+            return True
+        # the body (if any) is left unread, so this connection cannot be reused
+        self.close_connection = True
+        self._send_json(401, {"error": "missing or wrong token"})
+        return False
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        return json.loads(raw.decode("utf-8"))
+
+    def _send_json(self, status: int, body: Any) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path.rstrip("/") == "/health":
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.close_connection = True
+            self._send_json(415, {"error": "expected Content-Type: application/json"})
+            return
+        route = self.path.rstrip("/")
+        try:
+            body = self._read_json()
+        except (ValueError, UnicodeDecodeError):
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+
+        if route == "/translate/lines":
+            lines = body.get("lines")
+            if not isinstance(lines, list):
+                self._send_json(400, {"error": "expected {\"lines\": [...]}"})
+                return
+            self._send_json(200, {"translations": self.service.translate_lines(lines)})
+        elif route == "/jobs/files":
+            files = body.get("files")
+            if not isinstance(files, list) or not all(isinstance(f, dict) and "input" in f and "output" in f for f in files):
+                self._send_json(400, {"error": "expected {\"files\": [{\"input\": ..., \"output\": ...}]}"})
+                return
+            outside = [f for f in files if not (_inside(str(f["input"]), self.service.input_dir)
+                                                and _inside(str(f["output"]), self.service.output_dir))]
+            if outside:
+                self._send_json(403, {"error": "files must be in the service's input/output directories",
+                                      "input_dir": self.service.input_dir, "output_dir": self.service.output_dir})
+                return
+            self._stream_job(files, body.get("incremental"))
+        elif route == "/shutdown":
+            self._send_json(200, {"ok": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _stream_job(self, files: list[dict], incremental_mode: Optional[bool]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        client_gone = False
+        for event in self.service.translate_files(files, incremental_mode):
+            if client_gone:
+                # keep draining: the job still finishes and writes its outputs
+                continue
+            try:
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            except OSError:
+                client_gone = True
+
+
+def serve(input_dir: str, output_dir: str, host: Optional[str] = None, port: Optional[int] = None) -> None:
+    """Run the service in the foreground until /shutdown or Ctrl+C.
+
+    Raises ``ValueError`` for a non-loopback host unless
+    ``DS_SERVICE_ALLOW_REMOTE=1``.
+    """
+    parsed = urlparse(service_url())
+    host = host or parsed.hostname or "127.0.0.1"
+    port = port or parsed.port or 8766
+    if not _is_loopback(host) and os.getenv("DS_SERVICE_ALLOW_REMOTE", "").lower() not in ("1", "true", "yes"):
+        raise ValueError(f"翻译服务只监听本机地址，{host} 不是回环地址（确需对外监听请设置 DS_SERVICE_ALLOW_REMOTE=1）")
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    service = TranslatorService(os.path.abspath(input_dir), os.path.abspath(output_dir))
+    server.service = service  # type: ignore[attr-defined]
+    server.token = _write_token()  # type: ignore[attr-defined]
+    logger.info(f"翻译服务已启动: http://{host}:{server.server_address[1]} (PID {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if read_token() == server.token:  # type: ignore[attr-defined]
+            try:
+                os.remove(token_path())
+            except OSError:
+                pass
+        logger.info("翻译服务已停止")
+
+
+# ----------------------
+# Client side (used by main.py)
+# ----------------------
+def probe(url: Optional[str] = None, timeout: float = 0.3) -> Optional[dict]:
+    """Return the service's /health payload, or None when no service is running (or it rejects our token).
+
+    Callers check ``payload.get("fingerprint") == fingerprint()`` before
+    handing it a job.
+    """
+    headers = _auth_headers()
+    if not headers:
+        # no service has been started from this checkout
+        return None
+    import requests
+
+    try:
+        response = requests.get(f"{url or service_url()}/health", headers=headers, timeout=timeout)
+        if response.status_code == 200:
+            return response.json()
+    except (requests.RequestException, ValueError):
+        pass
+    return None
+
+
+def run_files_remote(files: list[dict], url: Optional[str] = None, bus: Optional[events.EventBus] = None, incremental_mode: Optional[bool] = None) -> Optional[dict]:
+    """Submit a file job and re-publish its streamed events on ``bus``.
+
+    Returns the ``job_finished`` payload (None if the stream ended early).
+    Raises ``requests.RequestException`` when the service is unreachable or
+    the stream stays silent for ``STREAM_TIMEOUT`` seconds.
+    """
+    import requests
+
+    bus = bus or events.bus
+    finished = None
+    with requests.post(f"{url or service_url()}/jobs/files", json={"files": files, "incremental": incremental_mode}, headers=_auth_headers(), stream=True, timeout=(2, STREAM_TIMEOUT)) as response:
+        response.raise_for_status()
+        for raw in response.iter_lines():
+            if not raw:
+                continue
+            event = json.loads(raw.decode("utf-8"))
+            kind = event.pop("type")
+            if kind == "heartbeat":
+                continue
+            if kind == "job_finished":
+                finished = event
+            else:
+                bus.publish(kind, **event)
+    return finished
@@ -0,0 +1,92 @@
+"""Process-wide configuration, read once from the environment.
+
+``get()`` loads the repository's ``.env`` (values already set in the
+environment win) and reads the core settings into an immutable
+``Settings`` object on first use; every later call returns the same
+object. Modules take their configuration from here instead of reading
+``os.environ`` into globals at import time, so importing them has no
+side effects and tests or long-running processes can ``reload()``.
+
+Feature toggles that are meant to be flipped between runs of a
+long-lived process (``DS_FASTPATH``, ``DS_ROUTING``, hooks, ...) are
+still read where they are used.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import NamedTuple, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_FILE = os.path.join(REPO_ROOT, ".env")
+
+
+class Settings(NamedTuple):
+    api_key: Optional[str]
+    api_base: str
+    model: str
+    input_dir: Optional[str]
+    output_dir: Optional[str]
+    verify_type: str
+    # seconds to wait between retry-worker requests (throttle)
+    retry_request_interval: float
+    # maximum concurrent retry-worker requests
+    retry_max_concurrency: int
+    # drop a queued retry after this many attempts; 0 means never
+    retry_max_attempts: int
+
+
+_lock = threading.Lock()
+_settings: Optional[Settings] = None
+
+
+def _number(name: str, default, cast):
+    try:
+        return cast(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def load_env_file(path: str = ENV_FILE) -> None:
+    """Load ``path`` into the environment without overriding existing variables."""
+    if not os.path.exists(path):
+        # skip importing python-dotenv when there is nothing to load
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv(path)
+
+
+def from_env() -> Settings:
+    return Settings(
+        api_key=os.getenv("deepseek_api_key") or os.getenv("DEEPSEEK_API_KEY"),
+        api_base=os.getenv("deepseek_api_url", "https://api.deepseek.com/"),
+        model=os.getenv("deepseek_model", "deepseek-chat"),
+        input_dir=os.getenv("INPUT_DIR") or None,
+        output_dir=os.getenv("OUTPUT_DIR") or None,
+        verify_type=os.getenv("VERIFY_TYPE", "roasted"),
+        retry_request_interval=_number("RETRY_REQUEST_INTERVAL_SECONDS", 1.0, float),
+        retry_max_concurrency=_number("RETRY_MAX_CONCURRENCY", 1, int),
+        retry_max_attempts=_number("RETRY_MAX_ATTEMPTS", 0, int),
+    )
+
+
+def get() -> Settings:
+    """The settings of this process (loaded on first call)."""
+    global _settings
+    settings = _settings
+    if settings is None:
+        with _lock:
+            if _settings is None:
+                load_env_file()
+                _settings = from_env()
+            settings = _settings
+    return settings
+
+
+def reload() -> Settings:
+    """Re-read the environment (e.g. after changing it in a test or long-lived process)."""
+    global _settings
+    with _lock:
+        _settings = from_env()
+        return _settings
@@ -1,4 +1,23 @@
-from setuptools import setup
+"""Build the optional compiled SRT helpers in place:
+
+    python ds_translator/setup.py build_ext --inplace
+
+Only ``_srt_speedups.pyx`` is compiled; every other module stays plain
+Python so edits take effect without a rebuild. Without the build,
+``srt.py`` uses its pure-Python versions of the same functions.
+"""
+import os
+
+from setuptools import Extension, setup
 from Cython.Build import cythonize
 
-setup(ext_modules=cythonize(["*.py"]))
\ No newline at end of file
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+setup(
+    name="ds_translator_speedups",
+    packages=[],
+    ext_modules=cythonize(
+        [Extension("ds_translator._srt_speedups", ["ds_translator/_srt_speedups.pyx"])],
+        compiler_directives={"language_level": 3},
+    ),
+)
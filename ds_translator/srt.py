@@ -1,8 +1,15 @@
 import os
+import time
 import logging
 from ds_translator import api as api
-from ds_translator.rich_progress import run_task
-from ds_translator.rich_progress import shared_console as console
+from ds_translator import events
+from ds_translator import glossary
+from ds_translator import hooks
+from ds_translator import incremental
+from ds_translator import lexicon as lex
+from ds_translator import metrics
+from ds_translator import validate
+from ds_translator.console import shared_console as console
 from ds_translator.icons import icon
 
 # package logger (configured by init_logging in main)
@@ -112,136 +119,176 @@ def rebuild_srt(translated_subs):
     return "\n".join(lines)
 
 
-def translate_srt_file(input_path, output_path, lexicon=None, progress_callback=None):
-    """处理单个 SRT 文件"""
+def _build_context(subtitles, i, window_size=1):
+    """Build the prompt context for cue ``i``: previous line(s), [NOW], next line(s)."""
+    text = subtitles[i][2]
+    before = "\n".join([s[2] for s in subtitles[max(0, i - window_size):i]])
+    after = "\n".join([s[2] for s in subtitles[i+1:i+1+window_size]])
+    ctx_parts = []
+    if before:
+        ctx_parts.append("[BEFORE] " + before)
+    ctx_parts.append("[NOW] " + text)
+    if after:
+        ctx_parts.append("[AFTER] " + after)
+    return "\n".join(ctx_parts)
+
+
+# Pure-Python reference implementations. When the compiled extension
+# (_srt_speedups.pyx, see setup.py) is built, its versions replace them;
+# they must return exactly the same results (bench/srt_speedups.py --check).
+# DS_SPEEDUPS=0 forces the pure-Python code.
+py_parse_srt = parse_srt
+py_rebuild_srt = rebuild_srt
+py_build_context = _build_context
+
+SPEEDUPS = False
+if os.getenv("DS_SPEEDUPS", "1").lower() not in ("0", "false", "no"):
+    try:
+        from ds_translator._srt_speedups import parse_srt, rebuild_srt, _build_context  # noqa: F811
+        SPEEDUPS = True
+    except ImportError:
+        pass
+
+
+def translate_srt_file(input_path, output_path, lexicon=None, progress_callback=None, bus=None, incremental_mode=None):
+    """处理单个 SRT 文件
+
+    Progress is published on ``bus`` (default ``events.bus``) as
+    ``file_started`` / ``file_total`` / ``cue_done`` / ``file_final`` /
+    ``file_finished`` events. ``progress_callback(op, value)`` is still
+    accepted and is fed from the same events. When nobody is listening
+    (standalone use), a Rich progress line is rendered for the call.
+
+    If ``output_path`` already exists, cues whose text is unchanged reuse
+    their previous translation (see ``ds_translator.incremental``);
+    ``incremental_mode=False`` (or ``DS_INCREMENTAL=0``) translates every cue.
+    """
+    if progress_callback is not None:
+        bus = events.EventBus()
+        bus.subscribe(events.callback_adapter(progress_callback))
+    elif bus is None:
+        bus = events.bus
+
+    if incremental_mode is None:
+        incremental_mode = incremental.enabled()
+    if not bus.has_subscribers():
+        from ds_translator.rich_progress import create_renderer
+
+        with create_renderer(bus=bus):
+            return _translate_file(input_path, output_path, lexicon, bus, incremental_mode)
+    return _translate_file(input_path, output_path, lexicon, bus, incremental_mode)
+
+
+def _translate_file(input_path, output_path, lexicon, bus, incremental_mode=False):
+    fname = os.path.basename(input_path)
+    start = time.perf_counter()
+    bus.publish("file_started", file=fname, path=input_path)
+    try:
+        result = _translate_file_body(input_path, output_path, lexicon, bus, fname, incremental_mode)
+    except Exception as e:
+        bus.publish("file_failed", file=fname, error=str(e), elapsed=time.perf_counter() - start)
+        raise
+    cues, new_translations = result
+    bus.publish(
+        "file_finished",
+        file=fname,
+        cues=cues,
+        new_translations=new_translations,
+        elapsed=time.perf_counter() - start,
+        output=output_path if cues else None,
+    )
+
+
+def _translate_file_body(input_path, output_path, lexicon, bus, fname, incremental_mode=False):
+    """Translate one file; returns (cue_count, new_translations)."""
+    def _info(op, message):
+        bus.publish("file_info", file=fname, message=message)
+
     # Use a robust reader that tries several encodings to avoid utf-8 decode errors
-    content, used_encoding = _read_text_with_fallback(input_path, progress_callback=progress_callback)
+    with metrics.timer("srt.read"):
+        content, used_encoding = _read_text_with_fallback(input_path, progress_callback=_info)
+    metrics.inc("srt.encoding", encoding=used_encoding)
 
-    subtitles = parse_srt(content)
+    with metrics.timer("srt.parse"):
+        subtitles = parse_srt(content)
+    metrics.inc("srt.cues", len(subtitles))
     if not subtitles:
-        msg = f"警告: {input_path} 未解析到字幕内容"
-        if progress_callback:
-            try:
-                progress_callback('info', msg)
-            except Exception:
-                pass
-        else:
-            console.print(msg, style="italic dim")
-        return
-
-    # Notify caller that we parsed the subtitles. If caller provided a
-    # progress_callback it can display this as subtle per-file info; otherwise
-    # print it via the shared console.
-    if progress_callback:
-        try:
-            # Initialize the right-hand info field to show numeric progress
-            # e.g. "0/1000" instead of a parsed-count message.
-            progress_callback('info', f"0/{len(subtitles)}")
-        except Exception:
-            pass
-    else:
-        console.print(f"{icon('search')} 成功解析 {len(subtitles)} 条字幕", style="italic dim")
-
-    # If caller provided a progress callback, tell it how many items we'll process
-    if progress_callback:
-        try:
-            progress_callback('set_total', len(subtitles))
-        except Exception:
-            pass
-
-    translated_subs = []
+        bus.publish("file_final", file=fname, message=f"警告: {input_path} 未解析到字幕内容")
+        return 0, 0
+
+    # pre-translate hooks run once over the whole file (see ds_translator.hooks)
+    cues = hooks.run(hooks.PRE, hooks.make_cues(subtitles))
+    total = len(cues)
+    bus.publish("file_total", file=fname, total=total)
+    # prompt context is built from the texts as rewritten by the hooks
+    prepared = [(cue["index"], cue["timecode"], cue["text"]) for cue in cues]
+
+    if lexicon is None:
+        lexicon = lex.shared_store().for_file(input_path)
+
+    reuse = None
+    if incremental_mode:
+        previous = incremental.load_previous(output_path)
+        if previous:
+            with metrics.timer("srt.align"):
+                originals = [(cue["index"], cue["timecode"], cue["original"]) for cue in cues]
+                reuse = incremental.reusable_translations(originals, previous, lexicon)
+    reused = 0
     new_translations = 0
 
     # window_size: how many neighboring lines to include before/after (default 1)
     window_size = 1
 
-    # If caller provided a progress_callback (e.g. main.py shows its own Progress UI),
-    # avoid creating an internal rich progress to prevent duplicate/multiple bars.
-    if progress_callback:
-        for i, sub in enumerate(subtitles):
-            idx, timecode, text = sub
-            if not text.strip():
-                translated = ""
-            else:
-                # Build a small context: previous line(s), mark current as [NOW], next line(s)
-                before = "\n".join([s[2] for s in subtitles[max(0, i - window_size):i]])
-                after = "\n".join([s[2] for s in subtitles[i+1:i+1+window_size]])
-                ctx_parts = []
-                if before:
-                    ctx_parts.append("[BEFORE] " + before)
-                ctx_parts.append("[NOW] " + text)
-                if after:
-                    ctx_parts.append("[AFTER] " + after)
-                context = "\n".join(ctx_parts)
-
-                translated = api.translate_text(text, lexicon=lexicon, context=context)
-                if translated and translated != "[翻译失败]":
-                    new_translations += 1
-
-            translated_subs.append((idx, timecode, text, translated))
-
-            # Notify caller-provided callback for backward compatibility
-            try:
-                progress_callback('advance', 1)
-                # Also update the compact numeric info displayed to the
-                # right of the progress bar (e.g. "1/1000") so users see
-                # per-item counts inline.
-                progress_callback('info', f"{i+1}/{len(subtitles)}")
-            except Exception:
-                pass
-    else:
-        # No external progress provided: show internal single-line rich progress
-        with run_task("Translating", len(subtitles)) as p:
-            for i, sub in enumerate(subtitles):
-                idx, timecode, text = sub
-                if not text.strip():
-                    translated = ""
-                else:
-                    # Build a small context: previous line(s), mark current as [NOW], next line(s)
-                    before = "\n".join([s[2] for s in subtitles[max(0, i - window_size):i]])
-                    after = "\n".join([s[2] for s in subtitles[i+1:i+1+window_size]])
-                    ctx_parts = []
-                    if before:
-                        ctx_parts.append("[BEFORE] " + before)
-                    ctx_parts.append("[NOW] " + text)
-                    if after:
-                        ctx_parts.append("[AFTER] " + after)
-                    context = "\n".join(ctx_parts)
-
-                    translated = api.translate_text(text, lexicon=lexicon, context=context)
-                    if translated and translated != "[翻译失败]":
-                        new_translations += 1
-
-                translated_subs.append((idx, timecode, text, translated))
-
-                # Update rich progress (single-line) with a short info string
-                try:
-                    p.update(advance=1, info=f"{i+1}/{len(subtitles)}")
-                except Exception:
-                    pass
+    # API replies that failed the sanity checks, re-asked in one batch after the loop
+    suspects = []
+    suspect_cues = []
+    publish = bus.publish
+    for i, cue in enumerate(cues):
+        text = cue["text"]
+        if cue["translation"] is not None:
+            # already filled by a pre-translate hook
+            pass
+        elif not text.strip():
+            cue["translation"] = ""
+        elif reuse is not None and reuse[i] is not None:
+            cue["translation"] = reuse[i]
+            reused += 1
+        else:
+            context = _build_context(prepared, i, window_size)
+            with metrics.timer("srt.translate_cue"):
+                translated = api.translate_text(text, lexicon=lexicon, context=context, suspects=suspects)
+            if len(suspects) > len(suspect_cues):
+                suspect_cues.append(i)
+            if translated and translated != "[翻译失败]":
+                new_translations += 1
+            cue["translation"] = translated
+        publish("cue_done", file=fname, done=i + 1, total=total)
+
+    if suspects:
+        validate.retranslate(cues, suspects, lexicon, fname, bus)
+        new_translations -= sum(1 for i in suspect_cues if cues[i]["translation"] == "[翻译失败]")
+
+    # re-ask cues whose translation ignored a lexicon term (before post hooks rewrite the text)
+    if glossary.enabled():
+        glossary.check_and_fix(cues, lexicon, fname, bus)
+
+    cues = hooks.run(hooks.POST, cues)
+    translated_subs = [(cue["index"], cue["timecode"], cue["original"], cue["translation"] or "") for cue in cues]
 
     # 保存双语字幕
-    output_content = rebuild_srt(translated_subs)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(output_content)
-
-    msg = f"{icon('success')} 已保存双语字幕: {output_path} (源文件编码: {locals().get('used_encoding', 'unknown')})"
-    if progress_callback:
-        try:
-            # send as a final message so it is printed after the per-file
-            # progress task is removed and remains visible to the user
-            progress_callback('final', msg)
-        except Exception:
-            console.print(msg, style="italic dim")
-    else:
-        console.print(msg, style="italic dim")
-
+    with metrics.timer("srt.rebuild"):
+        output_content = rebuild_srt(translated_subs)
+    with metrics.timer("srt.write"):
+        # write-then-rename so an interrupted run never leaves a half-written output
+        tmp_path = output_path + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(output_content)
+        os.replace(tmp_path, output_path)
+
+    bus.publish("file_final", file=fname, message=f"{icon('success')} 已保存双语字幕: {output_path} (源文件编码: {used_encoding})")
+    if reused:
+        metrics.inc("srt.reused", reused)
+        bus.publish("file_final", file=fname, message=f"{icon('reuse')} 增量翻译：复用 {reused}/{total} 条已有翻译")
     if new_translations > 0:
-        msg2 = f"{icon('new')} 新增 {new_translations} 条翻译，已存入数据库"
-        if progress_callback:
-            try:
-                progress_callback('final', msg2)
-            except Exception:
-                console.print(msg2, style="italic dim")
-        else:
-            console.print(msg2, style="italic dim")
+        bus.publish("file_final", file=fname, message=f"{icon('new')} 新增 {new_translations} 条翻译，已存入数据库")
+    return total, new_translations
@@ -0,0 +1,287 @@
+"""Sanity checks for API replies before they reach the cache.
+
+``check(source, reply, context)`` returns the reasons a reply looks wrong
+(empty list = fine). Each check is a few string scans:
+
+- ``kana``         untranslated Japanese: at least ``max(2, 15%)`` of the
+                   reply is hiragana/katakana (``ー``/``・`` do not count)
+- ``length``       the reply is far longer (> 4x, and > 24 chars) or far
+                   shorter (< 15% of a source of 8+ chars) than the source
+- ``echo``         the reply repeats the prompt: ``[BEFORE]``/``[NOW]``/
+                   ``[AFTER]`` markers or a neighbouring source line
+- ``explanation``  a note instead of a subtitle: a reply that starts with a
+                   ``译文：``/``注：`` style prefix, ``以下是``, ``意思是：``
+                   or ``这句话的意思是``, a ``（注`` aside, or extra lines.
+                   The phrases only count at the start, so dialogue such
+                   as ``你的意思是要我走？`` passes
+- ``empty``        nothing left after stripping
+
+``api.translate_text`` does not cache a suspect reply. Within a file, the
+suspects are collected and re-asked together by ``retranslate``, in
+batches of ``DS_RETRANSLATE_BATCH`` (default 40). A re-translation that
+passes the checks is used and cached. Anything still suspect goes to the
+persistent retry queue and the cue gets ``[翻译失败]`` for now. The retry
+worker applies the same checks before it saves anything.
+
+``sweep`` scans the existing ``translation_cache`` in bulk (skipping
+human-verified rows) and moves suspect rows to the retry queue (``main.py --sweep``). ``DS_VALIDATE=0``
+disables the checks.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from ds_translator import lexicon as lex
+from ds_translator import metrics
+from ds_translator import routing
+from ds_translator import settings
+
+logger = logging.getLogger("ds_translator.validate")
+
+ROUTE = "retranslate"
+FAILED = "[翻译失败]"
+DEFAULT_BATCH = 40
+# completion budget of one re-translation request
+_MAX_BATCH_TOKENS = 8000
+
+REASONS = {
+    "kana": "残留假名",
+    "length": "长度异常",
+    "echo": "复述上下文",
+    "explanation": "解释说明",
+    "empty": "空译文",
+}
+
+_KANA = re.compile(r"[ぁ-ゖゝゞァ-ヺヽヾ]")
+_MARKERS = ("[BEFORE]", "[NOW]", "[AFTER]", "上下文（仅供参考）")
+_EXPLANATION = re.compile(
+    r"^\s*(?:(?:翻译|译文|中文|注|备注|说明|解释|Translation|Note)\s*[:：]|以下是|意思是\s*[:：]|这句(?:话)?的意思是)|（注|\(注",
+    re.IGNORECASE,
+)
+_CONTEXT_LINE = re.compile(r"^\[(?:BEFORE|AFTER)\] ?")
+
+RETRANSLATE_SYSTEM = (
+    "你是资深字幕翻译。下面 JSON 中每条日语字幕（ja）之前的译文不合格（残留日语、复述了上下文或附带了解释）。"
+    "请把每条重新翻译成口语化的简体中文字幕：只翻译这一句本身，不要保留日语假名，不要输出上下文或任何说明；"
+    "terms 中的词典译法必须使用。"
+    '只输出 JSON：{"items": [{"id": 编号, "zh": "译文"}]}'
+)
+
+
+class Suspect(NamedTuple):
+    text: str
+    reply: str
+    reasons: list
+
+
+_lock = threading.Lock()
+# replies checked, suspects per reason, re-translated ok, queued for retry
+_checked = 0
+_reasons: Counter = Counter()
+_suspects = 0
+_fixed = 0
+_queued = 0
+
+
+def enabled() -> bool:
+    return os.getenv("DS_VALIDATE", "1").lower() not in ("0", "false", "no")
+
+
+def _context_lines(context) -> list[str]:
+    """Neighbouring source lines from a ``_build_context`` string (not the [NOW] line)."""
+    if not context:
+        return []
+    lines = []
+    for line in str(context).splitlines():
+        if line.startswith("[NOW]"):
+            continue
+        line = _CONTEXT_LINE.sub("", line).strip()
+        if len(line) >= 4:
+            lines.append(line)
+    return lines
+
+
+def check(source: str, reply: str, context=None) -> list[str]:
+    """Reasons why ``reply`` does not look like a translation of ``source`` (empty = fine)."""
+    source = source.strip()
+    reply = reply.strip()
+    if not reply:
+        return ["empty"]
+    reasons = []
+    kana = len(_KANA.findall(reply))
+    if kana >= 2 and kana >= 0.15 * len(reply):
+        reasons.append("kana")
+    n, r = len(source), len(reply)
+    if r > max(4 * n, 24) or (n >= 8 and r < 0.15 * n):
+        reasons.append("length")
+    if any(marker in reply for marker in _MARKERS) or any(line in reply for line in _context_lines(context)):
+        reasons.append("echo")
+    if _EXPLANATION.search(reply) or reply.count("\n") > source.count("\n"):
+        reasons.append("explanation")
+    return reasons
+
+
+def note(reasons: list[str]) -> None:
+    """Account one checked reply (``reasons`` empty when it passed)."""
+    global _checked, _suspects
+    with _lock:
+        _checked += 1
+        if reasons:
+            _suspects += 1
+            _reasons.update(reasons)
+    for reason in reasons:
+        metrics.inc("validate.suspect", reason=reason)
+
+
+def describe(reasons) -> str:
+    return "、".join(REASONS.get(r, r) for r in reasons)
+
+
+def _request(batch: list[Suspect], lexicon) -> dict[int, str]:
+    """Send one re-translation request; returns batch position -> translation."""
+    from ds_translator import api
+    from ds_translator.glossary import parse_corrections
+
+    items = []
+    for k, s in enumerate(batch):
+        item = {"id": k, "ja": s.text}
+        terms = {t: lexicon[t] for t in lex.terms_in(lexicon, s.text)} if lexicon else {}
+        if terms:
+            item["terms"] = terms
+        items.append(item)
+    payload = {
+        "model": settings.get().model,
+        "messages": [
+            {"role": "system", "content": RETRANSLATE_SYSTEM},
+            {"role": "user", "content": json.dumps({"items": items}, ensure_ascii=False)},
+        ],
+        "temperature": 0.1,
+        "max_tokens": min(_MAX_BATCH_TOKENS, sum(routing.max_tokens_for(s.text) + 16 for s in batch)),
+        "response_format": {"type": "json_object"},
+    }
+    start = time.perf_counter()
+    response = api._post_chat_completion(payload, route=ROUTE)
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    result = response.json()
+    api._record_usage(result, route=ROUTE)
+    routing.record(ROUTE, time.perf_counter() - start, result.get("usage"))
+    return parse_corrections(result["choices"][0]["message"]["content"])
+
+
+def retranslate(cues, suspects: list[Suspect], lexicon=None, fname: Optional[str] = None, bus=None) -> dict:
+    """Re-ask the suspect replies of one file in batches and update ``cues`` in place."""
+    from ds_translator import db
+
+    global _fixed, _queued
+    # one entry per text; every cue with that text gets the result
+    unique = list({s.text: s for s in suspects}.values())
+    by_text: dict[str, list[int]] = {}
+    for i, cue in enumerate(cues):
+        by_text.setdefault(cue["text"].strip(), []).append(i)
+    batch_size = max(1, _env_int("DS_RETRANSLATE_BATCH", DEFAULT_BATCH))
+    fixed = 0
+    queued = 0
+    requests = 0
+    for start in range(0, len(unique), batch_size):
+        batch = unique[start:start + batch_size]
+        requests += 1
+        try:
+            answers = _request(batch, lexicon)
+        except Exception as e:
+            logger.warning(f"重译请求失败: {e}")
+            answers = {}
+        for k, s in enumerate(batch):
+            answer = answers.get(k)
+            reasons = check(s.text, answer) if answer is not None else s.reasons
+            if answer is not None and not reasons:
+                db.save_translation_to_db(s.text, answer)
+                translation = answer
+                fixed += 1
+            else:
+                db.enqueue_retry(s.text, error_text=f"可疑译文（{describe(reasons)}）: {(answer or s.reply)[:80]}")
+                translation = FAILED
+                queued += 1
+            for i in by_text.get(s.text, ()):
+                cues[i]["translation"] = translation
+    with _lock:
+        _fixed += fixed
+        _queued += queued
+    metrics.inc("validate.fixed", fixed)
+    metrics.inc("validate.queued", queued)
+    if bus is not None and fname is not None and unique:
+        bus.publish("file_info", file=fname,
+                    message=f"译文校验：{len(unique)} 条可疑译文，重译成功 {fixed} 条，{queued} 条转入重试队列（{requests} 次请求）")
+    return {"suspects": len(unique), "fixed": fixed, "queued": queued, "requests": requests}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def sweep(queue: bool = True, chunk_size: int = 5000, examples: int = 5) -> dict:
+    """Check every cached translation; with ``queue`` move suspect rows to the retry queue."""
+    from ds_translator import db
+
+    start = time.perf_counter()
+    scanned = 0
+    reasons: Counter = Counter()
+    found: list[tuple[str, str, list]] = []
+    # human-verified rows are kept as they are, even with kana in them
+    for rows in db.iter_translations(chunk_size, include_verified=False):
+        scanned += len(rows)
+        for original, translation in rows:
+            if translation == FAILED:
+                # failure markers are retried by the retry worker already
+                continue
+            why = check(original, translation)
+            if why:
+                reasons.update(why)
+                found.append((original, translation, why))
+    queued = 0
+    if queue and found:
+        queued = db.requeue_translations(
+            (original, f"可疑译文（{describe(why)}）: {translation[:80]}") for original, translation, why in found
+        )
+    return {
+        "scanned": scanned,
+        "suspects": len(found),
+        "reasons": dict(reasons),
+        "examples": [(o, t, describe(why)) for o, t, why in found[:examples]],
+        "queued": queued,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def stats() -> dict:
+    with _lock:
+        return {"checked": _checked, "suspects": _suspects, "reasons": dict(_reasons), "fixed": _fixed, "queued": _queued}
+
+
+def reset_stats() -> None:
+    global _checked, _suspects, _fixed, _queued
+    with _lock:
+        _checked = _suspects = _fixed = _queued = 0
+        _reasons.clear()
+
+
+def format_stats(data: Optional[dict] = None) -> list[str]:
+    """Summary line for the run (empty when no reply was suspect)."""
+    data = stats() if data is None else data
+    if not data["suspects"]:
+        return []
+    reasons = "，".join(f"{REASONS.get(r, r)} {n}" for r, n in sorted(data["reasons"].items(), key=lambda kv: -kv[1]))
+    return [
+        f"检查 {data['checked']} 条 API 译文，可疑 {data['suspects']} 条（{reasons}），"
+        f"重译成功 {data['fixed']} 条，转入重试队列 {data['queued']} 条"
+    ]
@@ -0,0 +1,175 @@
+"""Rebuild the translation cache from finished bilingual outputs.
+
+On a new machine, or after ``translation_cache.db`` is lost, every line
+is a cache miss even though the output directory holds the translated
+``-roasted.srt`` files. ``warm(directory)`` reads every ``.srt`` under
+``directory`` with the streaming block parser. It reads in worker
+processes when there are enough files (``DS_WARMUP_WORKERS``, default one
+per CPU), as the planner does. Each cue's (original line, translation)
+becomes a cache row.
+
+Cues marked ``[翻译失败]``, empty lines, and lines answered by the lexicon
+or the local fast path are skipped. Unless ``DS_VALIDATE=0``, pairs that
+``validate.check`` flags (leftover kana, repeated context, explanations;
+outputs written before those checks existed can contain them) are
+skipped and counted, so they are not served from the cache. Files are read newest first and rows
+are written with ``INSERT OR IGNORE``, so the newest output wins and
+existing rows (including human-verified ones) are never replaced. Rows
+are written in chunks of ``chunk_size`` (``DS_WARMUP_CHUNK``, default
+20000), one transaction per chunk, while the workers keep parsing.
+
+With pre-translate hooks configured the cache key is the hook-rewritten
+text, so files are then read in this process through the proofread
+alignment (``proofread.pairs_for_file``).
+
+Run with ``main.py --warm-cache [DIR]`` (default: the output directory).
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import os
+import time
+
+from ds_translator import db
+from ds_translator import fastpath
+from ds_translator import hooks
+from ds_translator import incremental
+from ds_translator import lexicon as lex
+from ds_translator import metrics
+from ds_translator import proofread
+from ds_translator import validate
+
+logger = logging.getLogger("ds_translator.warmup")
+
+FAILED = "[翻译失败]"
+DEFAULT_CHUNK = 20_000
+# below this many files, parsing in-process beats starting worker processes
+_PARALLEL_MIN_FILES = 8
+
+# per-process memoised fast-path check (see fastpath.handles_cached)
+_is_fast = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _output_files(directory: str) -> list[str]:
+    paths = []
+    for root, _dirs, files in os.walk(directory):
+        paths.extend(os.path.join(root, name) for name in files if name.lower().endswith(".srt"))
+    # newest first: with INSERT OR IGNORE the first translation of a line wins
+    return sorted(paths, key=lambda p: (-os.path.getmtime(p), p))
+
+
+def _read_pairs(path: str):
+    """Translated cues of one output; returns (pairs, cues, fast-path cues, error).
+
+    Runs in the worker processes, so the fast-path check is done here too.
+    """
+    global _is_fast
+    try:
+        blocks = incremental.read_bilingual_srt(path)
+    except OSError as e:
+        return [], 0, 0, str(e)
+    if _is_fast is None:
+        _is_fast = fastpath.handles_cached() or (lambda text: False)
+    pairs = []
+    local = 0
+    for _idx, _tc, original, translation in blocks:
+        if not original or not translation or translation == FAILED:
+            continue
+        if _is_fast(original):
+            local += 1
+            continue
+        pairs.append((original, translation))
+    return pairs, len(blocks), local, None
+
+
+def _scan(paths: list[str]):
+    workers = _env_int("DS_WARMUP_WORKERS", 0) or (os.cpu_count() or 1)
+    if len(paths) < _PARALLEL_MIN_FILES or workers < 2:
+        yield from map(_read_pairs, paths)
+        return
+    chunksize = max(1, min(64, len(paths) // (workers * 4)))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_read_pairs, paths, chunksize=chunksize)
+
+
+def _scan_with_hooks(paths: list[str], store, is_fast):
+    for path in paths:
+        try:
+            lexicon = store.for_file(proofread.source_name(os.path.basename(path)))
+            pairs, info = proofread.pairs_for_file(path, None, lexicon, is_fast)
+        except OSError as e:
+            yield path, [], 0, 0, str(e)
+            continue
+        yield path, pairs, info["cues"], info["local"], None
+
+
+def warm(directory: str, chunk_size: int = 0) -> dict:
+    """Load the translated cues of every output under ``directory`` into the cache."""
+    start = time.perf_counter()
+    chunk_size = chunk_size or max(1, _env_int("DS_WARMUP_CHUNK", DEFAULT_CHUNK))
+    store = lex.shared_store()
+    paths = _output_files(directory)
+    result = {"files": 0, "errors": 0, "cues": 0, "local": 0, "suspect": 0, "pairs": 0, "inserted": 0, "chunks": 0}
+    check = validate.check if validate.enabled() else None
+    if hooks.configured(hooks.PRE):
+        scanned = _scan_with_hooks(paths, store, fastpath.handles_cached())
+    else:
+        scanned = ((path, *scan) for path, scan in zip(paths, _scan(paths)))
+
+    pending: list[tuple[str, str]] = []
+
+    def flush():
+        result["inserted"] += db.insert_missing(pending)
+        result["chunks"] += 1
+        pending.clear()
+
+    for path, pairs, cues, local, error in scanned:
+        if error is not None:
+            logger.warning(f"无法读取输出文件 {path}: {error}")
+            result["errors"] += 1
+            continue
+        result["files"] += 1
+        result["cues"] += cues
+        result["local"] += local
+        lexicon = store.for_file(proofread.source_name(os.path.basename(path)))
+        for original, translation in pairs:
+            if original in lexicon:
+                result["local"] += 1
+                continue
+            if check is not None and check(original, translation):
+                result["suspect"] += 1
+                continue
+            pending.append((original, translation))
+        result["pairs"] += len(pairs) + local
+        if len(pending) >= chunk_size:
+            flush()
+    if pending:
+        flush()
+    result["seconds"] = time.perf_counter() - start
+    metrics.inc("warmup.files", result["files"])
+    metrics.inc("warmup.inserted", result["inserted"])
+    metrics.inc("warmup.suspect", result["suspect"])
+    return result
+
+
+def format_result(result: dict) -> list[str]:
+    """Summary lines of one ``warm`` run."""
+    candidates = result["pairs"] - result["local"] - result["suspect"]
+    rate = result["inserted"] / result["seconds"] if result["seconds"] else 0.0
+    return [
+        f"读取 {result['files']} 个输出文件"
+        + (f"（{result['errors']} 个无法读取）" if result["errors"] else "")
+        + f"，{result['cues']} 条字幕中 {result['pairs']} 条有译文（{result['local']} 条由词库或本地规则处理，跳过）"
+        + (f"，{result['suspect']} 条译文未通过检查（{validate.REASONS['kana']}、{validate.REASONS['echo']}等），跳过"
+           if result["suspect"] else ""),
+        f"写入缓存 {result['inserted']} 条，{candidates - result['inserted']} 条已在缓存中或重复，"
+        f"分 {result['chunks']} 批提交，用时 {result['seconds']:.2f} s（{rate:.0f} 条/秒）",
+    ]
@@ -0,0 +1,278 @@
+"""Watch the input directory and queue new or changed subtitle files.
+
+Used by ``main.py --watch``. On Linux the watcher blocks on inotify
+(through ctypes, no extra dependency); elsewhere, or when inotify is not
+available, it compares ``os.scandir`` snapshots every ``DS_WATCH_POLL``
+seconds. Either way, an idle watcher sleeps in the kernel or in a single
+timed wait, so CPU use stays near zero.
+
+A file is queued only after its size and mtime have stayed unchanged for
+``DS_WATCH_SETTLE`` seconds, so half-copied files are never translated.
+The queue is bounded (``DS_WATCH_QUEUE``): while earlier jobs are still
+running and the queue is full, the watcher thread blocks instead of
+piling up work (inotify events keep buffering in the kernel meanwhile;
+on overflow the directory is rescanned).
+
+Environment:
+    DS_WATCH_BACKEND   auto (default), inotify or poll
+    DS_WATCH_SETTLE    seconds a file must be stable (default 2)
+    DS_WATCH_POLL      polling interval in seconds (default 2)
+    DS_WATCH_QUEUE     maximum queued files (default 8)
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import queue
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+from ds_translator import metrics
+
+logger = logging.getLogger("ds_translator.watch")
+
+# inotify(7) constants
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+_RESCAN = None  # returned by a backend when every file must be re-checked
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _snapshot(directory: str, accept: Callable[[str], bool]) -> dict[str, tuple[int, int]]:
+    out = {}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if accept(entry.name):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    out[entry.name] = (st.st_size, st.st_mtime_ns)
+    except OSError:
+        pass
+    return out
+
+
+class _PollBackend:
+    name = "poll"
+
+    def __init__(self, directory: str, accept: Callable[[str], bool], interval: float) -> None:
+        self.directory = directory
+        self.accept = accept
+        self.interval = interval
+        self._stop = threading.Event()
+        self._last = _snapshot(directory, accept)
+
+    def wait(self, timeout: Optional[float]):
+        """Return names that appeared or changed since the previous call."""
+        if timeout is None or timeout > self.interval:
+            timeout = self.interval
+        self._stop.wait(timeout)
+        current = _snapshot(self.directory, self.accept)
+        changed = {name for name, sig in current.items() if self._last.get(name) != sig}
+        self._last = current
+        return changed
+
+    def wake(self) -> None:
+        self._stop.set()
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyBackend:
+    name = "inotify"
+
+    def __init__(self, directory: str, accept: Callable[[str], bool]) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.accept = accept
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_MODIFY | _IN_DELETE_SELF
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"inotify_add_watch failed for {directory}")
+        # self-pipe so stop() can interrupt a blocking select()
+        self._wake_r, self._wake_w = os.pipe()
+
+    def wait(self, timeout: Optional[float]):
+        """Block until events arrive (or ``timeout``); return the affected names."""
+        ready, _, _ = select.select([self.fd, self._wake_r], [], [], timeout)
+        if self._wake_r in ready:
+            os.read(self._wake_r, 64)
+        if self.fd not in ready:
+            return set()
+        names = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            raw = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                return _RESCAN
+            if mask & _IN_DELETE_SELF:
+                logger.warning("监视目录已被删除，停止监视")
+                continue
+            name = os.fsdecode(raw)
+            if name and self.accept(name):
+                names.add(name)
+        return names
+
+    def wake(self) -> None:
+        try:
+            os.write(self._wake_w, b"x")
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        for fd in (self.fd, self._wake_r, self._wake_w):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class Watcher:
+    """Background thread turning directory changes into a bounded queue of file names."""
+
+    def __init__(
+        self,
+        directory: str,
+        suffix: str = ".srt",
+        ignore: Optional[Callable[[str], bool]] = None,
+        settle: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        maxsize: Optional[int] = None,
+        backend: Optional[str] = None,
+    ) -> None:
+        self.directory = directory
+        self.settle = settle if settle is not None else _env_float("DS_WATCH_SETTLE", 2.0)
+        poll_interval = poll_interval if poll_interval is not None else _env_float("DS_WATCH_POLL", 2.0)
+        maxsize = maxsize if maxsize is not None else int(_env_float("DS_WATCH_QUEUE", 8))
+        self.queue: "queue.Queue[str]" = queue.Queue(maxsize=max(1, maxsize))
+
+        def accept(name: str) -> bool:
+            return name.lower().endswith(suffix) and not (ignore and ignore(name))
+
+        self._accept = accept
+        self._queued: set[str] = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        choice = (backend or os.getenv("DS_WATCH_BACKEND", "auto")).strip().lower()
+        self._backend = None
+        if choice in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                self._backend = _InotifyBackend(directory, accept)
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify 不可用，改用轮询: {e}")
+        if self._backend is None:
+            self._backend = _PollBackend(directory, accept, max(0.1, poll_interval))
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ds_watch")
+
+    @property
+    def backend(self) -> str:
+        return self._backend.name
+
+    def __enter__(self) -> "Watcher":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._backend.wake()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self._backend.close()
+
+    def get_batch(self, timeout: float = 1.0) -> list[str]:
+        """Wait up to ``timeout`` for a queued file; return it plus any others already queued."""
+        try:
+            names = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                names.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            self._queued.difference_update(names)
+        metrics.gauge_set("watch.queue_depth", self.queue.qsize())
+        return names
+
+    def _enqueue(self, name: str) -> None:
+        with self._lock:
+            if name in self._queued:
+                return
+            self._queued.add(name)
+        # block while the consumer is busy and the queue is full (backpressure)
+        while not self._stopping.is_set():
+            try:
+                self.queue.put(name, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        metrics.inc("watch.enqueued")
+        metrics.gauge_set("watch.queue_depth", self.queue.qsize())
+
+    def _run(self) -> None:
+        # name -> (size, mtime_ns, monotonic time the signature was first seen)
+        pending: dict[str, tuple[int, int, float]] = {}
+        while not self._stopping.is_set():
+            # no pending files: sleep until the backend reports something
+            timeout = max(0.05, self.settle / 4) if pending else None
+            try:
+                changed = self._backend.wait(timeout)
+            except OSError as e:
+                logger.warning(f"监视目录出错: {e}")
+                self._stopping.wait(1.0)
+                continue
+            if changed is _RESCAN:
+                changed = set(_snapshot(self.directory, self._accept))
+            now = time.monotonic()
+            for name in changed:
+                pending[name] = (-1, -1, now)
+            for name, (size, mtime, since) in list(pending.items()):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    # removed or renamed away before it settled
+                    del pending[name]
+                    continue
+                if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                    pending[name] = (st.st_size, st.st_mtime_ns, now)
+                elif st.st_size > 0 and now - since >= self.settle:
+                    del pending[name]
+                    self._enqueue(name)
@@ -1,33 +1,35 @@
 import os
 import sys
-import pkgutil
-import importlib
-from dotenv import load_dotenv
+import argparse
+import logging
 from pathlib import Path
-from utils.registry import get_registry
-# Load environment variables
-load_dotenv()
+from ds_translator import settings
+# Load .env before importing modules that read feature flags at import time
+settings.load_env_file()
 from ds_translator.logging_config import init_logging
 
-from rich.progress import (
-    Progress,
-    SpinnerColumn,
-    BarColumn,
-    TextColumn,
-    TimeElapsedColumn,
-    TimeRemainingColumn,
-)
-# PercentageColumn may not be available in all Rich versions; use TextColumn for percentage
 import time
+from contextlib import nullcontext
 
-# initialize logging for CLI runs
-logger = init_logging()
+# configured by init_logging() at the start of main()
+logger = logging.getLogger("ds_translator")
 
 from ds_translator.console import subtle
-# Use the shared console defined in ds_translator.rich_progress so all
-# modules that use the shared_console render to the same terminal instance.
-from ds_translator.rich_progress import shared_console as console
+# Use the shared console so all modules render to the same terminal instance.
+from ds_translator.console import shared_console as console
 from ds_translator.icons import icon
+from ds_translator import metrics
+from ds_translator import profiling
+from ds_translator import events
+from ds_translator import manifest
+from ds_translator import hooks
+from ds_translator import routing
+from ds_translator.lexicon import ensure_lexicon_exists, shared_store
+
+# Heavier modules (the API client and requests, the SRT pipeline, Rich
+# progress, the service, the watcher, the planner, the plugin registry) are
+# imported inside the functions that need them, so runs that exit early
+# (missing key, nothing pending, --plan) start in tens of milliseconds.
 
 
 # Note: we no longer override builtins.print or patch tqdm globally here.
@@ -45,8 +47,8 @@ def init_data_paths():
     data_dir = base / "data"
 
     # Allow environment override
-    env_input = os.getenv("INPUT_DIR")
-    env_output = os.getenv("OUTPUT_DIR")
+    env_input = settings.get().input_dir
+    env_output = settings.get().output_dir
 
     input_dir = Path(env_input) if env_input else (data_dir / "subtitle")
     output_dir = Path(env_output) if env_output else (data_dir / "roast")
@@ -87,239 +89,645 @@ def init_data_paths():
 
     return str(input_dir), str(output_dir)
 
+def check_srt_module():
+    """Report which SRT implementation is in use; warn about stale whole-module builds."""
+    from ds_translator import srt as srt_module
+
+    if not srt_module.__file__.endswith(".py"):
+        # left over from the old setup.py that compiled every module
+        logger.warning(f"{icon('warn')} ds_translator.srt 加载自已编译的旧模块 {srt_module.__file__}，"
+                       f"源码修改不会生效，请删除该文件后重新运行 setup.py")
+    subtle(f"[SYS]srt helpers: {'compiled' if srt_module.SPEEDUPS else 'pure Python'}")
+
+
 def load_plugins():
-    """Load plugins from the plugins directory."""
+    """Index the commands of the plugins directory; modules are imported on first use."""
     import plugins
-    
-    for _, module_name, _ in pkgutil.iter_modules(plugins.__path__, plugins.__name__ + "."):
-        subtle(f"[SYS]{module_name} loaded")
-        importlib.import_module(module_name)
-
-from ds_translator.db import init_db, show_stats
-from ds_translator.lexicon import ensure_lexicon_exists, load_lexicon
-import importlib.util
-
-# Prefer the pure-Python `ds_translator/srt.py` implementation when present.
-# The package also contains a compiled extension `srt.cp313-win_amd64.pyd` which
-# may be selected by the importer and can produce its own tqdm output. To ensure
-# we use the editable Python source (so our progress handling changes apply),
-# load the source file explicitly and bind `translate_srt_file` from it.
-try:
-    src_path = os.path.join(os.path.dirname(__file__), "ds_translator", "srt.py")
-    if os.path.exists(src_path):
-        spec = importlib.util.spec_from_file_location("ds_translator.srt_py", src_path)
-        _srt_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(_srt_module)  # type: ignore
-        translate_srt_file = _srt_module.translate_srt_file
-    else:
-        # Fallback to regular import if source not present
-        from ds_translator.srt import translate_srt_file  # type: ignore
-except Exception:
-    # If anything goes wrong, fall back to default import to avoid crashing
-    from ds_translator.srt import translate_srt_file  # type: ignore
-from ds_translator import api as api_module
+    from utils import registry
 
+    start = time.perf_counter()
+    count = registry.discover(plugins)
+    elapsed = time.perf_counter() - start
+    metrics.observe("main.plugin_discovery", elapsed)
+    subtle(f"[SYS]indexed {count} plugin command(s) in {elapsed * 1000:.1f} ms")
 
-def main():
-    load_plugins()
-    registry = get_registry()
-    # Validate environment and input directory
-    api_key = os.getenv("DEEPSEEK_API_KEY")
-    if not api_key:
-        logger.error(f"{icon('error')} 错误: 未找到 DEEPSEEK_API_KEY，请检查 .env 文件")
+
+def resolve_plugin(group, name):
+    """Resolve a plugin command, importing its module if needed, and report the import time."""
+    from utils import registry
+
+    before = registry.load_times()
+    func = registry.resolve(group, name)
+    for module_name, seconds in registry.load_times().items():
+        if module_name not in before:
+            metrics.observe("main.plugin_import", seconds, module=module_name)
+            subtle(f"[SYS]{module_name} loaded in {seconds * 1000:.1f} ms")
+    return func
+
+def show_stats(stats=None):
+    """Print cache statistics (``db.show_stats``; sqlite is imported on first use)."""
+    from ds_translator.db import show_stats as _show_stats
+
+    _show_stats(stats)
+
+
+_SOURCE_LABELS = (("fastpath", "本地规则"), ("lexicon", "词库"), ("cache", "缓存"), ("api", "API"), ("failed", "失败"))
+
+
+def report_sources(counts=None):
+    """Print where the run's translations came from, including the local fast path's share."""
+    if counts is None:
+        from ds_translator import api as api_module
+
+        counts = api_module.source_counts()
+    total = sum(counts.values())
+    if not total:
         return
-    verify_type = os.getenv("VERIFY_TYPE", "roasted")
-    # Initialize data paths (creates directories if missing)
-    input_dir, output_dir = init_data_paths()
-    subtle(f"{icon('folder')} 使用输入目录: {input_dir}")
-    subtle(f"{icon('folder')} 使用输出目录: {output_dir}")
+    parts = [
+        f"{label} {counts.get(key, 0)} ({counts.get(key, 0) / total:.1%})"
+        for key, label in _SOURCE_LABELS
+        if key == "fastpath" or counts.get(key)
+    ]
+    subtle(f"[SOURCES] 共 {total} 条：" + "，".join(parts), soft_wrap=True)
 
-    if not os.path.exists(input_dir):
-        logger.error(f"{icon('error')} 错误: 找不到 '{input_dir}' 文件夹，请确保字幕文件存放在此目录。")
+
+def report_hooks(lines=None):
+    """Print the time spent in each pre/post-translation hook (slowest first)."""
+    for line in hooks.format_stats() if lines is None else lines:
+        subtle(f"[HOOK] {line}", soft_wrap=True)
+
+
+def report_routes(lines=None):
+    """Print per-route API calls, latency, tokens and estimated cost."""
+    for line in routing.format_stats() if lines is None else lines:
+        subtle(f"[ROUTE] {line}", soft_wrap=True)
+
+
+def report_glossary(lines=None):
+    """Print glossary violations found after translation and how many were fixed."""
+    if lines is None:
+        from ds_translator import glossary
+
+        lines = glossary.format_stats()
+    for line in lines:
+        subtle(f"[GLOSSARY] {line}", soft_wrap=True)
+
+
+def report_validate(lines=None):
+    """Print how many API replies failed the sanity checks and what became of them."""
+    if lines is None:
+        from ds_translator import validate
+
+        lines = validate.format_stats()
+    for line in lines:
+        subtle(f"[VALIDATE] {line}", soft_wrap=True)
+
+
+def run_sweep(mode):
+    """Check the whole translation cache; ``queue`` also moves suspect rows to the retry queue."""
+    from ds_translator import validate
+    from ds_translator.db import init_db
+
+    init_db()
+    result = validate.sweep(queue=mode == "queue")
+    reasons = "，".join(f"{validate.REASONS.get(r, r)} {n}" for r, n in sorted(result["reasons"].items(), key=lambda kv: -kv[1]))
+    subtle(
+        f"[SWEEP] 检查 {result['scanned']} 条缓存译文，可疑 {result['suspects']} 条"
+        + (f"（{reasons}）" if reasons else "") + f"，用时 {result['seconds']:.2f} s",
+        soft_wrap=True,
+    )
+    for original, translation, why in result["examples"]:
+        subtle(f"[SWEEP] {why}: {original} -> {translation}", soft_wrap=True)
+    if mode == "queue":
+        subtle(f"[SWEEP] 已从缓存移除 {result['queued']} 条并加入重试队列，下次翻译时由重试线程重新翻译", soft_wrap=True)
+    elif result["suspects"]:
+        subtle("[SWEEP] 仅报告，未修改缓存（使用 --sweep 加入重试队列）", soft_wrap=True)
+
+
+def run_ingest_proofread(directory, input_dir):
+    """Upsert the corrections in the proofread subtitles as human-verified cache entries."""
+    from ds_translator import proofread
+    from ds_translator.db import init_db
+
+    if not os.path.isdir(directory):
+        logger.error(f"{icon('error')} 错误: 找不到校对目录 '{directory}'")
         return
+    init_db()
+    subtle(f"{icon('folder')} 读取校对字幕: {directory}")
+    for line in proofread.format_result(proofread.ingest(directory, input_dir)):
+        subtle(f"[PROOFREAD] {line}", soft_wrap=True)
 
-    for group, name, func in registry:
-        if group == "plugin" and name == verify_type:
-            found_function = func
-            break
-    srt_files = found_function(input_dir, output_dir)
-    if srt_files is not None and len(srt_files) == 0:
-        subtle(f"{icon('done')} 提示: '{input_dir}' 文件夹中没有找到需要执行的 .srt 文件。")
+
+def run_warm_cache(directory):
+    """Load the translations of finished bilingual outputs into the cache."""
+    from ds_translator import warmup
+    from ds_translator.db import init_db
+
+    if not os.path.isdir(directory):
+        logger.error(f"{icon('error')} 错误: 找不到目录 '{directory}'")
         return
+    init_db()
+    subtle(f"{icon('folder')} 从双语字幕预热缓存: {directory}")
+    for line in warmup.format_result(warmup.warm(directory)):
+        subtle(f"[WARMUP] {line}", soft_wrap=True)
+    show_stats()
+
+
+def run_cache_sync(export_dir=None, import_dir=None):
+    """Export the cache to sorted, compressed shards or merge the changed shards of an export."""
+    from ds_translator import cache_sync
+    from ds_translator.db import init_db
+
+    init_db()
+    if export_dir:
+        lines = cache_sync.format_export(cache_sync.export_cache(export_dir))
+    else:
+        try:
+            lines = cache_sync.format_import(cache_sync.import_cache(import_dir))
+        except cache_sync.ShardError as e:
+            logger.error(f"{icon('error')} 错误: {e}")
+            return
+    for line in lines:
+        subtle(f"[SYNC] {line}", soft_wrap=True)
+    show_stats()
+
+
+def report_maintenance(result):
+    """Print the report of one cache maintenance pass."""
+    from ds_translator import maintenance
+
+    for line in maintenance.format_result(result):
+        subtle(f"[MAINT] {line}", soft_wrap=True)
+
+
+def run_maintain_cache():
+    """Expire, evict and compact the translation cache, with a before/after report."""
+    from ds_translator import maintenance
+    from ds_translator.db import init_db
+
+    init_db()
+    report_maintenance(maintenance.run(compact=True))
+    show_stats()
+
+
+def run_compress_cache(kind):
+    """Switch the cache's stored translations to compressed (or back to plain) form in place."""
+    from ds_translator import cache_codec
+    from ds_translator.db import init_db
+
+    init_db()
+    try:
+        result = cache_codec.migrate(kind)
+    except ImportError:
+        logger.error(f"{icon('error')} 错误: zstd 压缩需要 zstandard 包（pip install zstandard），或改用 --compress-cache zlib")
+        return
+    except ValueError as e:
+        logger.error(f"{icon('error')} 错误: {e}")
+        return
+    for line in cache_codec.format_result(result):
+        subtle(f"[COMPRESS] {line}", soft_wrap=True)
+    show_stats()
+
+
+def report_plan(result):
+    """Print the per-file table of a dry-run plan."""
+    from rich.table import Table
+
+    table = Table(title=f"{icon('search')} 翻译计划（预估）", title_justify="left")
+    for column in ("文件", "字幕", "本地", "复用", "缓存", "API", "输入 tokens", "缓存命中", "输出 tokens", "费用 ¥", "耗时"):
+        table.add_column(column, justify="left" if column == "文件" else "right", no_wrap=column != "文件")
+
+    def _row(r, style=None):
+        name = r["file"] if not r["error"] else f"{r['file']} ({r['error']})"
+        table.add_row(
+            name, str(r["cues"]), str(r["local"]), str(r["reused"]), str(r["cache"]), str(r["api"]),
+            str(r["prompt_tokens"]), str(r["prompt_cache_hit_tokens"]), str(r["completion_tokens"]),
+            f"{r['cost']:.4f}", f"{int(r['seconds'] // 3600)}:{time.strftime('%M:%S', time.gmtime(r['seconds']))}",
+            style=style,
+        )
+
+    for r in result["files"]:
+        _row(r)
+    table.add_section()
+    _row(result["totals"], style="bold")
+    console.print(table)
+    rpm = f"，上限 {result['rpm']:g} 次/分钟" if result["rpm"] else ""
+    subtle(
+        f"[PLAN] 按每次请求 {result['latency']:g} s、并发 {result['concurrency']:g}{rpm} 估算"
+        f"（DS_PLAN_LATENCY / DS_PLAN_CONCURRENCY / DS_PLAN_RPM），未调用 API",
+        soft_wrap=True,
+    )
+
+
+def report_metrics():
+    """Print the slowest pipeline stages and write metrics files to data/logs."""
+    if not metrics.enabled():
+        return
+    for line in metrics.format_stage_table():
+        subtle(f"[METRICS] {line}", soft_wrap=True)
+    logs_dir = Path(__file__).parent.resolve() / "data" / "logs"
+    try:
+        for path in metrics.write_reports(str(logs_dir)):
+            subtle(f"{icon('info')} 指标已写入: {path}")
+    except Exception as e:
+        logger.warning(f"{icon('warn')} 无法写入指标文件: {e}")
+
+
+def parse_args(argv=None):
+    """Parse command-line flags. Every flag has an environment-variable twin."""
+    parser = argparse.ArgumentParser(description="DeepSeek 字幕翻译流水线")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="sample",
+        choices=profiling.MODES,
+        default=None,
+        help="profile each file (cprofile or sample; default sample). Same as DS_PROFILE",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        default=None,
+        help="skip the live progress display and print only per-file results. Same as DS_QUIET=1",
+    )
+    parser.add_argument(
+        "--jsonl",
+        nargs="?",
+        const="-",
+        default=os.getenv("DS_JSONL") or None,
+        metavar="PATH",
+        help="emit machine-readable JSONL progress events to stdout (or PATH, e.g. a named pipe) "
+             "instead of the Rich display. Same as DS_JSONL",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="run as a long-lived local translator service (DS_SERVICE_URL, default http://127.0.0.1:8766); "
+             "later runs of main.py hand their files to it",
+    )
+    parser.add_argument(
+        "--no-service",
+        action="store_true",
+        default=os.getenv("DS_NO_SERVICE", "").lower() in ("1", "true", "yes"),
+        help="always translate in this process even if a service is running. Same as DS_NO_SERVICE=1",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        default=os.getenv("DS_WATCH", "").lower() in ("1", "true", "yes"),
+        help="after the pending files, keep watching the input directory and translate new or changed "
+             ".srt files in this process until Ctrl+C. Same as DS_WATCH=1",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="dry run: parse the pending files, resolve lexicon and cache hits and print the estimated "
+             "API calls, tokens, cost and time per file without translating anything",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="translate every cue again instead of reusing unchanged cues from an existing output. "
+             "Same as DS_INCREMENTAL=0",
+    )
+    parser.add_argument(
+        "--sweep",
+        nargs="?",
+        const="queue",
+        choices=("queue", "report"),
+        default=None,
+        help="check every cached translation for untranslated kana, echoed context, explanations and "
+             "abnormal length; suspect rows are moved to the retry queue (--sweep report only lists them)",
+    )
+    parser.add_argument(
+        "--ingest-proofread",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help="read the hand-corrected bilingual subtitles in data/proofread (or DIR), align them to the "
+             "source cues and store the corrections in the cache as human-verified translations",
+    )
+    parser.add_argument(
+        "--warm-cache",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help="rebuild the translation cache from the finished bilingual subtitles in the output directory "
+             "(or DIR); existing cache entries are kept",
+    )
+    parser.add_argument(
+        "--export-cache",
+        metavar="DIR",
+        help="write the translation cache to DIR as sorted, compressed shards with a manifest "
+             "(unchanged shards of an earlier export are left alone)",
+    )
+    parser.add_argument(
+        "--import-cache",
+        metavar="DIR",
+        help="merge a cache export from DIR into the local cache, reading only the shards that changed "
+             "since the last import from it",
+    )
+    parser.add_argument(
+        "--maintain-cache",
+        action="store_true",
+        help="expire failure markers, evict beyond DS_CACHE_MAX_ROWS / DS_CACHE_MAX_MB, drop redundant "
+             "indexes, vacuum and analyze the cache, then report size and lookup latency before and after "
+             "(--watch and --serve also do this every DS_CACHE_MAINTAIN_HOURS)",
+    )
+    parser.add_argument(
+        "--compress-cache",
+        nargs="?",
+        const="auto",
+        choices=("auto", "zstd", "zlib", "off"),
+        default=None,
+        help="store cached translations compressed with a dictionary trained on the cache (auto picks zstd "
+             "or zlib, whichever is smaller) and re-encode the existing rows in place; off turns them back "
+             "into plain text",
+    )
+    return parser.parse_args(argv)
+
+
+def init_translation():
+    """Prepare DB, lexicon and retry worker for in-process translation; returns the lexicon store."""
+    from ds_translator import api as api_module
+    from ds_translator.db import init_db
 
     # 初始化数据库与词库（如果不存在则创建示例）
     init_db()
     ensure_lexicon_exists()
-    lexicon = load_lexicon()
+    store = shared_store()
+    counts = store.namespaces()
+    shows = ", ".join(f"{name} ({n})" for name, n in sorted(counts.items()) if name)
+    subtle(f"[SYS]lexicon: {counts.get('', 0)} entries" + (f", shows: {shows}" if shows else ""))
 
     # 启动后台重试工作线程（会处理持久化的重试队列）
     try:
         api_module.start_retry_worker()
     except Exception as e:
         logger.warning(f"{icon('warn')} 无法启动重试工作线程: {e}")
+    return store
 
-    # 显示当前缓存状态
-    show_stats()
 
-    subtle(f"{icon('search')} 发现 {len(srt_files)} 个字幕文件，开始翻译...")
+def build_jobs(filenames, input_dir, output_dir):
+    """Return (filename, input_path, output_path) for each input file name."""
+    jobs = []
+    for filename in filenames:
+        input_path = os.path.join(input_dir, filename)
+        # 在输出文件名中加入 roasted 信息，例如 "movie.srt" -> "movie-roasted.srt"
+        output_path = os.path.join(output_dir, manifest.output_name(filename))
+        jobs.append((filename, input_path, output_path))
+    return jobs
+
+
+def translate_jobs(jobs, store, profiler, incremental_mode=None):
+    """Translate ``jobs`` one file at a time in this process and record them in the manifest.
+
+    Each file gets the lexicon view of its show namespace from ``store``.
+    """
+    # srt picks the compiled parse/rebuild/context helpers when they are built
+    # (python ds_translator/setup.py build_ext --inplace) and the pure-Python
+    # ones otherwise.
+    from ds_translator.srt import translate_srt_file
+
+    run_settings = manifest.current_settings()
+    # one manifest write for the whole run (see manifest.batch)
+    with manifest.batch():
+        for filename, input_path, output_path in jobs:
+            file_start = time.perf_counter()
+            profile_summary = []
+            try:
+                # signature first: an edit made during translation must count as a change
+                signature = manifest.source_signature(input_path)
+                with metrics.file_scope(filename), profiling.profile_file(profiler, filename) as profile_summary:
+                    translate_srt_file(input_path, output_path, lexicon=store.for_file(filename), incremental_mode=incremental_mode)
+                metrics.inc("main.files", status="ok")
+                try:
+                    manifest.record(input_path, output_path, signature, run_settings)
+                except OSError as e:
+                    logger.warning(f"{icon('warn')} 无法更新清单: {e}")
+            except Exception:
+                # the renderer has already reported the error (file_failed event)
+                metrics.inc("main.files", status="error")
+            finally:
+                with metrics.file_scope(filename):
+                    metrics.observe("main.file", time.perf_counter() - file_start)
+                for line in profile_summary:
+                    subtle(f"[PROFILE] {line}", soft_wrap=True)
+
+
+def watch_input_dir(input_dir, output_dir, jobs, profiler, new_renderer, incremental_mode=None):
+    """Translate ``jobs``, then keep translating files that settle in ``input_dir`` until Ctrl+C.
+
+    Everything stays warm between batches (DB connection, HTTP session,
+    retry worker); the lexicon is recompiled only when its CSVs change.
+    Idle iterations run the scheduled cache maintenance when it is due.
+    """
+    from ds_translator import maintenance
+    from ds_translator import watch
+
+    # when output_dir == input_dir our own outputs must not trigger new jobs
+    watcher = watch.Watcher(input_dir, ignore=lambda name: name.lower().endswith("-roasted.srt"))
+    subtle(f"{icon('search')} 正在监视 {input_dir} ({watcher.backend})，新的或修改过的字幕文件写入完成后会自动翻译，按 Ctrl+C 退出")
+    try:
+        with watcher:
+            while True:
+                if jobs:
+                    batch_start = time.perf_counter()
+                    with new_renderer():
+                        events.publish("run_started", files=len(jobs))
+                        translate_jobs(jobs, shared_store(), profiler, incremental_mode)
+                        events.publish("run_finished", files=len(jobs), elapsed=round(time.perf_counter() - batch_start, 3))
+                else:
+                    result = maintenance.maybe_run()
+                    if result is not None:
+                        report_maintenance(result)
+                jobs = build_jobs(watcher.get_batch(), input_dir, output_dir)
+    except KeyboardInterrupt:
+        subtle(f"{icon('info')} 已停止监视")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.jsonl in ("-", ""):
+        # stdout carries the JSONL stream; send everything human-readable to stderr
+        console.file = sys.stderr
+    init_logging()
+    config = settings.get()
+    load_plugins()
+    verify_type = config.verify_type
+    # Initialize data paths (creates directories if missing)
+    input_dir, output_dir = init_data_paths()
+    # Cache-only commands never call the API, so they run without a key
+    if args.sweep:
+        run_sweep(args.sweep)
+        return
+    if args.ingest_proofread is not None:
+        run_ingest_proofread(args.ingest_proofread or str(Path(__file__).parent.resolve() / "data" / "proofread"), input_dir)
+        return
+    if args.warm_cache is not None:
+        run_warm_cache(args.warm_cache or output_dir)
+        return
+    if args.export_cache or args.import_cache:
+        run_cache_sync(args.export_cache, args.import_cache)
+        return
+    if args.maintain_cache:
+        run_maintain_cache()
+        return
+    if args.compress_cache:
+        run_compress_cache(args.compress_cache)
+        return
+    # --plan only estimates, so it works without a key too
+    if not args.plan and not config.api_key:
+        logger.error(f"{icon('error')} 错误: 未找到 DEEPSEEK_API_KEY，请检查 .env 文件")
+        return
+    if args.serve:
+        from ds_translator import service
 
+        check_srt_module()
+        try:
+            service.serve(input_dir, output_dir)
+        except ValueError as e:
+            logger.error(f"{icon('error')} 错误: {e}")
+        return
+    subtle(f"{icon('folder')} 使用输入目录: {input_dir}")
+    subtle(f"{icon('folder')} 使用输出目录: {output_dir}")
+
+    if not os.path.exists(input_dir):
+        logger.error(f"{icon('error')} 错误: 找不到 '{input_dir}' 文件夹，请确保字幕文件存放在此目录。")
+        return
+
+    found_function = resolve_plugin("plugin", verify_type)
+    if found_function is None:
+        logger.error(f"{icon('error')} 错误: 找不到 VERIFY_TYPE={verify_type} 对应的插件")
+        return
+    if args.watch and not any(f.lower().endswith(".srt") for f in os.listdir(input_dir)):
+        # nothing yet; the plugin would exit on an empty input directory
+        srt_files = []
+    else:
+        srt_files = found_function(input_dir, output_dir)
+    if srt_files is not None and len(srt_files) == 0 and not args.watch:
+        subtle(f"{icon('done')} 提示: '{input_dir}' 文件夹中没有找到需要执行的 .srt 文件。")
+        return
+
+    if args.plan:
+        from ds_translator import planner
+
+        ensure_lexicon_exists()
+        start = time.perf_counter()
+        result = planner.plan(build_jobs(srt_files, input_dir, output_dir), shared_store(),
+                              incremental_mode=False if args.full else None)
+        report_plan(result)
+        subtle(f"[PLAN] 已规划 {len(srt_files)} 个文件，用时 {time.perf_counter() - start:.2f} s")
+        if not config.api_key and result["totals"]["api"]:
+            subtle("[PLAN] 尚未配置 DEEPSEEK_API_KEY，实际翻译前请在 .env 中设置", soft_wrap=True)
+        return
+
+    logs_dir = str(Path(__file__).parent.resolve() / "data" / "logs")
     try:
-        # Use Rich Progress to show translation progress. Use a single-line
-        # progress: description + bar + percentage + elapsed. This renders as:
-        # "Translating <file> ━━━ 100% 0:00:00" on one line.
-        with Progress(
-            # Add a spinner column (green 'dots') so the UI shows the familiar
-            # spinning green-dot indicator like the demo spinner.
-            SpinnerColumn(spinner_name="dots", style="green"),
-            TextColumn("{task.description}"),
-            BarColumn(bar_width=None),
-            # Right-aligned info field (used for small per-file messages like
-            # "parsed N subtitles") so they appear on the progress line.
-            TextColumn("{task.fields[info]}", justify="right"),
-            TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-            TimeElapsedColumn(),
-            console=console,
-        ) as progress:
-            # For each file we'll create a short-lived per-file task that tracks
-            # subtitle-level progress. We remove the task when the file is done
-            # so only one summarized line is visible at a time.
-            for filename in srt_files:
-                input_path = os.path.join(input_dir, filename)
-                # 在输出文件名中加入 roasted 信息，例如 "movie.srt" -> "movie-roasted.srt"
-                name, ext = os.path.splitext(filename)
-                roasted_filename = f"{name}-roasted{ext}"
-                output_path = os.path.join(output_dir, roasted_filename)
-
-                file_task = progress.add_task(f"Translating {filename}", total=0, info="")
-
-                # Create a callback closure the srt translator can call. It will
-                # set the total when known and advance the completed count; we
-                # also compute and show lines/sec in the task description.
-                def make_progress_callback(task_id, fname):
-                    start_time = None
-                    completed = 0
-                    total = None
-                    # Throttle description updates to avoid excessive terminal writes
-                    last_desc_time = 0.0
-                    desc_update_interval = 0.5  # seconds
-                    # Collector for messages that should be printed after the
-                    # per-file task is removed (so they don't get lost when the
-                    # task is removed immediately after translation finishes).
-                    final_msgs = []
-
-                    def _cb(op, value=None):
-                        nonlocal start_time, completed, total
-                        if op == 'set_total':
-                            total = int(value) if value is not None else None
-                            start_time = time.perf_counter()
-                            try:
-                                # Set the total and initial description once.
-                                progress.update(task_id, total=total, description=f"Translating {fname}")
-                            except Exception:
-                                pass
-                        elif op == 'advance':
-                            inc = int(value) if value is not None else 1
-                            completed += inc
-                            try:
-                                # Only update numeric completed count; visual bar/percent
-                                # and elapsed time are rendered by Rich on the single line.
-                                progress.update(task_id, completed=completed)
-                            except Exception:
-                                pass
-                        elif op == 'info':
-                            # small informational text to display on the right of the progress line
-                            try:
-                                progress.update(task_id, info=value)
-                            except Exception:
-                                pass
-                        elif op == 'final':
-                            # store final messages (e.g., saved path) to be printed
-                            # after the task is removed to avoid interfering with
-                            # the single-line progress UI.
-                            try:
-                                final_msgs.append(value)
-                            except Exception:
-                                pass
-
-                    # attach the final_msgs list to the callback function so
-                    # callers can inspect it after translation finishes.
-                    _cb._final_msgs = final_msgs
-                    return _cb
-
-                # Attach the final_msgs list to the callback so the outer scope
-                # can access messages accumulated during translation.
-                # We'll set it after creation below.
-
-                progress_cb = make_progress_callback(file_task, filename)
-                # expose final_msgs list from the callback for later printing
-                final_msgs = getattr(progress_cb, '_final_msgs', None)
-                if final_msgs is None:
-                    # if not set yet, try to attach by retrieving closure attribute
-                    try:
-                        # _cb created inside make_progress_callback; it will have
-                        # a final_msgs attribute set below; ensure it's present.
-                        progress_cb._final_msgs = []
-                        final_msgs = progress_cb._final_msgs
-                    except Exception:
-                        final_msgs = []
+        profiler = profiling.from_env(args.profile, logs_dir)
+    except ValueError as e:
+        logger.warning(f"{icon('warn')} 忽略无效的性能分析设置: {e}")
+        profiler = None
+
+    # Hand the files to a running service unless told otherwise (profiling
+    # only makes sense in this process)
+    from ds_translator import service
+
+    check_srt_module()
+    remote = None
+    if not args.no_service and not args.watch and profiler is None:
+        remote = service.probe()
+        if remote is not None and remote.get("fingerprint") != service.fingerprint():
+            logger.warning(
+                f"{icon('warn')} 翻译服务 {service.service_url()} (PID {remote.get('pid')}) 使用的缓存数据库、API 地址或模型"
+                f"与本地设置不同（服务缓存: {remote.get('cache_db')}），改为在本进程中翻译"
+            )
+            remote = None
+    store = None
+    if remote is not None:
+        subtle(f"{icon('info')} 已连接翻译服务 {service.service_url()} (PID {remote['pid']})，由服务执行翻译")
+    else:
+        store = init_translation()
+        # 显示当前缓存状态
+        show_stats()
+
+    subtle(f"{icon('search')} 发现 {len(srt_files)} 个字幕文件，开始翻译...")
+    if profiler is not None:
+        subtle(f"{icon('info')} 已开启性能分析 ({profiler.mode})，报告将写入 {logs_dir}")
+
+    jobs = build_jobs(srt_files, input_dir, output_dir)
+    incremental_mode = False if args.full else None
 
+    if args.jsonl is not None:
+        # machine-readable mode: no Rich rendering at all, just the event stream
+        try:
+            sink = events.open_jsonl_sink(args.jsonl)
+        except OSError as e:
+            logger.error(f"{icon('error')} 无法打开事件输出 {args.jsonl}: {e}")
+            return
+        new_renderer = nullcontext
+    else:
+        sink = nullcontext()
+        def new_renderer():
+            from ds_translator.rich_progress import create_renderer
+
+            return create_renderer(console, quiet=args.quiet)
+
+    if args.watch:
+        try:
+            with sink:
+                watch_input_dir(input_dir, output_dir, jobs, profiler, new_renderer, incremental_mode)
+        finally:
+            show_stats()
+            report_sources()
+            report_hooks()
+            report_routes()
+            report_validate()
+            report_glossary()
+            report_metrics()
+        return
+
+    run_start = time.perf_counter()
+    remote_stats = None
+    try:
+        # Progress is published by translate_srt_file on the event bus; the
+        # renderer coalesces it into a single Rich progress line per file at a
+        # fixed frame rate (or plain final lines in quiet / non-TTY mode).
+        with sink, new_renderer():
+            events.publish("run_started", files=len(srt_files))
+            if remote is not None:
                 try:
-                    try:
-                        # Prefer calling with progress callback when supported
-                        translate_srt_file(input_path, output_path, lexicon=lexicon, progress_callback=progress_cb)
-                    except TypeError as te:
-                        # Some installs may use a compiled extension that doesn't
-                        # accept the extra kwarg; fall back to calling without it.
-                        msg = str(te)
-                        if 'unexpected keyword argument' in msg or 'got an unexpected keyword argument' in msg:
-                            translate_srt_file(input_path, output_path, lexicon=lexicon)
-                        else:
-                            raise
-                    # Ensure task reaches full completion if set
-                    try:
-                        t = progress.tasks[file_task]
-                        if t.total and t.completed < t.total:
-                            progress.update(file_task, completed=t.total)
-                    except Exception:
-                        pass
+                    remote_stats = service.run_files_remote(
+                        [{"input": os.path.abspath(i), "output": os.path.abspath(o)} for _, i, o in jobs],
+                        incremental_mode=incremental_mode,
+                    )
+                    jobs = []
                 except Exception as e:
-                    # Use style argument instead of markup to avoid issues when
-                    # the icon text contains square brackets in ASCII mode.
-                    console.print(f"{icon('error')} 处理文件 {filename} 时出错: {e}", style="red")
-                finally:
-                    # Remove the per-file task so subsequent files replace the
-                    # single progress line instead of accumulating.
-                    try:
-                        # If final messages were collected, show the last one
-                        # on the progress line briefly so the spinner/final
-                        # info are visible to the user before we remove the
-                        # task. Then remove the task and print the final
-                        # messages so they persist in the log.
-                        msgs = getattr(progress_cb, '_final_msgs', [])
-                        if msgs:
-                            last = msgs[-1]
-                            try:
-                                progress.update(file_task, info=last)
-                                # small pause to allow the spinner/info to be seen
-                                time.sleep(0.7)
-                            except Exception:
-                                pass
-                        progress.remove_task(file_task)
-                    except Exception:
-                        pass
-                    # Print any final messages collected during translation.
-                    # We print them after removing the task so they don't
-                    # disrupt the single-line progress UI. Use subtle style.
-                    try:
-                        msgs = getattr(progress_cb, '_final_msgs', [])
-                        for m in msgs:
-                            # Print without soft wrapping so long paths remain on one line
-                            console.print(m, style="italic dim", soft_wrap=False)
-                    except Exception:
-                        pass
+                    # outputs already written by the service become cache hits on the local re-run
+                    logger.warning(f"{icon('warn')} 翻译服务不可用，回退到本地翻译: {e}")
+                    remote = None
+                    store = init_translation()
+            translate_jobs(jobs, store, profiler, incremental_mode)
+            events.publish("run_finished", files=len(srt_files), elapsed=round(time.perf_counter() - run_start, 3))
     finally:
         # 最终统计
-        show_stats()
+        if remote_stats is not None:
+            show_stats((remote_stats["cache_entries"], remote_stats["cache_hits"]))
+            report_sources(remote_stats.get("sources", {}))
+            report_hooks(remote_stats.get("hooks", []))
+            report_routes(remote_stats.get("routes", []))
+            report_validate(remote_stats.get("validate", []))
+            report_glossary(remote_stats.get("glossary", []))
+        elif remote is None:
+            show_stats()
+            report_sources()
+            report_hooks()
+            report_routes()
+            report_validate()
+            report_glossary()
+        report_metrics()
 
     console.print(f"{icon('party')} 所有字幕翻译完成！")
 
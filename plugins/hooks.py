@@ -0,0 +1,58 @@
+"""Built-in pre/post-translation hooks.
+
+Enable them by name, in order, e.g.:
+    DS_PRE_HOOKS=skip_sound_effects,strip_music,strip_speaker_tags
+    DS_POST_HOOKS=normalize_punctuation
+See ds_translator/hooks.py for the cue format.
+"""
+import re
+from utils.registry import register_commond
+
+
+_OPEN = "（(［[【"
+_CLOSE = "）)］]】"
+# a cue made only of bracketed parts, e.g. （拍手） or [音楽]（笑）
+_SOUND_EFFECT = re.compile(rf"^\s*(?:[{re.escape(_OPEN)}][^{re.escape(_CLOSE)}]*[{re.escape(_CLOSE)}]\s*)+$")
+# a short bracketed speaker name in front of the line, e.g. （田中）こんにちは
+_SPEAKER_TAG = re.compile(rf"^\s*[{re.escape(_OPEN)}][^{re.escape(_CLOSE)}]{{1,16}}[{re.escape(_CLOSE)}]\s*(?=\S)")
+_MUSIC_MARKS = re.compile(r"[♪♫♬]+")
+
+_CJK = r"[　-ヿ㐀-䶿一-鿿＀-￯]"
+_HALF_TO_FULL = {",": "，", "?": "？", "!": "！", ":": "：", ";": "；"}
+_HALF_PUNCT = re.compile(rf"(?<={_CJK})\s*([,?!:;])\s*")
+_ELLIPSIS = re.compile(r"\.{3,}|。{3,}|…+")
+
+
+@register_commond("pre_translate", "skip_sound_effects")
+def skip_sound_effects(cues):
+    """Leave cues that are only bracketed sound effects untranslated (no API call)."""
+    for cue in cues:
+        if cue["translation"] is None and _SOUND_EFFECT.match(cue["text"]):
+            cue["translation"] = ""
+
+
+@register_commond("pre_translate", "strip_music")
+def strip_music(cues):
+    """Drop ♪/♫ marks from the text sent for translation; music-only cues become empty."""
+    for cue in cues:
+        text = cue["text"]
+        if "♪" in text or "♫" in text or "♬" in text:
+            cue["text"] = " ".join(_MUSIC_MARKS.sub(" ", text).split())
+
+
+@register_commond("pre_translate", "strip_speaker_tags")
+def strip_speaker_tags(cues):
+    """Remove a leading speaker tag such as （田中） from the text sent for translation."""
+    for cue in cues:
+        cue["text"] = _SPEAKER_TAG.sub("", cue["text"], count=1)
+
+
+@register_commond("post_translate", "normalize_punctuation")
+def normalize_punctuation(cues):
+    """Use full-width punctuation after Chinese text and a single "……" for ellipses."""
+    for cue in cues:
+        text = cue["translation"]
+        if not text or text == "[翻译失败]":
+            continue
+        text = _HALF_PUNCT.sub(lambda m: _HALF_TO_FULL[m.group(1)], text)
+        cue["translation"] = _ELLIPSIS.sub("……", text)
@@ -0,0 +1,19 @@
+"""``lexicon.terms_in`` on plain dicts must never answer from another dict's matcher."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ds_translator import lexicon as lex  # noqa: E402
+
+
+def test_plain_dicts_of_equal_size_do_not_share_matchers():
+    for i in range(2000):
+        # each dict is freed before the next is built, so CPython reuses its id
+        assert lex.terms_in({f"語{i}": "词"}, f"これは語{i}です") == [f"語{i}"]
+
+
+def test_longest_match_first():
+    assert lex.terms_in({"東京": "东京", "東京タワー": "东京塔"}, "東京タワーに行く") == ["東京タワー"]
@@ -0,0 +1,27 @@
+"""The compiled SRT helpers must match the pure-Python ones.
+
+Runs the fuzzed equivalence check of ``bench/srt_speedups.py`` (parse,
+rebuild and context building over malformed SRT) and is skipped when the
+extension is not built (``python ds_translator/setup.py build_ext --inplace``).
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(REPO_ROOT / "bench"))
+
+from ds_translator import srt  # noqa: E402
+import srt_speedups  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not srt.SPEEDUPS, reason="compiled SRT helpers not built")
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_fuzzed_corpus_matches_pure_python(seed):
+    # mismatching cases are printed and shown by pytest on failure
+    assert srt_speedups.check(1000, seed) == 0
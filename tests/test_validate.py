@@ -0,0 +1,35 @@
+"""Reply checks of ``validate.check``: explanations are caught, ordinary dialogue is not."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ds_translator import validate  # noqa: E402
+
+
+@pytest.mark.parametrize("source, reply", [
+    ("つまり私に出て行けと？", "你的意思是要我走？"),
+    ("その言葉を取り消せ", "把这句话收回去"),
+    ("どういう意味だ", "这句话是什么意思？"),
+    ("以下の通りです", "情况如下"),
+    ("ありがとう", "谢谢"),
+])
+def test_dialogue_passes(source, reply):
+    assert validate.check(source, reply) == []
+
+
+@pytest.mark.parametrize("source, reply", [
+    ("ありがとう", "译文：谢谢"),
+    ("ありがとう", "注：这是表示感谢的说法"),
+    ("ありがとう", "以下是翻译：谢谢"),
+    ("ありがとう", "意思是：谢谢"),
+    ("ありがとう", "这句话的意思是谢谢"),
+    ("ありがとう", "谢谢（注：口语）"),
+    ("ありがとう", "谢谢\n这是一句道谢"),
+])
+def test_explanations_flagged(source, reply):
+    assert "explanation" in validate.check(source, reply)
@@ -4,28 +4,55 @@ use for function registration
 这个模块实现了一个命令注册系统，允许通过装饰器将函数注册到全局注册表中。
 主要用于实现命令模式，方便管理和调用不同类型的命令。
 
+注册表按 (group, name) 建立索引，查找为 O(1)。插件模块可以延迟加载：
+discover() 只读取源码（结果按文件 mtime/size 缓存到清单中）找出
+@register_commond 声明的命令，模块在 resolve() 第一次用到它的命令时才导入，
+因此启动耗时不随已安装插件的数量增长。
+
 使用示例:
     @register_commond("database", "find_oracle")
     def find_oracle():
         # 执行查找 Oracle 的逻辑
         pass
     
+    # 按组名和命令名查找并调用
+    func = resolve("database", "find_oracle")
+    if func is not None:
+        func()
+
     # 获取所有注册的命令
     registry = get_registry()
     for group, name, func in registry:
-        if group == "database" and name == "find_oracle":
-            func()  # 调用注册的函数
+        print(group, name)
 """
 
+import ast
+import importlib
+import json
+import os
+import pkgutil
+import threading
+import time
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Optional
 
 # 全局注册表，存储所有注册的命令
-# 格式: [(group, name, function), ...]
+# 格式: {(group, name): function}
 # group: 命令组名（如 "database", "file" 等）
 # name: 命令名称（如 "find_oracle", "find_kingbase" 等）
 # function: 注册的函数对象
-_registry: list[tuple[str,str,Callable[...,None]]] = []
+_registry: dict[tuple[str,str],Callable[...,None]] = {}
+
+# 已发现但尚未导入的命令: {(group, name): 模块名}
+_lazy: dict[tuple[str,str],str] = {}
+
+# 每个插件模块的导入耗时（秒）: {模块名: 秒}
+_load_times: dict[str,float] = {}
+
+_import_lock = threading.RLock()
+
+# 清单格式版本；修改清单结构时递增
+_MANIFEST_VERSION = 1
 
 
 def register_commond(group:str,name:str)->Callable[...,None]:
@@ -71,8 +98,8 @@ def register_commond(group:str,name:str)->Callable[...,None]:
             return func(*args,**kwargs)
         
         # 将命令注册到全局注册表
-        # 存储格式: (组名, 命令名, 包装后的函数)
-        _registry.append((group,name,wrapper))
+        # 存储格式: {(组名, 命令名): 包装后的函数}
+        _registry[(group,name)] = wrapper
         return wrapper
     return decorator
 
@@ -83,6 +110,7 @@ def get_registry()->list[tuple[str,str,Callable[...,None]]]:
     
     返回注册表中所有已注册的命令信息，包括组名、命令名和对应的函数对象。
     返回的是副本，防止外部代码直接修改原始注册表。
+    注意：这会导入所有延迟登记的插件模块；只需要单个命令时请使用 resolve()。
     
     返回:
         注册表列表的副本，格式为 [(group, name, function), ...]
@@ -93,4 +121,145 @@ def get_registry()->list[tuple[str,str,Callable[...,None]]]:
             print(f"组: {group}, 命令: {name}")
             func()  # 调用注册的函数
     """
-    return _registry.copy()
\ No newline at end of file
+    for key in list(_lazy):
+        resolve(*key)
+    return [(group,name,func) for (group,name),func in _registry.items()]
+
+
+def resolve(group:str,name:str)->Optional[Callable[...,None]]:
+    """
+    按组名和命令名查找命令，必要时导入提供它的插件模块
+
+    参数:
+        group: 命令组名
+        name: 命令名称
+
+    返回:
+        注册的函数；不存在时返回 None
+    """
+    func = _registry.get((group,name))
+    if func is not None:
+        return func
+    module_name = _lazy.get((group,name))
+    if module_name is None:
+        return None
+    with _import_lock:
+        if (group,name) not in _registry:
+            _import_module(module_name)
+        _lazy.pop((group,name),None)
+    return _registry.get((group,name))
+
+
+def _import_module(module_name:str)->None:
+    """导入插件模块并记录耗时（导入时模块中的装饰器会完成注册）"""
+    start = time.perf_counter()
+    importlib.import_module(module_name)
+    _load_times[module_name] = time.perf_counter() - start
+
+
+def load_times()->dict[str,float]:
+    """返回已导入插件模块的导入耗时（秒），格式为 {模块名: 秒}"""
+    return dict(_load_times)
+
+
+def _scan_source(path:str)->Optional[list[list[str]]]:
+    """
+    从模块源码中找出字面量形式的 @register_commond("组名", "命令名") 声明
+
+    返回:
+        [[group, name], ...]；源码中有无法静态识别的注册方式时返回 None
+    """
+    with open(path,"r",encoding="utf-8") as f:
+        source = f.read()
+    if "register_commond" not in source:
+        return []
+    commands = []
+    for node in ast.walk(ast.parse(source,filename=path)):
+        if not isinstance(node,ast.Call):
+            continue
+        func = node.func
+        callee = func.id if isinstance(func,ast.Name) else func.attr if isinstance(func,ast.Attribute) else None
+        if callee != "register_commond":
+            continue
+        args = node.args
+        if len(args) == 2 and all(isinstance(a,ast.Constant) and isinstance(a.value,str) for a in args):
+            commands.append([args[0].value,args[1].value])
+        else:
+            return None
+    return commands
+
+
+def discover(package:Any,cache_path:Optional[str]=None)->int:
+    """
+    发现包内插件模块提供的命令并登记为延迟加载
+
+    只读取模块源码，不导入模块；扫描结果按文件 mtime/size 缓存到清单
+    （默认在包目录的 __pycache__/registry_manifest.json），未变化的模块
+    不会被重新解析。无法静态识别注册方式的模块（如动态注册或只有编译产物）
+    会在这里直接导入。
+
+    参数:
+        package: 已导入的插件包（如 plugins）
+        cache_path: 清单文件路径
+
+    返回:
+        登记的命令数量
+    """
+    paths = list(package.__path__)
+    if cache_path is None:
+        cache_path = os.path.join(paths[0],"__pycache__","registry_manifest.json")
+    try:
+        with open(cache_path,"r",encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") != _MANIFEST_VERSION:
+            cached = {}
+    except (OSError,ValueError):
+        cached = {}
+    cached_modules = cached.get("modules",{})
+
+    modules = {}
+    eager = []
+    count = 0
+    for info in pkgutil.iter_modules(paths,package.__name__ + "."):
+        short = info.name.rsplit(".",1)[-1]
+        base = os.path.join(getattr(info.module_finder,"path",""),short)
+        source = os.path.join(base,"__init__.py") if info.ispkg else base + ".py"
+        try:
+            st = os.stat(source)
+        except OSError:
+            # 只有编译产物（.pyd/.so）：无法读取源码
+            eager.append(info.name)
+            continue
+        entry = cached_modules.get(info.name)
+        if not entry or entry.get("mtime_ns") != st.st_mtime_ns or entry.get("size") != st.st_size:
+            try:
+                commands = _scan_source(source)
+            except (OSError,SyntaxError,UnicodeDecodeError):
+                commands = None
+            entry = {"mtime_ns":st.st_mtime_ns,"size":st.st_size,"commands":commands}
+        modules[info.name] = entry
+        if entry["commands"] is None:
+            eager.append(info.name)
+            continue
+        for group,name in entry["commands"]:
+            if (group,name) not in _registry:
+                _lazy.setdefault((group,name),info.name)
+            count += 1
+
+    if modules != cached_modules:
+        try:
+            os.makedirs(os.path.dirname(cache_path),exist_ok=True)
+            tmp = cache_path + ".tmp"
+            with open(tmp,"w",encoding="utf-8") as f:
+                json.dump({"version":_MANIFEST_VERSION,"modules":modules},f,ensure_ascii=False)
+            os.replace(tmp,cache_path)
+        except OSError:
+            # 清单只是缓存，写不进去也不影响使用
+            pass
+
+    for module_name in eager:
+        before = len(_registry)
+        with _import_lock:
+            _import_module(module_name)
+        count += len(_registry) - before
+    return count
\ No newline at end of file